@@ -0,0 +1,183 @@
+"""
+Runs the benchmarks on synthetic fixtures:
+
+    python -m benchmarks.run [names] --output results.json --baseline previous.json
+"""
+import argparse
+import gc
+import json
+import platform
+import shutil
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.suite import BENCHMARKS, Benchmark, Context
+from src.common.profiling import PROFILER
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_THRESHOLD = 0.1
+
+
+def measure(bench: Benchmark, context: Context, rounds: int) -> dict:
+    timings = []
+    units = 0
+
+    for _ in range(rounds):
+        state = bench.setup(context)
+        gc.collect()
+
+        start = time.perf_counter()
+        units = bench.run(state)
+        timings.append(time.perf_counter() - start)
+
+    # peak memory is taken from a separate round,
+    # tracing slows down the timed ones
+    state = bench.setup(context)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bench.run(state)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(timings)
+
+    return dict(
+        unit=bench.unit,
+        units=units,
+        rounds=rounds,
+        min=min(timings),
+        median=median,
+        mean=statistics.mean(timings),
+        throughput=units / median if median else None,
+        peak_memory=peak_memory,
+    )
+
+
+def run(names: list[str] = None,
+        rounds: int = 5,
+        total_items: int = 500,
+        seed: int = 0) -> dict:
+    context = Context(total_items=total_items, seed=seed)
+
+    results = dict()
+    try:
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            try:
+                results[name] = measure(bench, context, rounds)
+            except Exception as e:
+                results[name] = dict(error=f'{e.__class__.__name__}: {e}')
+    finally:
+        shutil.rmtree(context.tmp_dir, ignore_errors=True)
+
+    return dict(
+        version=RESULT_FORMAT_VERSION,
+        created_at=time.time(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        params=dict(
+            rounds=rounds,
+            total_items=total_items,
+            seed=seed,
+        ),
+        results=results,
+    )
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Ratios are current / baseline median time, above 1 is slower.
+    """
+    result = []
+    for name, current_result in current['results'].items():
+        baseline_result = baseline['results'].get(name)
+        if not baseline_result or 'error' in baseline_result or 'error' in current_result:
+            continue
+
+        time_ratio = current_result['median'] / baseline_result['median']
+        memory_ratio = None
+        if baseline_result['peak_memory']:
+            memory_ratio = current_result['peak_memory'] / baseline_result['peak_memory']
+
+        result.append(dict(
+            name=name,
+            time_ratio=time_ratio,
+            memory_ratio=memory_ratio,
+            regressed=time_ratio > 1 + threshold,
+        ))
+    return result
+
+
+def format_results(results: dict) -> str:
+    lines = [f'{"benchmark":<24}{"median (ms)":>14}{"throughput":>20}{"peak memory (KiB)":>20}']
+    for name, result in results['results'].items():
+        if 'error' in result:
+            lines.append(f'{name:<24}  {result["error"]}')
+            continue
+        throughput = f'{result["throughput"]:,.0f} {result["unit"]}/s'
+        lines.append(
+            f'{name:<24}{result["median"] * 1000:>14.2f}{throughput:>20}{result["peak_memory"] / 1024:>20,.0f}'
+        )
+    return '\n'.join(lines)
+
+
+def format_comparison(comparison: list[dict]) -> str:
+    lines = [f'{"benchmark":<24}{"time":>10}{"memory":>10}']
+    for i in comparison:
+        memory_ratio = f'{i["memory_ratio"]:.2f}x' if i['memory_ratio'] is not None else '-'
+        flag = '  REGRESSED' if i['regressed'] else ''
+        lines.append(f'{i["name"]:<24}{i["time_ratio"]:>9.2f}x{memory_ratio:>10}{flag}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the parse, edit and save hot paths')
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run, all by default: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--items', type=int, default=500, help='number of synthetic items')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help='compare against the JSON results of a previous run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown reported as a regression')
+    parser.add_argument('--profile', action='store_true',
+                        help='report the parse and save phases, timings include the instrumentation')
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable()
+
+    results = run(
+        names=args.names,
+        rounds=args.rounds,
+        total_items=args.items,
+        seed=args.seed
+    )
+
+    print(format_results(results))
+
+    if args.profile:
+        results['profile'] = PROFILER.stats()
+        print()
+        print(PROFILER.report())
+
+    if args.output:
+        with open(args.output, 'w') as fr:
+            json.dump(results, fr, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as fr:
+            baseline = json.load(fr)
+        comparison = compare(results, baseline, threshold=args.threshold)
+        print()
+        print(format_comparison(comparison))
+        if any(i['regressed'] for i in comparison):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import os
+import tempfile
+
+from src.common.data import load_catalog
+from src.common.utils import make_byte_array_from_hex
+from src.generators import Generator
+from src.models.character import Character
+from src.models.item import Item
+from src.peek.batch import peek_items
+
+BENCHMARKS = dict()
+
+# items of the synthetic character, about as many as its storages hold
+MAX_CHARACTER_ITEMS = 150
+
+
+class Benchmark:
+    """
+    `setup` builds the state of one round outside the timed section,
+    `run` does the measured work and returns the number of processed units.
+    """
+
+    def __init__(self, name: str, setup, run, unit: str):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.unit = unit
+
+
+def benchmark(name: str, setup=None, unit: str = 'item'):
+    def decorator(run):
+        BENCHMARKS[name] = Benchmark(
+            name=name,
+            setup=setup or (lambda context: context),
+            run=run,
+            unit=unit
+        )
+        return run
+    return decorator
+
+
+class Context:
+    """
+    Synthetic fixtures shared by every benchmark of a run.
+    """
+
+    def __init__(self, total_items: int = 500, seed: int = 0):
+        self.total_items = total_items
+        self.seed = seed
+        self.tmp_dir = tempfile.mkdtemp(prefix='d2s_bench_')
+
+        self._items = None
+        self._character_data = None
+        self._library_dir = None
+
+    @property
+    def items(self) -> list[bytes]:
+        if self._items is None:
+            self._items = Generator(seed=self.seed).make_items(self.total_items)
+        return self._items
+
+    @property
+    def character_data(self) -> bytes:
+        if self._character_data is None:
+            self._character_data = Generator(seed=self.seed).make_character(
+                total_items=min(self.total_items, MAX_CHARACTER_ITEMS),
+                total_merc_items=10
+            )
+        return self._character_data
+
+    @property
+    def library_dir(self) -> str:
+        if self._library_dir is None:
+            library_dir = os.path.join(self.tmp_dir, 'library')
+            # a single directory, add_items does not look into sub directories
+            files = Generator(seed=self.seed).write_item_library(
+                dir_path=library_dir,
+                count=len(self.items),
+                files_per_dir=len(self.items),
+                items=self.items
+            )
+            self._library_dir = os.path.dirname(files[0])
+        return self._library_dir
+
+    def make_character(self) -> Character:
+        return Character(data=self.character_data.hex())
+
+
+@benchmark('item_init')
+def bench_item_init(context: Context) -> int:
+    for data in context.items:
+        Item(data=data.hex())
+    return len(context.items)
+
+
+@benchmark('peek_items')
+def bench_peek_items(context: Context) -> int:
+    peek_items(context.items)
+    return len(context.items)
+
+
+def setup_parsed_items(context: Context) -> list:
+    return [Item(data=data.hex()) for data in context.items]
+
+
+@benchmark('item_load_mods', setup=setup_parsed_items)
+def bench_item_load_mods(items: list) -> int:
+    for item in items:
+        item._load_mods()
+    return len(items)
+
+
+@benchmark('item_updated_data', setup=setup_parsed_items)
+def bench_item_updated_data(items: list) -> int:
+    for item in items:
+        item.updated_data
+    return len(items)
+
+
+@benchmark('character_init', unit='character')
+def bench_character_init(context: Context) -> int:
+    context.make_character()
+    return 1
+
+
+def setup_character(context: Context):
+    return context, context.make_character()
+
+
+@benchmark('character_save', setup=setup_character, unit='character')
+def bench_character_save(state) -> int:
+    context, character = state
+    character.save(os.path.join(context.tmp_dir, 'saved.d2s'))
+    return 1
+
+
+def setup_hex_data(context: Context) -> list[str]:
+    return make_byte_array_from_hex(context.character_data.hex())
+
+
+@benchmark('calculate_checksum', setup=setup_hex_data, unit='byte')
+def bench_calculate_checksum(data: list[str]) -> int:
+    Character.calculate_checksum(data)
+    return len(data)
+
+
+@benchmark('scan_items_by_position', setup=setup_character)
+def bench_scan_items_by_position(state) -> int:
+    context, character = state
+    character.scan_items_by_position(
+        location_code=0,
+        storage_code=5,
+        start_x=0,
+        end_x=16,
+        start_y=0,
+        end_y=16
+    )
+    return len(character.items)
+
+
+def setup_add_items(context: Context):
+    # write the library before the timed section
+    return context.library_dir, context.make_character()
+
+
+@benchmark('add_items', setup=setup_add_items)
+def bench_add_items(state) -> int:
+    library_dir, character = state
+    total_items = len(character.items)
+    character.add_items(
+        storage_id=5,
+        location_id=0,
+        from_dir=True,
+        dir_path=library_dir
+    )
+    return len(character.items) - total_items
+
+
+@benchmark('duplicate_items', setup=setup_character)
+def bench_duplicate_items(state) -> int:
+    context, character = state
+    quantity = 500
+    character.duplicate_items(
+        item=character.items[0],
+        location_id=0,
+        storage_id=5,
+        quantity=quantity
+    )
+    return quantity
+
+
+@benchmark('catalog_load', unit='table')
+def bench_catalog_load(context: Context) -> int:
+    file_names = [
+        'base_items',
+        'item_types',
+        'item_mods',
+        'item_stats',
+        'skills',
+    ]
+    for file_name in file_names:
+        load_catalog(file_name)
+    return len(file_names)
@@ -1,25 +1,43 @@
+"""
+Rebuilds the catalogs of `data/` from the decapitator files in `tmp/decapitator/`:
+
+    python -m migration.scripts.update_data_from_decapicator [tables] [--force] [--jobs 4] [--raw-json]
+
+Only the tables whose source, builder or output changed since the last run are rebuilt,
+according to the hashes kept in `tmp/decapitator/manifest.json`.
+Tables are independent and built in parallel processes, their rows are streamed from the sources.
+"""
+import argparse
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
 
-from migration.utils import decompress_dat_file_from_decapitator
+from migration.utils import iter_dat_file_lines_from_decapitator
 from src.common.constants.dirs import TMR_DIR, DATA_DIR
-from src.common.utils import decompress_data, compress_data, convert_tsv_to_json
+from src.common.utils import decompress_data, compress_data, hash_file, iter_tsv_rows, TsvColumn, TsvReader
 from config import DATA_ENCRYPTION_KEY
 
+DECAPITATOR_DIR = os.path.join(TMR_DIR, 'decapitator')
+MANIFEST_PATH = os.path.join(DECAPITATOR_DIR, 'manifest.json')
 
-def update_item_mods():
-    decapitator_file_path = os.path.join(TMR_DIR, 'decapitator\\props.dat')
-    file_path = os.path.join(DATA_DIR, 'item_mods.dat')
+# bump it when a builder changes, its tables are rebuilt
+BUILDER_VERSION = 2
+
+
+ITEM_MOD_COLUMNS = [
+    TsvColumn('#code'),
+    TsvColumn('stat'),
+    TsvColumn('descPositive'),
+    TsvColumn('descGroupIDs'),
+    TsvColumn('bits', int, 0),
+    TsvColumn('saveParamBits', int, 0),
+    TsvColumn('add', int, 0),
+]
 
-    if os.path.exists(file_path):
-        with open(file_path, 'rb') as fr:
-            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
-    else:
-        result = dict()
 
-    for i in convert_tsv_to_json(
-            decompress_dat_file_from_decapitator(decapitator_file_path)
-    ):
+def build_item_mods(rows: Iterable[dict], result: dict) -> dict:
+    for i in rows:
         mod_id = i['#code']
         mod_id_as_int = int(mod_id)
         stat_code = i['stat']
@@ -32,7 +50,7 @@ def update_item_mods():
             'positive_desc': i['descPositive']
         }
 
-        teammate_codes = i.get('descGroupIDs')
+        teammate_codes = i['descGroupIDs']
         if teammate_codes:
             teammate_codes = teammate_codes.split(',')
         else:
@@ -40,23 +58,8 @@ def update_item_mods():
 
         mod['teammate_codes'] = teammate_codes
 
-        try:
-            bits = int(i.get('bits'))
-        except (TypeError, ValueError):
-            bits = 0
-
-        try:
-            save_param_bits = int(i.get('saveParamBits'))
-        except (TypeError, ValueError):
-            save_param_bits = 0
-
-        try:
-            min_value = int(i.get('add'))
-        except (TypeError, ValueError):
-            min_value = 0
-
-        mod['min_value'] = min_value
-        mod['length'] = bits + save_param_bits
+        mod['min_value'] = i['add']
+        mod['length'] = i['bits'] + i['saveParamBits']
 
         if mod_id in result:
             for k, v in mod.items():
@@ -66,39 +69,23 @@ def update_item_mods():
         else:
             result[mod_id] = mod
 
-    compressed_data = compress_data(
-        data=json.dumps(result).encode(),
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
+    return result
 
-    with open(file_path, 'wb') as fr:
-        fr.write(compressed_data)
 
-    decompress_data(
-        data=compressed_data,
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
+ITEM_STAT_COLUMNS = [
+    TsvColumn('Stat'),
+    TsvColumn('ID', int),
+    TsvColumn('Save Add', int, 0),
+    TsvColumn('Save Bits', int, 0),
+    TsvColumn('Save Param Bits', int, 0),
+]
 
 
-def update_item_stats():
-    decapitator_file_path = os.path.join(TMR_DIR, 'decapitator\\itemstatcost.tsv')
-    file_path = os.path.join(DATA_DIR, 'item_stats.dat')
-
-    if os.path.exists(file_path):
-        with open(file_path, 'rb') as fr:
-            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
-    else:
-        result = dict()
-
-    raw_data = convert_tsv_to_json(
-        open(decapitator_file_path, 'r').read()
-    )
-
-    for i in raw_data:
+def build_item_stats(rows: Iterable[dict], result: dict) -> dict:
+    for i in rows:
         code = i['Stat']
-        try:
-            stat_id = int(i['ID'])
-        except ValueError:
+        stat_id = i['ID']
+        if stat_id is None:
             continue
 
         stat = {
@@ -106,56 +93,27 @@ def update_item_stats():
             'id': stat_id
         }
 
-        try:
-            save_add = int(i.get('Save Add'))
-        except (TypeError, ValueError):
-            save_add = 0
-
-        try:
-            save_bits = int(i.get('Save Bits'))
-        except (TypeError, ValueError):
-            save_bits = 0
-
-        try:
-            save_param_bits = int(i.get('Save Param Bits'))
-        except (TypeError, ValueError):
-            save_param_bits = 0
-
-        stat['length'] = save_bits + save_add + save_param_bits
+        stat['length'] = i['Save Bits'] + i['Save Add'] + i['Save Param Bits']
 
         if code not in result:
             result[code] = stat
 
-    compressed_data = compress_data(
-        data=json.dumps(result).encode(),
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
-
-    with open(file_path, 'wb') as fr:
-        fr.write(compressed_data)
-
-    with open(os.path.join(TMR_DIR, 'decapitator\\itemstatcost.json'), 'w') as fr:
-        fr.write(json.dumps(raw_data))
-
-    decompress_data(
-        data=compressed_data,
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
+    return result
 
 
-def update_base_items():
-    decapitator_file_path = os.path.join(TMR_DIR, 'decapitator\\items.dat')
-    file_path = os.path.join(DATA_DIR, 'base_items.dat')
+BASE_ITEM_COLUMNS = [
+    TsvColumn('#code'),
+    TsvColumn('name'),
+    TsvColumn('width'),
+    TsvColumn('height'),
+    TsvColumn('type'),
+    TsvColumn('class', int),
+    TsvColumn('stackable'),
+]
 
-    if os.path.exists(file_path):
-        with open(file_path, 'rb') as fr:
-            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
-    else:
-        result = dict()
 
-    for i in convert_tsv_to_json(
-            decompress_dat_file_from_decapitator(decapitator_file_path)
-    ):
+def build_base_items(rows: Iterable[dict], result: dict) -> dict:
+    for i in rows:
         code = i['#code']
 
         base_item = {
@@ -165,15 +123,11 @@ def update_base_items():
             'height': i['height'],
             'type_codes': i['type'].split(',')
         }
-        try:
-            class_id = int(i.get('class'))
-            if class_id < 0:
-                class_id = None
-        except TypeError:
+        class_id = i['class']
+        if class_id is not None and class_id < 0:
             class_id = None
 
-        stackable = i.get('stackable')
-        if stackable == '1':
+        if i['stackable'] == '1':
             base_item['stackable'] = True
 
         base_item['class_id'] = class_id
@@ -181,33 +135,18 @@ def update_base_items():
         if code not in result:
             result[code] = base_item
 
-    compressed_data = compress_data(
-        data=json.dumps(result).encode(),
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
+    return result
 
-    with open(file_path, 'wb') as fr:
-        fr.write(compressed_data)
 
-    decompress_data(
-        data=compressed_data,
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
-
-
-def update_item_types():
-    decapitator_file_path = os.path.join(TMR_DIR, 'decapitator\\itemtypes.dat')
-    file_path = os.path.join(DATA_DIR, 'item_types.dat')
+ITEM_TYPE_COLUMNS = [
+    TsvColumn('#code'),
+    TsvColumn('name'),
+    TsvColumn('equiv'),
+]
 
-    if os.path.exists(file_path):
-        with open(file_path, 'rb') as fr:
-            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
-    else:
-        result = dict()
 
-    for i in convert_tsv_to_json(
-            decompress_dat_file_from_decapitator(decapitator_file_path)
-    ):
+def build_item_types(rows: Iterable[dict], result: dict) -> dict:
+    for i in rows:
         code = i['#code']
 
         item_type = {
@@ -215,7 +154,7 @@ def update_item_types():
             'name': i['name'],
         }
 
-        equiv_codes = i.get('equiv')
+        equiv_codes = i['equiv']
         if equiv_codes:
             equiv_codes = set(equiv_codes.split(','))
         else:
@@ -225,33 +164,18 @@ def update_item_types():
         if code not in result:
             result[code] = item_type
 
-    compressed_data = compress_data(
-        data=json.dumps(result).encode(),
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
-
-    with open(file_path, 'wb') as fr:
-        fr.write(compressed_data)
-
-    decompress_data(
-        data=compressed_data,
-        encryption_key=DATA_ENCRYPTION_KEY
-    )
+    return result
 
 
-def update_skills():
-    decapitator_file_path = os.path.join(TMR_DIR, 'decapitator\\skills.dat')
-    file_path = os.path.join(DATA_DIR, 'skills.dat')
+SKILL_COLUMNS = [
+    TsvColumn('#code'),
+    TsvColumn('name'),
+    TsvColumn('class', int, -1),
+]
 
-    if os.path.exists(file_path):
-        with open(file_path, 'rb') as fr:
-            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
-    else:
-        result = dict()
 
-    for i in convert_tsv_to_json(
-            decompress_dat_file_from_decapitator(decapitator_file_path)
-    ):
+def build_skills(rows: Iterable[dict], result: dict) -> dict:
+    for i in rows:
         skill_id = i['#code']
 
         skill = {
@@ -259,33 +183,225 @@ def update_skills():
             'name': i['name'],
         }
 
-        try:
-            class_id = int(i['class'])
-        except (TypeError, ValueError):
-            class_id = -1
-
-        skill['class_id'] = class_id
+        skill['class_id'] = i['class']
 
         if skill_id not in result:
             result[skill_id] = skill
 
+    return result
+
+
+class CatalogTable:
+    """
+    A catalog of `data/` built from one decapitator source,
+    compressed `.dat` sources or plain `.tsv` files, of which only `columns` are read.
+    `raw_json_name` is where `--raw-json` dumps every column of the source rows, in the decapitator directory.
+    """
+
+    def __init__(self,
+                 name: str,
+                 source_name: str,
+                 columns: list[TsvColumn],
+                 build: Callable[[Iterable[dict], dict], dict],
+                 raw_json_name: str = None):
+        self.name = name
+        self.source_name = source_name
+        self.reader = TsvReader(columns)
+        self.build = build
+        self.raw_json_name = raw_json_name
+
+    @property
+    def source_path(self) -> str:
+        return os.path.join(DECAPITATOR_DIR, self.source_name)
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(DATA_DIR, f'{self.name}.dat')
+
+    def iter_lines(self) -> Iterator[str]:
+        if self.source_name.endswith('.tsv'):
+            with open(self.source_path, 'r') as fr:
+                yield from fr
+        else:
+            yield from iter_dat_file_lines_from_decapitator(self.source_path)
+
+    def iter_rows(self) -> Iterator[dict]:
+        return self.reader.iter_rows(self.iter_lines())
+
+    def dump_raw_rows(self) -> str | None:
+        """
+        Writes every column of the source rows, as read, to `raw_json_name`.
+        """
+        if not self.raw_json_name:
+            return None
+        file_path = os.path.join(DECAPITATOR_DIR, self.raw_json_name)
+        dump_rows(iter_tsv_rows(self.iter_lines()), file_path)
+        return file_path
+
+
+def dump_rows(rows: Iterable[dict], file_path: str):
+    """
+    Writes the rows as a JSON list, one row at a time.
+    """
+    with open(file_path, 'w') as fr:
+        fr.write('[')
+        for index, row in enumerate(rows):
+            if index:
+                fr.write(', ')
+            fr.write(json.dumps(row))
+        fr.write(']')
+
+
+TABLES = {
+    table.name: table
+    for table in [
+        CatalogTable('item_mods', 'props.dat', ITEM_MOD_COLUMNS, build_item_mods),
+        CatalogTable('item_stats', 'itemstatcost.tsv', ITEM_STAT_COLUMNS, build_item_stats,
+                     raw_json_name='itemstatcost.json'),
+        CatalogTable('base_items', 'items.dat', BASE_ITEM_COLUMNS, build_base_items),
+        CatalogTable('item_types', 'itemtypes.dat', ITEM_TYPE_COLUMNS, build_item_types),
+        CatalogTable('skills', 'skills.dat', SKILL_COLUMNS, build_skills),
+    ]
+}
+
+
+def load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_PATH):
+        return dict()
+    with open(MANIFEST_PATH, 'r') as fr:
+        return json.load(fr)
+
+
+def save_manifest(manifest: dict):
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as fr:
+        json.dump(manifest, fr, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def is_stale(table: CatalogTable, entry: dict | None) -> bool:
+    if not entry or entry.get('builder_version') != BUILDER_VERSION:
+        return True
+    if not os.path.exists(table.output_path):
+        return True
+    return (
+        entry.get('source_hash') != hash_file(table.source_path)
+        or entry.get('output_hash') != hash_file(table.output_path)
+    )
+
+
+def update_table(name: str) -> dict:
+    """
+    Merges the rows of the source into the existing catalog and writes it back.
+    """
+    table = TABLES[name]
+    source_hash = hash_file(table.source_path)
+
+    if os.path.exists(table.output_path):
+        with open(table.output_path, 'rb') as fr:
+            result = json.loads(decompress_data(data=fr.read(), encryption_key=DATA_ENCRYPTION_KEY))
+    else:
+        result = dict()
+
+    result = table.build(table.iter_rows(), result)
+
     compressed_data = compress_data(
         data=json.dumps(result).encode(),
         encryption_key=DATA_ENCRYPTION_KEY
     )
 
-    with open(file_path, 'wb') as fr:
-        fr.write(compressed_data)
-
+    # check the written data can be read back
     decompress_data(
         data=compressed_data,
         encryption_key=DATA_ENCRYPTION_KEY
     )
 
+    tmp_path = table.output_path + '.tmp'
+    with open(tmp_path, 'wb') as fr:
+        fr.write(compressed_data)
+    os.replace(tmp_path, table.output_path)
+
+    return dict(
+        builder_version=BUILDER_VERSION,
+        source_hash=source_hash,
+        output_hash=hash_file(table.output_path),
+        total_records=len(result),
+    )
+
+
+def update_tables(names: list[str] = None, force: bool = False, jobs: int = None) -> dict[str, str]:
+    """
+    Returns the status of each table, `rebuilt` or `unchanged`.
+    """
+    names = names or list(TABLES)
+    manifest = load_manifest()
+
+    stale_names = [
+        name for name in names
+        if force or is_stale(TABLES[name], manifest.get(name))
+    ]
+
+    result = {name: 'unchanged' for name in names}
+
+    if len(stale_names) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            entries = dict(zip(stale_names, executor.map(update_table, stale_names)))
+    else:
+        entries = {name: update_table(name) for name in stale_names}
+
+    for name, entry in entries.items():
+        manifest[name] = entry
+        result[name] = 'rebuilt'
+
+    if entries:
+        save_manifest(manifest)
+
+    return result
+
+
+def update_item_mods():
+    update_tables(['item_mods'], force=True)
+
+
+def update_item_stats():
+    update_tables(['item_stats'], force=True)
+
+
+def update_base_items():
+    update_tables(['base_items'], force=True)
+
+
+def update_item_types():
+    update_tables(['item_types'], force=True)
+
+
+def update_skills():
+    update_tables(['skills'], force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuilds the catalogs from the decapitator files')
+    parser.add_argument('tables', nargs='*', help=f'all tables by default: {", ".join(TABLES)}')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the sources did not change')
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes')
+    parser.add_argument('--raw-json', action='store_true',
+                        help='also dump every column of the sources which have a raw dump, e.g. itemstatcost.json')
+    args = parser.parse_args()
+
+    for name in args.tables:
+        if name not in TABLES:
+            parser.error(f'unknown table: {name}')
+
+    result = update_tables(names=args.tables, force=args.force, jobs=args.jobs)
+    for name, status in result.items():
+        print(f'{name}: {status}')
+
+    if args.raw_json:
+        for name in args.tables or TABLES:
+            file_path = TABLES[name].dump_raw_rows()
+            if file_path:
+                print(f'{name}: dumped {file_path}')
+
 
 if __name__ == '__main__':
-    update_item_mods()
-    update_item_stats()
-    update_base_items()
-    update_item_types()
-    update_skills()
+    main()
@@ -1,15 +1,41 @@
+import codecs
 import zlib
+from typing import Iterator
 
+# The files we're decompressing are from a CPP source code,
+# it uses 2 more bytes for padding after a default 6-byte header.
+# https://github.com/kambala-decapitator/MedianXLOfflineTools/blob/a928ee871d09fae85720c8d39aca9cc8f5a3ddb5/utils/CompressFiles/main.cpp
+DECAPITATOR_DATA_OFFSET = 8
+
+CHUNK_SIZE = 1024 * 1024
 
-def decompress_dat_file_from_decapitator(file_path: str) -> str:
-    # The files we're decompressing are from a CPP source code,
-    # it uses 2 more bytes for padding after a default 6-byte header.
-    # https://github.com/kambala-decapitator/MedianXLOfflineTools/blob/a928ee871d09fae85720c8d39aca9cc8f5a3ddb5/utils/CompressFiles/main.cpp
-    data_offset = 8
 
+def decompress_dat_file_from_decapitator(file_path: str) -> str:
     with open(file_path, 'rb') as f:
         data = f.read()
 
-        decompressed_data = zlib.decompress(data[data_offset:])
+        decompressed_data = zlib.decompress(data[DECAPITATOR_DATA_OFFSET:])
 
     return decompressed_data.decode()
+
+
+def iter_dat_file_lines_from_decapitator(file_path: str) -> Iterator[str]:
+    """
+    Decompresses a decapitator file chunk by chunk and yields its lines, ending with their '\\n'.
+    """
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+
+    with open(file_path, 'rb') as f:
+        f.seek(DECAPITATOR_DATA_OFFSET)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            lines = (pending + decoder.decode(decompressor.decompress(chunk))).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+
+    pending += decoder.decode(decompressor.flush(), final=True)
+    if pending:
+        yield pending
+
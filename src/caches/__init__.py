@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from src.common.profiling import PROFILER
+from src.models.character import Character
+from src.models.item import Item
+
+ENV_CHARACTER_CACHE_MEMORY = 'D2S_CHARACTER_CACHE_MEMORY'
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+# rough sizes of the parsed data, in bytes
+POINTER_SIZE = 8
+BYTE_STR_SIZE = sys.getsizeof('00')
+MOD_SIZE = 1024
+
+
+def estimate_item_size(item: Item) -> int:
+    # bits are interned one char strings, only their pointers count
+    return (
+        sys.getsizeof(item.data)
+        + len(item._hex_data_as_byte_array) * (POINTER_SIZE + BYTE_STR_SIZE)
+        + len(item._bin_data_as_array) * POINTER_SIZE
+        + len(item._mods) * MOD_SIZE
+    )
+
+
+def estimate_character_size(character: Character) -> int:
+    result = sys.getsizeof(character.data)
+    result += len(character._hex_data_as_byte_array) * (POINTER_SIZE + BYTE_STR_SIZE)
+    for item in character.items:
+        result += estimate_item_size(item)
+    for item in character.merc_items:
+        result += estimate_item_size(item)
+    return result
+
+
+class CacheEntry:
+
+    def __init__(self, key: tuple[str, int, int], character: Character, size: int):
+        self.key = key
+        self.character = character
+        self.size = size
+
+
+class CharacterCache:
+    """
+    Parsed characters by file, keyed by `(path, st_mtime_ns, st_size)`
+    so a file changed on disk is parsed again.
+    The least recently used characters are evicted above `max_memory` estimated bytes.
+    Cached characters are shared: after editing one, save it through the cache
+    or invalidate it, otherwise the next `get` returns the edited character.
+    """
+
+    def __init__(self, max_memory: int = DEFAULT_MAX_MEMORY, max_entries: int = None):
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # path -> entry, the most recently used last
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(path: str) -> tuple[str, int, int]:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path: str):
+        return os.path.abspath(path) in self._entries
+
+    def get(self, path: str) -> Character:
+        key = self.make_key(path)
+
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry.key == key:
+                self._entries.move_to_end(key[0])
+                self.hits += 1
+                PROFILER.hit('character_cache')
+                return entry.character
+
+            self.misses += 1
+            PROFILER.miss('character_cache')
+
+        # parsed outside the lock, concurrent misses of one file may parse it twice
+        with open(key[0], 'rb') as file_ref:
+            character = Character(data=file_ref.read().hex())
+
+        self.put(key, character)
+        return character
+
+    def put(self, key: tuple[str, int, int], character: Character):
+        entry = CacheEntry(key, character, estimate_character_size(character))
+
+        with self._lock:
+            self._remove(key[0])
+            self._entries[key[0]] = entry
+            self.memory += entry.size
+            self._evict()
+
+    def _remove(self, path: str) -> CacheEntry | None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.memory -= entry.size
+        return entry
+
+    def _evict(self):
+        # the last added entry is kept even if it is larger than the limit
+        while len(self._entries) > 1 and (
+            self.memory > self.max_memory
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self.memory -= entry.size
+            self.evictions += 1
+
+    def invalidate(self, path: str) -> bool:
+        with self._lock:
+            return self._remove(os.path.abspath(path)) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+
+    def save(self, character: Character, file_path: str, backup_path: str = None):
+        """
+        Saves a character and drops the cached one of the file,
+        the saved data is parsed again on the next `get`.
+        """
+        try:
+            character.save(file_path, backup_path=backup_path)
+        finally:
+            self.invalidate(file_path)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return dict(
+            entries=len(self._entries),
+            memory=self.memory,
+            max_memory=self.max_memory,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            hit_rate=self.hits / total if total else 0.0,
+        )
+
+
+CHARACTER_CACHE = CharacterCache(
+    max_memory=int(os.environ.get(ENV_CHARACTER_CACHE_MEMORY, DEFAULT_MAX_MEMORY))
+)
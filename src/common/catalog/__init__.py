@@ -0,0 +1,208 @@
+"""
+Catalogs shared between processes.
+
+The parent writes every catalog into one file, its entries sorted by key with a binary searched index,
+and the workers map it read-only: pages are shared through the OS page cache and an entry
+is unpickled only when it is looked up, so a worker does not hold its own copy of the catalogs.
+The recently looked up values of a table are kept decoded.
+The metadata of the file, e.g. the sources it was built from, is read when the file is opened.
+
+    write_shared_catalog(path, dict(base_items=BASE_ITEMS, ...), metadata=dict(...))
+    with SharedCatalog(path) as catalog:
+        catalog['base_items']['qui']
+"""
+import functools
+import mmap
+import os
+import pickle
+import struct
+import threading
+from collections.abc import Mapping
+from typing import Iterator
+
+from src.bases.errors import Error
+
+MAGIC = b'D2SCAT02'
+
+# magic, number of tables, metadata offset, metadata length
+HEADER = struct.Struct('<8sIII')
+# name, number of entries, offset of the index
+TABLE = struct.Struct('<32sII')
+# key offset, key length, value offset, value length
+ENTRY = struct.Struct('<IIII')
+
+# decoded values kept by each table
+DEFAULT_CACHE_SIZE = 256
+
+
+def write_shared_catalog(file_path: str, tables: dict[str, Mapping], metadata: dict = None):
+    """
+    Writes the tables, keyed by str, and their metadata to a temporary file renamed over `file_path`.
+    Workers which already mapped the previous file keep reading it.
+    """
+    data = bytearray(HEADER.size)
+    directory_offset = len(data)
+    data.extend(bytes(TABLE.size * len(tables)))
+
+    for table_index, (name, table) in enumerate(tables.items()):
+        entries = []
+        for key in sorted(table, key=lambda k: k.encode()):
+            key_data = key.encode()
+            key_offset = len(data)
+            data.extend(key_data)
+
+            value_data = pickle.dumps(table[key], protocol=pickle.HIGHEST_PROTOCOL)
+            value_offset = len(data)
+            data.extend(value_data)
+
+            entries.append((key_offset, len(key_data), value_offset, len(value_data)))
+
+        index_offset = len(data)
+        for entry in entries:
+            data.extend(ENTRY.pack(*entry))
+
+        TABLE.pack_into(
+            data,
+            directory_offset + table_index * TABLE.size,
+            name.encode(),
+            len(entries),
+            index_offset
+        )
+
+    metadata_data = pickle.dumps(metadata or dict(), protocol=pickle.HIGHEST_PROTOCOL)
+    HEADER.pack_into(data, 0, MAGIC, len(tables), len(data), len(metadata_data))
+    data.extend(metadata_data)
+
+    tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fr:
+            fr.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class SharedTable(Mapping):
+    """
+    Read-only view of a table. Like the values of a dict,
+    looked up values may be shared between lookups and must not be changed.
+    """
+
+    def __init__(self,
+                 buffer: mmap.mmap,
+                 name: str,
+                 total_entries: int,
+                 index_offset: int,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.name = name
+        self._buffer = buffer
+        self._total_entries = total_entries
+        self._index_offset = index_offset
+
+        self._load_value = functools.lru_cache(maxsize=cache_size)(self._read_value)
+
+    def _read_entry(self, index: int) -> tuple[int, int, int, int]:
+        return ENTRY.unpack_from(self._buffer, self._index_offset + index * ENTRY.size)
+
+    def _read_key(self, index: int) -> bytes:
+        key_offset, key_length, _, _ = self._read_entry(index)
+        return self._buffer[key_offset:key_offset + key_length]
+
+    def _find(self, key) -> int | None:
+        if not isinstance(key, str):
+            return None
+        key_data = key.encode()
+
+        low, high = 0, self._total_entries
+        while low < high:
+            middle = (low + high) // 2
+            if self._read_key(middle) < key_data:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self._total_entries and self._read_key(low) == key_data:
+            return low
+        return None
+
+    def _read_value(self, index: int):
+        _, _, value_offset, value_length = self._read_entry(index)
+        return pickle.loads(self._buffer[value_offset:value_offset + value_length])
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._load_value(index)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return self._total_entries
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._total_entries):
+            yield self._read_key(index).decode()
+
+    def __repr__(self):
+        return f'SharedTable({self.name!r}, {self._total_entries} entries)'
+
+
+class SharedCatalog(Mapping):
+    """
+    The tables of a file written by `write_shared_catalog`, by name.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+        with open(file_path, 'rb') as fr:
+            try:
+                self._buffer = mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                self._buffer = None
+
+        if self._buffer is None or len(self._buffer) < HEADER.size:
+            raise Error('InvalidSharedCatalog', f'Not a shared catalog: {file_path}')
+
+        magic, total_tables, metadata_offset, metadata_length = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            self._buffer.close()
+            raise Error('InvalidSharedCatalog', f'Not a shared catalog: {file_path}')
+
+        self.metadata: dict = pickle.loads(self._buffer[metadata_offset:metadata_offset + metadata_length])
+
+        self._tables: dict[str, SharedTable] = dict()
+        for table_index in range(total_tables):
+            name, total_entries, index_offset = TABLE.unpack_from(
+                self._buffer,
+                HEADER.size + table_index * TABLE.size
+            )
+            name = name.rstrip(b'\x00').decode()
+            self._tables[name] = SharedTable(self._buffer, name, total_entries, index_offset)
+
+    def __getitem__(self, name: str) -> SharedTable:
+        return self._tables[name]
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tables)
+
+    def close(self):
+        for table in self._tables.values():
+            table._load_value.cache_clear()
+        self._tables.clear()
+        self._buffer.close()
+
+    def __enter__(self) -> 'SharedCatalog':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -1,53 +1,205 @@
 import json
 import os
+import pickle
+import threading
+from collections.abc import Mapping
 
-from src.common.utils import decompress_data
+from src.bases.errors import Error
+from src.common.catalog import SharedCatalog, write_shared_catalog
+from src.common.utils import decompress_data, hash_file
+from src.common.profiling import PROFILER
+from src.common.diagnostics import DIAGNOSTICS
 from src.common.constants.dirs import DATA_DIR, TMR_DIR
 from config import DATA_ENCRYPTION_KEY
 
+# bump it when the cached data or its layout changes, older caches are then rebuilt
+CACHE_FORMAT_VERSION = 1
+CACHE_FILE_EXTENSION = '.pickle'
 
-def load_data_from_file(data_path: str, tmp_path: str) -> dict:
-    data = None
-    if os.path.exists(tmp_path):
-        data = json.load(open(tmp_path))
 
-    if not data:
-        data = decompress_data(
-            data=open(data_path, 'rb').read(),
-            encryption_key=DATA_ENCRYPTION_KEY
-        )
+def read_cache(cache_path: str, source_hash: str) -> dict | None:
+    """
+    The cached data if it was built from a source of `source_hash` by this format version.
+    The cache is two pickles, its header then the data, so a stale cache is rejected
+    without loading its data.
+    """
+    try:
+        with open(cache_path, 'rb') as fr:
+            header = pickle.load(fr)
+            if header != dict(format_version=CACHE_FORMAT_VERSION, source_hash=source_hash):
+                return None
+            return pickle.load(fr)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        # corrupted or from another Python, rebuilt from the source
+        return None
+
+
+def write_cache(cache_path: str, source_hash: str, data: dict):
+    # written aside and renamed, so concurrent readers never see a partial cache
+    tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fr:
+            pickle.dump(
+                dict(format_version=CACHE_FORMAT_VERSION, source_hash=source_hash),
+                fr,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+            pickle.dump(data, fr, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_data_from_file(data_path: str, tmp_path: str, source_hash: str = None) -> dict:
+    source_hash = source_hash or hash_file(data_path)
+
+    data = read_cache(tmp_path, source_hash)
+
+    if data is not None:
+        PROFILER.hit('catalog_cache')
+    else:
+        PROFILER.miss('catalog_cache')
+        with open(data_path, 'rb') as fr:
+            data = decompress_data(
+                data=fr.read(),
+                encryption_key=DATA_ENCRYPTION_KEY
+            )
         data = json.loads(data.decode())
 
-        with open(
-                tmp_path,
-                'w'
-        ) as fr:
-            fr.write(json.dumps(data))
+        write_cache(tmp_path, source_hash, data)
 
     return data
 
 
 PARSED_DATA_DIR = os.path.join(TMR_DIR, 'data')
 if not os.path.exists(PARSED_DATA_DIR):
-    os.makedirs(PARSED_DATA_DIR)
+    os.makedirs(PARSED_DATA_DIR, exist_ok=True)
 
-BASE_ITEMS = load_data_from_file(
-    data_path=os.path.join(DATA_DIR, 'base_items.dat'),
-    tmp_path=os.path.join(PARSED_DATA_DIR, 'base_items.json'),
-)
-ITEM_TYPES = load_data_from_file(
-    data_path=os.path.join(DATA_DIR, 'item_types.dat'),
-    tmp_path=os.path.join(PARSED_DATA_DIR, 'item_types.json'),
-)
-ITEM_BASE_MODS = load_data_from_file(
-    data_path=os.path.join(DATA_DIR, 'item_mods.dat'),
-    tmp_path=os.path.join(PARSED_DATA_DIR, 'item_mods.json'),
-)
-ITEM_BASE_STATS = load_data_from_file(
-    data_path=os.path.join(DATA_DIR, 'item_stats.dat'),
-    tmp_path=os.path.join(PARSED_DATA_DIR, 'item_stats.json'),
-)
-SKILLS = load_data_from_file(
-    data_path=os.path.join(DATA_DIR, 'skills.dat'),
-    tmp_path=os.path.join(PARSED_DATA_DIR, 'skills.json'),
+
+def get_catalog_source_path(name: str) -> str:
+    return os.path.join(DATA_DIR, f'{name}.dat')
+
+
+def load_catalog(name: str, source_hash: str = None) -> dict:
+    return load_data_from_file(
+        data_path=get_catalog_source_path(name),
+        tmp_path=os.path.join(PARSED_DATA_DIR, f'{name}{CACHE_FILE_EXTENSION}'),
+        source_hash=source_hash,
+    )
+
+
+CATALOG_NAMES = (
+    'base_items',
+    'item_types',
+    'item_mods',
+    'item_stats',
+    'skills',
 )
+
+# set by `publish_catalog`, the processes started afterwards map this file instead of loading the catalogs
+ENV_SHARED_CATALOG = 'D2S_SHARED_CATALOG'
+SHARED_CATALOG_FILE_NAME = 'catalog.shared'
+
+# the hashes of the sources of the catalogs, a shared catalog published from other sources is not used
+SOURCE_HASHES = {name: hash_file(get_catalog_source_path(name)) for name in CATALOG_NAMES}
+
+
+def make_catalog_metadata() -> dict:
+    return dict(format_version=CACHE_FORMAT_VERSION, source_hashes=SOURCE_HASHES)
+
+
+def open_shared_catalog(file_path: str) -> SharedCatalog | None:
+    """
+    The shared catalog at `file_path` if it was published from the current sources by this format version.
+    """
+    try:
+        result = SharedCatalog(file_path)
+    except (OSError, Error):
+        PROFILER.miss('shared_catalog')
+        return None
+
+    if result.metadata != make_catalog_metadata() or any(name not in result for name in CATALOG_NAMES):
+        result.close()
+        PROFILER.miss('shared_catalog')
+        DIAGNOSTICS.warning(
+            'StaleSharedCatalog',
+            'The shared catalog {path} was not published from the current data, loading the catalogs',
+            path=file_path
+        )
+        return None
+
+    PROFILER.hit('shared_catalog')
+    return result
+
+
+SHARED_CATALOG = None
+if os.environ.get(ENV_SHARED_CATALOG):
+    SHARED_CATALOG = open_shared_catalog(os.environ[ENV_SHARED_CATALOG])
+
+if SHARED_CATALOG is not None:
+    CATALOGS = {name: SHARED_CATALOG[name] for name in CATALOG_NAMES}
+else:
+    CATALOGS = {name: load_catalog(name, SOURCE_HASHES[name]) for name in CATALOG_NAMES}
+
+BASE_ITEMS = CATALOGS['base_items']
+ITEM_TYPES = CATALOGS['item_types']
+ITEM_BASE_MODS = CATALOGS['item_mods']
+ITEM_BASE_STATS = CATALOGS['item_stats']
+SKILLS = CATALOGS['skills']
+
+# fields of the catalogs looked up by value, their indexes are published with the catalogs
+CATALOG_INDEXES = {
+    'item_mods': ('id', 'code', 'stat_code'),
+    'item_stats': ('id',),
+    'skills': ('id',),
+}
+_CATALOG_INDEXES: dict[tuple[str, str], Mapping[str, str]] = dict()
+
+
+def make_catalog_index(table: Mapping, field: str) -> dict[str, str]:
+    """
+    The keys of a catalog by the str of a field of their values, the first key of a value is kept.
+    """
+    result = dict()
+    for key, value in table.items():
+        field_value = value.get(field)
+        if field_value is not None:
+            result.setdefault(str(field_value), key)
+    return result
+
+
+def get_catalog_index(name: str, field: str) -> Mapping[str, str]:
+    """
+    The keys of catalog `name` by `field`, mapped from the shared catalog when it has the index,
+    otherwise built on first use.
+    """
+    result = _CATALOG_INDEXES.get((name, field))
+    if result is None:
+        index_name = f'{name}.{field}'
+        if SHARED_CATALOG is not None and index_name in SHARED_CATALOG:
+            result = SHARED_CATALOG[index_name]
+        else:
+            result = make_catalog_index(CATALOGS[name], field)
+        _CATALOG_INDEXES[(name, field)] = result
+    return result
+
+
+def publish_catalog(file_path: str = None) -> str:
+    """
+    Writes the catalogs of this process and their indexes for the worker processes it starts afterwards,
+    which map them read-only instead of each loading its own copy.
+    """
+    file_path = file_path or os.path.join(PARSED_DATA_DIR, SHARED_CATALOG_FILE_NAME)
+
+    tables = dict(CATALOGS)
+    for name, fields in CATALOG_INDEXES.items():
+        for field in fields:
+            tables[f'{name}.{field}'] = get_catalog_index(name, field)
+
+    write_shared_catalog(file_path, tables, metadata=make_catalog_metadata())
+    os.environ[ENV_SHARED_CATALOG] = file_path
+    return file_path
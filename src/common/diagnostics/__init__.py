@@ -0,0 +1,117 @@
+"""
+Level gated diagnostics.
+
+Events are only built when their level is enabled and their message is formatted
+when it is read, so bulk operations pay nothing unless tracing is on.
+The level defaults to warning and can be set with `D2S_DIAGNOSTICS=trace|debug|info|warning|error`.
+Events go to the `d2s_editor` logger, or to the collectors opened with `DIAGNOSTICS.collect()`.
+"""
+import contextlib
+import logging
+import os
+
+TRACE = 5
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+LEVELS = {
+    'trace': TRACE,
+    'debug': DEBUG,
+    'info': INFO,
+    'warning': WARNING,
+    'error': ERROR,
+}
+
+ENV_DIAGNOSTICS_LEVEL = 'D2S_DIAGNOSTICS'
+
+logging.addLevelName(TRACE, 'TRACE')
+
+
+class DiagnosticEvent:
+
+    def __init__(self, level: int, code: str, message: str, meta: dict):
+        self.level = level
+        self.code = code
+        self.meta = meta
+
+        # formatted with the meta when read
+        self._message = message
+
+    @property
+    def message(self) -> str:
+        return self._message.format(**self.meta)
+
+    def output(self) -> dict:
+        return {
+            'level': logging.getLevelName(self.level),
+            'code': self.code,
+            'message': self.message,
+            'meta': self.meta,
+        }
+
+    def __str__(self):
+        return f'{self.code}: {self.message}'
+
+
+class Diagnostics:
+
+    def __init__(self, level: int = WARNING):
+        self.level = level
+        self.logger = logging.getLogger('d2s_editor')
+
+        self._collectors: list[list[DiagnosticEvent]] = []
+
+    def enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def emit(self, level: int, code: str, message: str, **meta):
+        if level < self.level:
+            return
+
+        event = DiagnosticEvent(level=level, code=code, message=message, meta=meta)
+
+        if self._collectors:
+            for collector in self._collectors:
+                collector.append(event)
+        else:
+            self.logger.log(level, '%s', event)
+
+    def trace(self, code: str, message: str, **meta):
+        self.emit(TRACE, code, message, **meta)
+
+    def debug(self, code: str, message: str, **meta):
+        self.emit(DEBUG, code, message, **meta)
+
+    def info(self, code: str, message: str, **meta):
+        self.emit(INFO, code, message, **meta)
+
+    def warning(self, code: str, message: str, **meta):
+        self.emit(WARNING, code, message, **meta)
+
+    def error(self, code: str, message: str, **meta):
+        self.emit(ERROR, code, message, **meta)
+
+    @contextlib.contextmanager
+    def collect(self, level: int = None):
+        """
+        Collects the events of a block instead of logging them,
+        `level` temporarily changes the enabled level.
+        """
+        collector = []
+        previous_level = self.level
+        if level is not None:
+            self.level = level
+
+        self._collectors.append(collector)
+        try:
+            yield collector
+        finally:
+            self._collectors.remove(collector)
+            self.level = previous_level
+
+
+DIAGNOSTICS = Diagnostics(
+    level=LEVELS.get(os.environ.get(ENV_DIAGNOSTICS_LEVEL, '').lower(), WARNING)
+)
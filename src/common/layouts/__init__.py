@@ -0,0 +1,133 @@
+"""
+Save and item structures by file version.
+
+A `FormatLayout` holds the structures of a version, `Character` selects one from the version
+of its save when loaded and hands it to its items. Saves of versions without a registered layout
+use `DEFAULT_LAYOUT`. Other formats are registered once at startup:
+
+    register_layout(FormatLayout(99, structure=..., base_structure=..., non_ear_structure=...))
+
+The byte aligned character header is compiled into a `struct` layout reading or writing every field in one call:
+
+    layout = get_layout(version)
+    header = layout.header.unpack(data)
+    data = layout.header.pack(header._replace(character_level=90))
+
+Fields of 1, 2 and 4 bytes are little endian unsigned integers, the others are bytes.
+Bytes between two fields are read and written back as `gap_<index>` fields.
+"""
+import struct
+from collections import namedtuple
+
+from src.bases.errors import Error
+from src.common.constants.character import STRUCTURE
+from src.common.constants.items import BASE_STRUCTURE, NON_EAR_STRUCTURE
+
+INTEGER_FORMATS = {
+    1: 'B',
+    2: 'H',
+    4: 'I',
+}
+
+
+class StructLayout:
+
+    def __init__(self, name: str, structure: dict[str, tuple[int, int]]):
+        self.name = name
+        self.structure = structure
+
+        fields = sorted(structure.items(), key=lambda field: field[1][0])
+
+        struct_format = '<'
+        field_names = []
+        position = 0
+        for field_name, (index, length) in fields:
+            if index < position:
+                raise Error(
+                    'InvalidStructure',
+                    f'Field {field_name} of {name} overlaps the previous field'
+                )
+            if index > position:
+                # bytes between the fields are kept as they are, in a field of their own
+                field_names.append(self._make_gap_name(position, structure))
+                struct_format += f'{index - position}s'
+            field_names.append(field_name)
+            struct_format += INTEGER_FORMATS.get(length, f'{length}s')
+            position = index + length
+
+        self.field_names = tuple(field_names)
+        self.record_class = namedtuple(name, self.field_names)
+        self._struct = struct.Struct(struct_format)
+
+    @staticmethod
+    def _make_gap_name(index: int, structure: dict) -> str:
+        result = f'gap_{index}'
+        if result in structure:
+            raise Error(
+                'InvalidStructure',
+                f'Field {result} clashes with the gap at {index}'
+            )
+        return result
+
+    @property
+    def size(self) -> int:
+        return self._struct.size
+
+    def unpack(self, data: bytes):
+        if len(data) < self.size:
+            raise Error(
+                'InvalidStructure',
+                f'{self.name} needs {self.size} bytes, got {len(data)}'
+            )
+        return self.record_class._make(self._struct.unpack_from(data))
+
+    def pack(self, record) -> bytes:
+        return self._struct.pack(*record)
+
+
+class FormatLayout:
+    """
+    The structures of a file version, `None` for the default one.
+    Every format keeps the version field where `STRUCTURE` has it, it is read before the layout is known.
+    """
+
+    def __init__(self,
+                 version: int | None,
+                 structure: dict[str, tuple[int, int]] = STRUCTURE,
+                 base_structure: dict[str, tuple[int, int]] = BASE_STRUCTURE,
+                 non_ear_structure: dict[str, tuple[int, int]] = NON_EAR_STRUCTURE):
+        if structure['version'] != STRUCTURE['version']:
+            raise Error(
+                'InvalidStructure',
+                f'The version field of format {version} moved'
+            )
+
+        self.version = version
+        self.structure = structure
+        self.base_structure = base_structure
+        self.non_ear_structure = non_ear_structure
+
+        self.header = StructLayout('CharacterHeader', structure)
+
+    def __repr__(self):
+        return f'FormatLayout({self.version!r})'
+
+
+VERSION_INDEX, VERSION_LENGTH = STRUCTURE['version']
+
+DEFAULT_LAYOUT = FormatLayout(None)
+
+LAYOUTS: dict[int, FormatLayout] = dict()
+
+
+def register_layout(layout: FormatLayout) -> FormatLayout:
+    LAYOUTS[layout.version] = layout
+    return layout
+
+
+def get_layout(version: int | None) -> FormatLayout:
+    return LAYOUTS.get(version, DEFAULT_LAYOUT)
+
+
+def read_version(data: bytes) -> int:
+    return int.from_bytes(data[VERSION_INDEX:VERSION_INDEX + VERSION_LENGTH], 'little')
@@ -0,0 +1,168 @@
+"""
+Advisory file locks.
+
+A lock of `path` is held on the sidecar `<path>.lock` with `fcntl.flock`, so that files
+replaced by a rename keep the same lock. Within a process, the lock of a path is reentrant
+for the thread holding it and the other threads wait for it like other processes do.
+Without `fcntl` (Windows), only the threads of the process are serialized.
+"""
+import contextlib
+import os
+import threading
+import time
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.bases.errors import Error
+
+ENV_LOCK_TIMEOUT = 'D2S_LOCK_TIMEOUT'
+DEFAULT_LOCK_TIMEOUT = float(os.environ.get(ENV_LOCK_TIMEOUT, 30))
+LOCK_FILE_EXTENSION = '.lock'
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.2
+
+
+class _ProcessLock:
+
+    def __init__(self):
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+
+_registry: dict[str, _ProcessLock] = dict()
+_registry_lock = threading.Lock()
+
+
+def _get_process_lock(path: str) -> _ProcessLock:
+    with _registry_lock:
+        result = _registry.get(path)
+        if result is None:
+            result = _registry[path] = _ProcessLock()
+        return result
+
+
+def make_lock_path(path: str) -> str:
+    return os.path.abspath(path) + LOCK_FILE_EXTENSION
+
+
+class FileLock:
+    """
+    Exclusive, or `shared`, lock of a file for a block:
+
+        with FileLock(file_path, timeout=5):
+            ...
+
+    Nested locks of the same path in a thread take the mode of the outermost one.
+    Raises `LockTimeout` when the lock is not acquired within `timeout` seconds,
+    None waits forever.
+    """
+
+    def __init__(self, path: str, shared: bool = False, timeout: float | None = DEFAULT_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_path = make_lock_path(path)
+        self.shared = shared
+        self.timeout = timeout
+
+        self._process_lock = _get_process_lock(self.lock_path)
+
+    def _raise_timeout(self):
+        raise Error(
+            'LockTimeout',
+            f'Timed out after {self.timeout}s waiting for the lock of {self.path}'
+        )
+
+    def acquire(self):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        process_lock = self._process_lock
+        if not process_lock.thread_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            self._raise_timeout()
+
+        if process_lock.depth == 0:
+            try:
+                process_lock.fd = self._lock_file(deadline)
+            except BaseException:
+                process_lock.thread_lock.release()
+                raise
+
+        process_lock.depth += 1
+
+    def _lock_file(self, deadline: float | None) -> int | None:
+        if fcntl is None:
+            return None
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+
+        interval = POLL_INTERVAL
+        while True:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                pass
+            except BaseException:
+                os.close(fd)
+                raise
+
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                self._raise_timeout()
+
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def release(self):
+        process_lock = self._process_lock
+        process_lock.depth -= 1
+
+        if process_lock.depth == 0 and process_lock.fd is not None:
+            try:
+                fcntl.flock(process_lock.fd, fcntl.LOCK_UN)
+            finally:
+                os.close(process_lock.fd)
+                process_lock.fd = None
+
+        process_lock.thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+
+@contextlib.contextmanager
+def replace_file(file_path: str,
+                 mode: str = 'wb',
+                 timeout: float | None = DEFAULT_LOCK_TIMEOUT) -> Iterator[IO]:
+    """
+    Opens a temporary file, renamed over `file_path` under its lock when the block succeeds,
+    for files written in parts. A failed block leaves the file as it was.
+    """
+    with FileLock(file_path, timeout=timeout):
+        tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, mode) as file_ref:
+                yield file_ref
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def write_file(file_path: str, data: bytes, timeout: float | None = DEFAULT_LOCK_TIMEOUT):
+    """
+    Writes a file under its lock, through a temporary file renamed over it
+    so readers never see a partial write.
+    """
+    with replace_file(file_path, timeout=timeout) as file_ref:
+        file_ref.write(data)
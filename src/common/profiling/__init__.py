@@ -0,0 +1,148 @@
+"""
+Opt-in instrumentation of the parse and save phases.
+
+Set `D2S_PROFILE=1` to record per-phase wall time, call counts and counters,
+and `D2S_PROFILE_DUMP=<path>` to also run cProfile and dump its pstats there on exit.
+When disabled, `PROFILER.phase` returns a shared no-op context manager.
+"""
+import atexit
+import cProfile
+import contextlib
+import os
+import time
+
+ENV_PROFILE = 'D2S_PROFILE'
+ENV_PROFILE_DUMP = 'D2S_PROFILE_DUMP'
+
+NULL_PHASE = contextlib.nullcontext()
+
+
+class PhaseStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+
+    def to_dict(self) -> dict:
+        return dict(
+            calls=self.calls,
+            total_time=self.total_time,
+            mean_time=self.total_time / self.calls if self.calls else 0.0,
+        )
+
+
+class Phase:
+
+    def __init__(self, stats: PhaseStats):
+        self.stats = stats
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.calls += 1
+        self.stats.total_time += time.perf_counter() - self.start
+        return False
+
+
+class Profiler:
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases: dict[str, PhaseStats] = dict()
+        self.counters: dict[str, int] = dict()
+
+        self._cprofile = None
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return NULL_PHASE
+
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+        return Phase(stats)
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def hit(self, cache_name: str):
+        self.count(f'{cache_name}.hits')
+
+    def miss(self, cache_name: str):
+        self.count(f'{cache_name}.misses')
+
+    def enable(self, cprofile: bool = False):
+        self.enabled = True
+        if cprofile and self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def disable(self):
+        self.enabled = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def reset(self):
+        self.phases = dict()
+        self.counters = dict()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile = cProfile.Profile()
+            if self.enabled:
+                self._cprofile.enable()
+
+    def stats(self) -> dict:
+        return dict(
+            phases={
+                name: stats.to_dict()
+                for name, stats in self.phases.items()
+            },
+            counters=dict(self.counters),
+        )
+
+    def report(self) -> str:
+        lines = [f'{"phase":<32}{"calls":>10}{"total (ms)":>14}{"mean (us)":>14}']
+        for name, stats in sorted(self.phases.items()):
+            info = stats.to_dict()
+            lines.append(
+                f'{name:<32}{info["calls"]:>10}{info["total_time"] * 1000:>14.2f}{info["mean_time"] * 1e6:>14.2f}'
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{name:<32}{value:>10}')
+        return '\n'.join(lines)
+
+    def dump_cprofile(self, file_path: str):
+        if self._cprofile is None:
+            return
+        self._cprofile.disable()
+        self._cprofile.dump_stats(file_path)
+        if self.enabled:
+            self._cprofile.enable()
+
+    @contextlib.contextmanager
+    def session(self, cprofile: bool = False):
+        """
+        Profiles a block of code, the profiler is reset when entering it.
+        """
+        was_enabled = self.enabled
+        self.reset()
+        self.enable(cprofile=cprofile)
+        try:
+            yield self
+        finally:
+            if not was_enabled:
+                self.disable()
+
+
+PROFILER = Profiler()
+
+if os.environ.get(ENV_PROFILE) or os.environ.get(ENV_PROFILE_DUMP):
+    PROFILER.enable(cprofile=bool(os.environ.get(ENV_PROFILE_DUMP)))
+
+    if os.environ.get(ENV_PROFILE_DUMP):
+        atexit.register(PROFILER.dump_cprofile, os.environ[ENV_PROFILE_DUMP])
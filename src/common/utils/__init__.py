@@ -1,8 +1,10 @@
+import hashlib
 import io
 import os
 import zlib
 import uuid
 from itertools import zip_longest
+from typing import Any, Callable, Iterable, Iterator
 from cryptography.fernet import Fernet
 
 from config import ROOT_PATH
@@ -114,6 +116,28 @@ def get_dict_key_from_value(data: dict, value: any):
     return result
 
 
+_NOT_LOADED = object()
+
+
+class LazyDenseTable:
+    """
+    Values indexed by integer ids, each built by `load` on its first lookup.
+    """
+
+    def __init__(self, size: int, load: Callable[[int], Any]):
+        self._values = [_NOT_LOADED] * size
+        self._load = load
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, index: int):
+        value = self._values[index]
+        if value is _NOT_LOADED:
+            value = self._values[index] = self._load(index)
+        return value
+
+
 def decompress_data(data: bytes, encryption_key: str = None) -> bytes:
     if encryption_key:
         cipher_suite = Fernet(encryption_key)
@@ -135,24 +159,89 @@ def compress_data(data: bytes, encryption_key: str = None) -> bytes:
     return compressed_data
 
 
-def convert_tsv_to_json(data: str) -> list:
-    file = io.BytesIO(data.encode())
+def hash_file(file_path: str) -> str:
+    result = hashlib.sha256()
+    with open(file_path, 'rb') as fr:
+        for chunk in iter(lambda: fr.read(1024 * 1024), b''):
+            result.update(chunk)
+    return result.hexdigest()
+
 
-    result = []
-    first_line = file.readline().decode()
+def iter_tsv_rows(lines: Iterable[str]) -> Iterator[dict[str, str]]:
+    """
+    Yields the rows of TSV lines as dicts keyed by the titles of the first line.
+    """
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
 
-    # The first line consist of headings of the record,
-    # so we will store it in an array and move to
-    # next line in input_file.
     titles = [t.strip() for t in first_line.split('\t')]
 
-    for index, line in enumerate(file):
-        d = dict()
-        for t, f in zip(titles, line.decode().split('\t')):
-            # Convert each row into dictionary with keys as titles
-            d[t] = f.strip()
+    for line in lines:
+        # strip removes the line ending too
+        yield {
+            t: f.strip()
+            for t, f in zip(titles, line.split('\t'))
+        }
 
-            # we will use strip to remove '\n'.
-        result.append(d)
 
-    return result
+def convert_tsv_to_json(data: str) -> list:
+    return list(iter_tsv_rows(io.StringIO(data)))
+
+
+class TsvColumn:
+    """
+    A column read by `TsvReader`: its stripped value goes through `converter`,
+    `default` is used when the converter fails or the column is missing.
+    """
+
+    def __init__(self, name: str, converter: Callable[[str], Any] = str, default: Any = None):
+        self.name = name
+        self.converter = converter
+        self.default = default
+
+
+class TsvReader:
+    """
+    Reads only the declared columns of TSV lines, as typed values:
+
+        reader = TsvReader([TsvColumn('bits', int, 0), TsvColumn('stat')])
+        for row in reader.iter_rows(lines):
+            ...
+    """
+
+    def __init__(self, columns: list[TsvColumn]):
+        self.columns = columns
+
+    def _convert(self, column: TsvColumn, value: str):
+        if column.converter is str:
+            return value
+        try:
+            return column.converter(value)
+        except (TypeError, ValueError):
+            return column.default
+
+    def iter_rows(self, lines: Iterable[str]) -> Iterator[dict]:
+        lines = iter(lines)
+        first_line = next(lines, None)
+        if first_line is None:
+            return
+
+        # as with dicts, the last of duplicated titles wins
+        positions = {t.strip(): i for i, t in enumerate(first_line.split('\t'))}
+        plan = [
+            (column, positions.get(column.name))
+            for column in self.columns
+        ]
+
+        for line in lines:
+            fields = line.split('\t')
+            total_fields = len(fields)
+            row = dict()
+            for column, position in plan:
+                if position is None or position >= total_fields:
+                    row[column.name] = column.default
+                else:
+                    row[column.name] = self._convert(column, fields[position].strip())
+            yield row
@@ -0,0 +1,469 @@
+"""
+Local editing daemon.
+
+Keeps the catalogs and the opened characters in memory and serves JSON-RPC 2.0 requests,
+one JSON object per line, over a Unix socket or a localhost TCP port:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "load", "params": {"path": "my_char.d2s"}}
+
+Paths are resolved like the other tools, relative to the d2s storage directory, and cannot leave it.
+Calls on the same file are serialized, calls on different files run concurrently.
+"""
+import asyncio
+import inspect
+import json
+import os
+import socket
+
+from src.bases.errors import Error
+from src.caches import CharacterCache
+from src.common.constants.dirs import D2S_STORAGE_DIR, TMR_DIR
+from src.common.diagnostics import DIAGNOSTICS
+from src.common.profiling import PROFILER
+from src.journal import Journal
+from src.models.character import Character
+from src.models.item import Item
+
+DEFAULT_SOCKET_PATH = os.path.join(TMR_DIR, 'd2s_editor.sock')
+DEFAULT_HOST = '127.0.0.1'
+
+JSONRPC_VERSION = '2.0'
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+APPLICATION_ERROR = -32000
+
+# methods which can be called by edit operations
+ITEM_METHODS = {
+    'add_mod',
+    'change_code',
+    'change_level',
+    'change_max_durability',
+    'change_position',
+    'change_rarity',
+    'clear_mods',
+    'corrupt',
+    'delete_mod',
+    'edit_mod',
+    'maximize_affixes',
+    'maximize_sockets',
+    'set_ethereal',
+    'shrine_bless',
+    'update_id',
+    'upgrade',
+}
+CHARACTER_METHODS = {
+    'add_items',
+    'change_act',
+    'duplicate_items',
+}
+ITEM_LISTS = {
+    'items',
+    'merc_items',
+}
+
+
+def resolve_path(path: str) -> str:
+    """
+    Paths of the requests are relative to the d2s storage directory, they cannot leave it.
+    """
+    storage_dir = os.path.realpath(D2S_STORAGE_DIR)
+    result = os.path.realpath(os.path.join(storage_dir, path))
+    if os.path.commonpath([storage_dir, result]) != storage_dir:
+        raise Error(
+            'InvalidPath',
+            f'{path} is outside of the storage directory'
+        )
+    return result
+
+
+def get_file_key(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def item_summary(index: int, item: Item, mods: bool = False) -> dict:
+    result = dict(
+        index=index,
+        code=item.code,
+        unique_id=item.id,
+        location=item.location,
+        storage=item.storage,
+        storage_x=item.storage_x,
+        storage_y=item.storage_y,
+        rarity=item.rarity,
+        level=item.level,
+        is_ethereal=item.is_ethereal,
+    )
+    if mods:
+        result['mods'] = [
+            dict(id=mod.id, **mod.property_values.model_dump(exclude_none=True))
+            for mod in item.mods
+        ]
+        result['rw_mods'] = [
+            dict(id=mod.id, **mod.property_values.model_dump(exclude_none=True))
+            for mod in item.rw_mods
+        ]
+    return result
+
+
+class Session:
+    """
+    An opened character, its edits are recorded in a journal until saved.
+    """
+
+    def __init__(self, path: str, character: Character):
+        self.path = path
+        self.file_key = get_file_key(path)
+        self.character = character
+
+        self.journal = Journal(self.character)
+        self.saved_position = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self.journal.position != self.saved_position
+
+    def summary(self) -> dict:
+        return dict(
+            path=self.path,
+            version=self.character.version,
+            total_items=len(self.character.items),
+            total_merc_items=len(self.character.merc_items),
+            difficulties=self.character.difficulties,
+            dirty=self.dirty,
+            can_undo=self.journal.can_undo,
+            can_redo=self.journal.can_redo,
+        )
+
+
+class Daemon:
+
+    def __init__(self, cache: CharacterCache = None):
+        self.sessions: dict[str, Session] = dict()
+        self.cache = cache or CharacterCache()
+
+        self._locks: dict[str, asyncio.Lock] = dict()
+        self._methods = {
+            'ping': self.ping,
+            'load': self.load,
+            'query': self.query,
+            'edit': self.edit,
+            'undo': self.undo,
+            'redo': self.redo,
+            'save': self.save,
+            'close': self.close,
+            'stats': self.stats,
+        }
+
+    def _get_lock(self, path: str) -> asyncio.Lock:
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks[path] = asyncio.Lock()
+        return lock
+
+    def _open(self, path: str, reload: bool = False) -> Session:
+        session = self.sessions.get(path)
+
+        # unsaved edits are kept even if the file changed on disk
+        if session is not None and not reload and (session.dirty or session.file_key == get_file_key(path)):
+            PROFILER.hit('daemon_sessions')
+            return session
+
+        PROFILER.miss('daemon_sessions')
+        if reload:
+            self.cache.invalidate(path)
+        session = self.sessions[path] = Session(path, self.cache.get(path))
+        return session
+
+    def _get_session(self, path: str) -> Session:
+        session = self.sessions.get(path)
+        if session is None:
+            session = self._open(path)
+        return session
+
+    async def _run(self, path: str, func, *args):
+        """
+        Runs blocking work on a file in a thread, one call per file at a time.
+        """
+        path = resolve_path(path)
+        async with self._get_lock(path):
+            return await asyncio.to_thread(func, path, *args)
+
+    async def ping(self) -> str:
+        return 'pong'
+
+    async def load(self, path: str, reload: bool = False) -> dict:
+        def func(_path):
+            return self._open(_path, reload=reload).summary()
+        return await self._run(path, func)
+
+    async def query(self,
+                    path: str,
+                    list_name: str = 'items',
+                    filters: dict = None,
+                    mods: bool = False) -> list[dict]:
+        if list_name not in ITEM_LISTS:
+            raise Error('InvalidParams', f'Unsupported item list: {list_name}')
+
+        def func(_path):
+            items = getattr(self._get_session(_path).character, list_name)
+            result = []
+            for index, item in enumerate(items):
+                summary = item_summary(index, item, mods=mods)
+                if filters and any(summary.get(k) != v for k, v in filters.items()):
+                    continue
+                result.append(summary)
+            return result
+        return await self._run(path, func)
+
+    @staticmethod
+    def _get_item(items: list[Item], index) -> Item:
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(items):
+            raise Error('InvalidParams', f'No item at index {index!r}')
+        return items[index]
+
+    @classmethod
+    def _apply_operation(cls, character: Character, operation: dict):
+        """
+        Operations are checked before they run, bad params raise `InvalidParams`.
+        """
+        if not isinstance(operation, dict):
+            raise Error('InvalidParams', f'Invalid operation: {operation!r}')
+
+        method = operation.get('method')
+        params = operation.get('params') or dict()
+        if not isinstance(params, dict):
+            raise Error('InvalidParams', f'Params of {method} must be an object')
+        params = dict(params)
+
+        if 'item' in operation:
+            if method not in ITEM_METHODS:
+                raise Error('InvalidParams', f'Unsupported item method: {method}')
+            list_name = operation.get('list_name', 'items')
+            if list_name not in ITEM_LISTS:
+                raise Error('InvalidParams', f'Unsupported item list: {list_name}')
+            target = cls._get_item(getattr(character, list_name), operation['item'])
+        else:
+            if method not in CHARACTER_METHODS:
+                raise Error('InvalidParams', f'Unsupported character method: {method}')
+            target = character
+            if method == 'duplicate_items':
+                params['item'] = cls._get_item(character.items, params.get('item'))
+            elif method == 'add_items':
+                # the item files are read from the storage directory too
+                if params.get('dir_path'):
+                    resolve_path(params['dir_path'])
+                for item_data in params.get('item_list') or []:
+                    if isinstance(item_data, dict) and 'path' in item_data:
+                        resolve_path(item_data['path'])
+
+        func = getattr(target, method)
+        try:
+            inspect.signature(func).bind(**params)
+        except TypeError as e:
+            raise Error('InvalidParams', f'{method}: {e}')
+
+        func(**params)
+
+    async def edit(self, path: str, operations: list[dict], label: str = None) -> dict:
+        """
+        Applies the operations as one journal entry, none of them is kept if one fails.
+        """
+        if not isinstance(operations, list):
+            raise Error('InvalidParams', 'Operations must be a list')
+
+        def func(_path):
+            session = self._get_session(_path)
+            with session.journal.record(label=label):
+                for operation in operations:
+                    self._apply_operation(session.character, operation)
+            return session.summary()
+        return await self._run(path, func)
+
+    async def undo(self, path: str) -> dict:
+        def func(_path):
+            session = self._get_session(_path)
+            session.journal.undo()
+            return session.summary()
+        return await self._run(path, func)
+
+    async def redo(self, path: str) -> dict:
+        def func(_path):
+            session = self._get_session(_path)
+            session.journal.redo()
+            return session.summary()
+        return await self._run(path, func)
+
+    async def save(self, path: str, output_path: str = None, backup_path: str = None) -> dict:
+        # resolved before the work is queued, a rejected path fails without waiting for the file
+        _output_path = resolve_path(output_path) if output_path else None
+        _backup_path = resolve_path(backup_path) if backup_path else None
+
+        def func(_path):
+            session = self._get_session(_path)
+            if _output_path:
+                session.character.save(_output_path, backup_path=_backup_path)
+                return session.summary()
+
+            self.cache.save(session.character, _path, backup_path=_backup_path)
+            session.file_key = get_file_key(_path)
+            session.saved_position = session.journal.position
+            return session.summary()
+        return await self._run(path, func)
+
+    async def close(self, path: str) -> bool:
+        def func(_path):
+            session = self.sessions.pop(_path, None)
+            if session is None:
+                return False
+            # drop the unsaved edits of the shared character
+            if session.dirty:
+                self.cache.invalidate(_path)
+            return True
+        return await self._run(path, func)
+
+    async def stats(self) -> dict:
+        return dict(
+            sessions=[
+                dict(path=session.path, dirty=session.dirty)
+                for session in self.sessions.values()
+            ],
+            cache=self.cache.stats(),
+            profile=PROFILER.stats(),
+        )
+
+    @staticmethod
+    def _make_error(request_id, code: int, message: str, data: dict = None) -> dict:
+        error = dict(code=code, message=message)
+        if data is not None:
+            error['data'] = data
+        return dict(jsonrpc=JSONRPC_VERSION, id=request_id, error=error)
+
+    async def handle(self, request) -> dict | None:
+        """
+        Returns the response of a decoded request.
+        Notifications, requests without an id, are run but never answered, even when they fail.
+        """
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return self._make_error(None, INVALID_REQUEST, 'Invalid request')
+
+        response = await self._call(request)
+        if 'id' not in request:
+            return None
+        return response
+
+    async def _call(self, request: dict) -> dict:
+        request_id = request.get('id')
+        method = self._methods.get(request['method'])
+        if method is None:
+            return self._make_error(request_id, METHOD_NOT_FOUND, f'Method not found: {request["method"]}')
+
+        params = request.get('params') or dict()
+        try:
+            if isinstance(params, list):
+                arguments = inspect.signature(method).bind(*params)
+            else:
+                arguments = inspect.signature(method).bind(**params)
+        except TypeError as e:
+            return self._make_error(request_id, INVALID_PARAMS, str(e))
+
+        try:
+            with PROFILER.phase(f'daemon.{request["method"]}'):
+                result = await method(*arguments.args, **arguments.kwargs)
+        except Error as e:
+            code = INVALID_PARAMS if e.code == 'InvalidParams' else APPLICATION_ERROR
+            return self._make_error(request_id, code, e.message or e.code, data=e.output())
+        except Exception as e:
+            return self._make_error(request_id, INTERNAL_ERROR, f'{e.__class__.__name__}: {e}')
+
+        return dict(jsonrpc=JSONRPC_VERSION, id=request_id, result=result)
+
+    async def handle_line(self, line: bytes) -> dict | None:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self._make_error(None, PARSE_ERROR, f'Parse error: {e}')
+        return await self.handle(request)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self.handle_line(line)
+                if response is not None:
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_unix(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=socket_path, limit=2 ** 24)
+        DIAGNOSTICS.info('DaemonStarted', 'Listening on {address}', address=socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    async def serve_tcp(self, port: int, host: str = DEFAULT_HOST):
+        server = await asyncio.start_server(self._handle_connection, host=host, port=port, limit=2 ** 24)
+        DIAGNOSTICS.info('DaemonStarted', 'Listening on {address}', address=f'{host}:{port}')
+        async with server:
+            await server.serve_forever()
+
+
+class Client:
+    """
+    Blocking client for scripts:
+
+        client = Client()
+        client.call('load', path='my_char.d2s')
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, port: int = None, host: str = DEFAULT_HOST):
+        if port is not None:
+            self._socket = socket.create_connection((host, port))
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+        self._file = self._socket.makefile('rb')
+        self._next_id = 0
+
+    def call(self, method: str, **params):
+        self._next_id += 1
+        request = dict(jsonrpc=JSONRPC_VERSION, id=self._next_id, method=method, params=params)
+        self._socket.sendall(json.dumps(request).encode() + b'\n')
+
+        response = json.loads(self._file.readline())
+        if 'error' in response:
+            error = response['error']
+            data = error.get('data') or dict()
+            raise Error(
+                data.get('code', 'DaemonError'),
+                error['message'],
+                meta=dict(rpc_code=error['code'])
+            )
+        return response['result']
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,30 @@
+"""
+Runs the editing daemon:
+
+    python -m src.daemon [--socket path | --port 8765]
+"""
+import argparse
+import asyncio
+
+from src.daemon import Daemon, DEFAULT_SOCKET_PATH, DEFAULT_HOST
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local editing daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Unix socket path')
+    parser.add_argument('--port', type=int, help='listen on a localhost TCP port instead of the Unix socket')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    args = parser.parse_args()
+
+    daemon = Daemon()
+    try:
+        if args.port is not None:
+            asyncio.run(daemon.serve_tcp(port=args.port, host=args.host))
+        else:
+            asyncio.run(daemon.serve_unix(socket_path=args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,568 @@
+"""
+Item level diff of two saves.
+
+The item lists are only split and hashed, the items are aligned by their unique id
+falling back to a hash of their content, and only the items that changed are parsed to compare their mods.
+A diff produces a `SavePatch` which replays the changes on another save:
+
+    diff = diff_saves(old_data, new_data)
+    data = diff.patch.apply(other_data)
+"""
+from src.bases.errors import Error
+from src.common.constants.character import (
+    ITEM_LIST_HEADER, ITEM_LIST_FOOTER, MERC_ITEM_LIST_HEADER, FOOTER, ITEM_HEADER,
+    DIFFICULTY_INDEX_MAPPING,
+)
+from src.common.constants.items import LOCATIONS
+from src.common.layouts import FormatLayout, DEFAULT_LAYOUT, get_layout, read_version
+from src.common.profiling import PROFILER
+from src.common.utils import make_byte_array_from_hex
+from src.models.character import Character, CharacterDifficulty
+from src.models.item import Item
+from src.peek import read_field
+from src.storage import hash_item_data
+
+ITEM_LISTS = (
+    'items',
+    'merc_items',
+)
+
+# written when saving, never reported
+COMPUTED_FIELDS = (
+    'file_size',
+    'checksum',
+)
+DIFFICULTY_FIELD = 'difficulty'
+# the sections between the header structure and the item list are not decoded
+EXTENDED_FIELD = 'extended'
+
+POSITION_FIELDS = (
+    'location',
+    'equipped_location',
+    'storage',
+    'storage_x',
+    'storage_y',
+)
+
+SOCKETED_LOCATION = next(k for k, v in LOCATIONS.items() if v == 'socketed')
+
+
+class RawItem:
+    """
+    An item of a save as bytes, with the fields needed to align it read from the fixed offsets of its layout.
+    """
+
+    def __init__(self, data: bytes, layout: FormatLayout = DEFAULT_LAYOUT):
+        self.data = data
+        self.layout = layout
+
+        self._value = int.from_bytes(data, 'little')
+        self._hash = None
+
+    @property
+    def has_id(self) -> bool:
+        return not (
+            read_field(self._value, self.layout.base_structure, 'is_ear')
+            or read_field(self._value, self.layout.base_structure, 'is_simple')
+        )
+
+    @property
+    def unique_id(self) -> int | None:
+        if not self.has_id:
+            return None
+        return read_field(self._value, self.layout.non_ear_structure, 'unique_id')
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Hash of the item without its unique id and position.
+        """
+        if self._hash is None:
+            self._hash = hash_item_data(self.data, layout=self.layout)
+        return self._hash
+
+    @property
+    def code(self) -> str | None:
+        if read_field(self._value, self.layout.base_structure, 'is_ear'):
+            return None
+        value = read_field(self._value, self.layout.non_ear_structure, 'code')
+        return value.to_bytes(4, 'little').decode('latin-1').strip()
+
+    @property
+    def position(self) -> dict:
+        return {
+            field: read_field(self._value, self.layout.base_structure, field)
+            for field in POSITION_FIELDS
+        }
+
+    @property
+    def is_socketed(self) -> bool:
+        return read_field(self._value, self.layout.base_structure, 'location') == SOCKETED_LOCATION
+
+    def output(self) -> dict:
+        return dict(
+            code=self.code,
+            unique_id=self.unique_id,
+            position=self.position,
+        )
+
+
+class SaveLayout:
+    """
+    Raw sections of a save, laid out as `Character.save` writes them,
+    the fields are read with the format layout of its version.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.format_layout = get_layout(read_version(data))
+
+        header_index = data.find(bytes.fromhex(''.join(ITEM_LIST_HEADER)))
+        footer_index = data.find(bytes.fromhex(''.join(ITEM_LIST_FOOTER)))
+        if header_index < 0 or footer_index < 0:
+            raise Error(
+                'InvalidSave',
+                'Item list not found'
+            )
+
+        self.header = data[:header_index]
+        self.items = self._split_items(data[header_index + 4:footer_index], self.format_layout)
+
+        self.merc_items = None
+        merc_name_id_index, merc_name_id_length = self.format_layout.structure['mercenary_name_id']
+        if int.from_bytes(data[merc_name_id_index:merc_name_id_index + merc_name_id_length], 'little'):
+            merc_header_index = data.find(
+                bytes.fromhex(''.join(MERC_ITEM_LIST_HEADER)),
+                footer_index + len(ITEM_LIST_FOOTER)
+            )
+            self.merc_items = self._split_items(data[merc_header_index + 4:len(data) - len(FOOTER)], self.format_layout)
+
+    @staticmethod
+    def _split_items(data: bytes, layout: FormatLayout) -> list[RawItem]:
+        item_header = bytes.fromhex(''.join(ITEM_HEADER))
+        return [
+            RawItem(item_header + i, layout=layout)
+            for i in data.split(item_header)
+            if i
+        ]
+
+    def get_items(self, list_name: str) -> list[RawItem] | None:
+        return getattr(self, list_name)
+
+    def read_header(self, field: str) -> bytes:
+        if field == EXTENDED_FIELD:
+            index, length = self.format_layout.structure['npc']
+            return self.header[index + length:]
+        index, length = self.format_layout.structure[field]
+        return self.header[index:index + length]
+
+    def write_header(self, field: str, value: bytes):
+        if field == EXTENDED_FIELD:
+            index, length = self.format_layout.structure['npc']
+            self.header = self.header[:index + length] + value
+            return
+        index, length = self.format_layout.structure[field]
+        self.header = self.header[:index] + value + self.header[index + length:]
+
+    @staticmethod
+    def _encode_items(items: list[RawItem]) -> bytes:
+        total = sum(1 for item in items if not item.is_socketed)
+        return total.to_bytes(2, 'little') + b''.join(item.data for item in items)
+
+    def to_bytes(self) -> bytes:
+        result = bytearray(self.header)
+        result += bytes.fromhex(''.join(ITEM_LIST_HEADER))
+        result += self._encode_items(self.items)
+        result += bytes.fromhex(''.join(ITEM_LIST_FOOTER))
+        if self.merc_items is not None:
+            result += bytes.fromhex(''.join(MERC_ITEM_LIST_HEADER))
+            result += self._encode_items(self.merc_items)
+        result += bytes.fromhex(''.join(FOOTER))
+
+        file_size_index, file_size_length = self.format_layout.structure['file_size']
+        result[file_size_index:file_size_index + file_size_length] = len(result).to_bytes(file_size_length, 'little')
+
+        checksum_index, checksum_length = self.format_layout.structure['checksum']
+        with PROFILER.phase('diff.checksum'):
+            checksum = Character.calculate_checksum(
+                make_byte_array_from_hex(result.hex()),
+                structure=self.format_layout.structure
+            )
+        result[checksum_index:checksum_index + checksum_length] = int(checksum).to_bytes(checksum_length, 'little')
+
+        return bytes(result)
+
+
+class ItemChange:
+    """
+    `old` and `new` are the aligned items, one of them is None for added and removed items.
+    """
+
+    def __init__(self, old: RawItem | None, new: RawItem | None):
+        self.old = old
+        self.new = new
+
+    @property
+    def moved(self) -> bool:
+        return self.old.position != self.new.position
+
+    @property
+    def content_changed(self) -> bool:
+        return self.old.content_hash != self.new.content_hash
+
+    def mod_changes(self) -> dict:
+        """
+        Parses both items and compares their mods by id.
+        """
+        with PROFILER.phase('diff.mods'):
+            old_mods = self._get_mods(self.old)
+            new_mods = self._get_mods(self.new)
+
+        return dict(
+            added=[new_mods[i][1] for i in new_mods if i not in old_mods],
+            removed=[old_mods[i][1] for i in old_mods if i not in new_mods],
+            changed=[
+                dict(id=i, old=old_mods[i][1], new=new_mods[i][1])
+                for i in old_mods
+                if i in new_mods and old_mods[i][0] != new_mods[i][0]
+            ],
+        )
+
+    @staticmethod
+    def _get_mods(item: RawItem) -> dict[str, tuple[str, dict]]:
+        parsed = Item(data=item.data.hex(), layout=item.layout)
+        return {
+            mod_id: (
+                mod.data,
+                dict(id=mod_id, **mod.property_values.model_dump(exclude_none=True))
+            )
+            for mod_id, mod in parsed._mods.items()
+        }
+
+    def output(self) -> dict:
+        result = dict()
+        if self.old is not None:
+            result['old'] = self.old.output()
+        if self.new is not None:
+            result['new'] = self.new.output()
+        if self.old is not None and self.new is not None and self.content_changed:
+            result['mods'] = self.mod_changes()
+        return result
+
+
+class ItemListDiff:
+
+    def __init__(self):
+        self.added: list[ItemChange] = []
+        self.removed: list[ItemChange] = []
+        self.moved: list[ItemChange] = []
+        self.changed: list[ItemChange] = []
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.moved or self.changed)
+
+    def output(self) -> dict:
+        return dict(
+            added=[i.output() for i in self.added],
+            removed=[i.output() for i in self.removed],
+            moved=[i.output() for i in self.moved],
+            changed=[i.output() for i in self.changed],
+        )
+
+
+def align_items(old_items: list[RawItem], new_items: list[RawItem]) -> ItemListDiff:
+    """
+    Pairs identical items first, then items with the same unique id and content,
+    then items with the same unique id. Items without unique id are paired by content.
+    """
+    result = ItemListDiff()
+
+    old_left = list(old_items)
+    new_left = list(new_items)
+
+    def pair(make_key):
+        nonlocal old_left, new_left
+
+        candidates = dict()
+        for item in old_left:
+            key = make_key(item)
+            if key is not None:
+                candidates.setdefault(key, []).append(item)
+
+        paired = []
+        unpaired_new = []
+        for item in new_left:
+            key = make_key(item)
+            matches = candidates.get(key) if key is not None else None
+            if matches:
+                paired.append(ItemChange(matches.pop(0), item))
+            else:
+                unpaired_new.append(item)
+
+        paired_old = set(id(change.old) for change in paired)
+        old_left = [i for i in old_left if id(i) not in paired_old]
+        new_left = unpaired_new
+        return paired
+
+    # identical items are neither moved nor changed
+    pair(lambda item: item.data)
+
+    for change in pair(lambda item: (item.unique_id, item.content_hash)):
+        result.moved.append(change)
+
+    for change in pair(lambda item: item.unique_id):
+        result.changed.append(change)
+
+    result.removed = [ItemChange(item, None) for item in old_left]
+    result.added = [ItemChange(None, item) for item in new_left]
+
+    return result
+
+
+class FieldChange:
+
+    def __init__(self, name: str, old, new):
+        self.name = name
+        self.old = old
+        self.new = new
+
+    def output(self) -> dict:
+        return dict(
+            name=self.name,
+            old=self.old,
+            new=self.new,
+        )
+
+
+class SavePatch:
+    """
+    Header fields and difficulties to write, and item operations.
+    Items to remove or replace are looked up by their old bytes,
+    then by unique id and content, then by unique id.
+    """
+
+    def __init__(self,
+                 header: dict[str, str] = None,
+                 difficulties: dict[str, str] = None,
+                 items: dict[str, list[dict]] = None):
+        self.header = header or dict()
+        self.difficulties = difficulties or dict()
+        self.items = items or dict()
+
+    @property
+    def empty(self) -> bool:
+        return not (self.header or self.difficulties or any(self.items.values()))
+
+    @staticmethod
+    def _patch_items(items: list[RawItem], operations: list[dict], layout: FormatLayout) -> list[RawItem]:
+        keys = [
+            lambda item: item.data,
+            lambda item: (item.unique_id, item.content_hash),
+            lambda item: item.unique_id,
+        ]
+
+        # indexes of the items per key, built once
+        indexes = []
+        for make_key in keys:
+            index = dict()
+            for i, item in enumerate(items):
+                key = make_key(item)
+                if key is not None:
+                    index.setdefault(key, []).append(i)
+            indexes.append(index)
+
+        replacements = dict()
+        added = []
+        for operation in operations:
+            if operation['action'] == 'add':
+                added.append(RawItem(bytes.fromhex(operation['new']), layout=layout))
+                continue
+
+            old = RawItem(bytes.fromhex(operation['old']), layout=layout)
+            for make_key, index in zip(keys, indexes):
+                key = make_key(old)
+                positions = index.get(key, []) if key is not None else []
+                while positions and positions[0] in replacements:
+                    positions.pop(0)
+                if positions:
+                    position = positions.pop(0)
+                    break
+            else:
+                raise Error(
+                    'PatchConflict',
+                    f'Item to {operation["action"]} not found: {old.code} {old.unique_id}'
+                )
+
+            if operation['action'] == 'remove':
+                replacements[position] = None
+            else:
+                replacements[position] = RawItem(bytes.fromhex(operation['new']), layout=layout)
+
+        result = []
+        for i, item in enumerate(items):
+            item = replacements.get(i, item)
+            if item is not None:
+                result.append(item)
+        result.extend(added)
+        return result
+
+    def apply(self, data: bytes) -> bytes:
+        with PROFILER.phase('diff.apply'):
+            return self._apply(data)
+
+    def _apply(self, data: bytes) -> bytes:
+        layout = SaveLayout(data)
+
+        for field, value in self.header.items():
+            layout.write_header(field, bytes.fromhex(value))
+
+        if self.difficulties:
+            difficulty = bytearray(layout.read_header(DIFFICULTY_FIELD))
+            for i, code in DIFFICULTY_INDEX_MAPPING.items():
+                if code in self.difficulties:
+                    difficulty[i] = int(self.difficulties[code], 16)
+            layout.write_header(DIFFICULTY_FIELD, bytes(difficulty))
+
+        for list_name, operations in self.items.items():
+            items = layout.get_items(list_name)
+            if items is None:
+                raise Error(
+                    'PatchConflict',
+                    f'The save has no {list_name}'
+                )
+            setattr(layout, list_name, self._patch_items(items, operations, layout.format_layout))
+
+        return layout.to_bytes()
+
+    def output(self) -> dict:
+        return dict(
+            header=self.header,
+            difficulties=self.difficulties,
+            items=self.items,
+        )
+
+    @classmethod
+    def from_output(cls, data: dict) -> 'SavePatch':
+        return cls(
+            header=data.get('header'),
+            difficulties=data.get('difficulties'),
+            items=data.get('items'),
+        )
+
+
+class SaveDiff:
+
+    def __init__(self,
+                 header: list[FieldChange],
+                 difficulties: dict[str, list[FieldChange]],
+                 items: dict[str, ItemListDiff],
+                 patch: SavePatch):
+        self.header = header
+        self.difficulties = difficulties
+        self.items = items
+        self.patch = patch
+
+    @property
+    def empty(self) -> bool:
+        return self.patch.empty
+
+    def output(self) -> dict:
+        return dict(
+            header=[i.output() for i in self.header],
+            difficulties={
+                code: [i.output() for i in changes]
+                for code, changes in self.difficulties.items()
+            },
+            items={
+                list_name: item_list_diff.output()
+                for list_name, item_list_diff in self.items.items()
+            },
+        )
+
+
+def diff_headers(old: SaveLayout, new: SaveLayout) -> list[FieldChange]:
+    result = []
+    for field in [*old.format_layout.structure, EXTENDED_FIELD]:
+        if field in COMPUTED_FIELDS or field == DIFFICULTY_FIELD:
+            continue
+        # only the fields of both formats are compared
+        if field != EXTENDED_FIELD and field not in new.format_layout.structure:
+            continue
+        old_value = old.read_header(field)
+        new_value = new.read_header(field)
+        if old_value != new_value:
+            result.append(FieldChange(field, old_value.hex(), new_value.hex()))
+    return result
+
+
+def diff_difficulties(old: SaveLayout, new: SaveLayout) -> dict[str, list[FieldChange]]:
+    result = dict()
+    old_value = old.read_header(DIFFICULTY_FIELD)
+    new_value = new.read_header(DIFFICULTY_FIELD)
+    for i, code in DIFFICULTY_INDEX_MAPPING.items():
+        if old_value[i] == new_value[i]:
+            continue
+        old_difficulty = CharacterDifficulty(code=code, data=old_value[i:i + 1].hex())
+        new_difficulty = CharacterDifficulty(code=code, data=new_value[i:i + 1].hex())
+        result[code] = [
+            FieldChange(field, getattr(old_difficulty, field), getattr(new_difficulty, field))
+            for field in ('active', 'act_id')
+            if getattr(old_difficulty, field) != getattr(new_difficulty, field)
+        ]
+    return result
+
+
+def diff_saves(old_data: bytes, new_data: bytes) -> SaveDiff:
+    with PROFILER.phase('diff.saves'):
+        old = SaveLayout(old_data)
+        new = SaveLayout(new_data)
+
+        header = diff_headers(old, new)
+        difficulties = diff_difficulties(old, new)
+
+        items = dict()
+        patch_items = dict()
+        for list_name in ITEM_LISTS:
+            old_items = old.get_items(list_name)
+            new_items = new.get_items(list_name)
+            if old_items is None and new_items is None:
+                continue
+
+            item_list_diff = align_items(old_items or [], new_items or [])
+            items[list_name] = item_list_diff
+
+            operations = [
+                dict(action='remove', old=change.old.data.hex())
+                for change in item_list_diff.removed
+            ]
+            operations.extend(
+                dict(action='replace', old=change.old.data.hex(), new=change.new.data.hex())
+                for change in item_list_diff.moved + item_list_diff.changed
+            )
+            operations.extend(
+                dict(action='add', new=change.new.data.hex())
+                for change in item_list_diff.added
+            )
+            if operations:
+                patch_items[list_name] = operations
+
+        patch = SavePatch(
+            header={
+                change.name: change.new
+                for change in header
+            },
+            difficulties={
+                code: new.read_header(DIFFICULTY_FIELD)[i:i + 1].hex()
+                for i, code in DIFFICULTY_INDEX_MAPPING.items()
+                if code in difficulties
+            },
+            items=patch_items,
+        )
+
+    return SaveDiff(
+        header=header,
+        difficulties=difficulties,
+        items=items,
+        patch=patch,
+    )
@@ -0,0 +1,138 @@
+"""
+Shared pieces of the exporters: the save files of a tree, the items of a save parsed one at a time
+and the decoded fields of an item.
+"""
+import os
+from typing import Iterator
+
+from src.common.constants.character import ITEM_HEADER
+from src.common.layouts import DEFAULT_LAYOUT, get_layout, read_version
+from src.diff import SaveLayout
+from src.models.item import Item
+
+SAVE_FILE_EXTENSION = '.d2s'
+
+ITEM_LISTS = (
+    'items',
+    'merc_items',
+)
+
+# header fields of a character, as little endian integers
+CHARACTER_FIELDS = (
+    'version',
+    'file_size',
+    'checksum',
+    'character_status',
+    'character_progression',
+    'character_class',
+    'character_level',
+    'time',
+    'mercenary_name_id',
+    'mercenary_type',
+    'mercenary_exp',
+)
+
+
+def iter_save_files(paths: list[str]) -> Iterator[str]:
+    """
+    Files and the save files found under directories, walked lazily in name order.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for current_dir, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.endswith(SAVE_FILE_EXTENSION):
+                    yield os.path.join(current_dir, file_name)
+
+
+def is_item_file(data: bytes) -> bool:
+    # item files of the library hold a single item without character header
+    return data[:len(ITEM_HEADER)] == bytes.fromhex(''.join(ITEM_HEADER))
+
+
+def read_character_header(layout: SaveLayout) -> dict:
+    result = dict()
+    for field in CHARACTER_FIELDS:
+        index, length = layout.format_layout.structure[field]
+        result[field] = int.from_bytes(layout.header[index:index + length], 'little')
+
+    index, length = layout.format_layout.structure['character_name']
+    result['character_name'] = layout.header[index:index + length].split(b'\x00')[0].decode('latin-1')
+    return result
+
+
+def iter_raw_items(data: bytes) -> Iterator[tuple[str, int, bytes]]:
+    """
+    `(list_name, index, item data)` of a save or item file, without parsing the items.
+    """
+    if is_item_file(data):
+        yield 'items', 0, data
+        return
+
+    layout = SaveLayout(data)
+    for list_name in ITEM_LISTS:
+        for index, item in enumerate(layout.get_items(list_name) or []):
+            yield list_name, index, item.data
+
+
+def iter_items(data: bytes) -> Iterator[tuple[str, int, bytes, Item | Exception]]:
+    """
+    Parses the items of a save one at a time, an item which fails to parse
+    is yielded with its error instead.
+    """
+    layout = DEFAULT_LAYOUT if is_item_file(data) else get_layout(read_version(data))
+
+    for list_name, index, item_data in iter_raw_items(data):
+        try:
+            item = Item(data=item_data.hex(), layout=layout)
+        except Exception as e:
+            yield list_name, index, item_data, e
+            continue
+        yield list_name, index, item_data, item
+
+
+def item_record(item: Item, mods: bool = True) -> dict:
+    result = dict(
+        code=item.code,
+        name=item.base.name,
+        unique_id=item.id,
+        location=item.location,
+        equipped_location=item.equipped_location,
+        storage=item.storage,
+        storage_x=item.storage_x,
+        storage_y=item.storage_y,
+        width=item.base.width,
+        height=item.base.height,
+        rarity=item.rarity,
+        level=item.level,
+        is_ear=item.is_ear,
+        is_simple=item.is_simple,
+        is_ethereal=item.is_ethereal,
+        is_socketed=item.is_socketed,
+        is_runeword=item.is_runeword,
+        total_sockets=item.total_sockets,
+    )
+
+    if not (item.is_ear or item.is_simple):
+        result.update(
+            defense=item.defense,
+            max_durability=item.max_durability,
+            current_durability=item.current_durability,
+            quantity=item.quantity if item.stackable else None,
+        )
+
+    if mods:
+        result['mods'] = [
+            dict(
+                id=mod.id,
+                code=mod.base.code,
+                runeword=mod.runeword,
+                **mod.property_values.model_dump(exclude_none=True)
+            )
+            for mod in item._mods.values()
+        ]
+
+    return result
@@ -0,0 +1,337 @@
+"""
+Columnar snapshot of decoded saves.
+
+Three tables of NumPy columns, rows linked by their index:
+
+- `characters`: one row per save file, its path and header fields,
+  item library files have a row with `is_item_file` set.
+- `items`: one row per item, `character` is the row of its save.
+- `mods`: one row per mod, `item` is the row of its item, `mod_id` the base mod id,
+  and one float column per property value, NaN when the mod has no such property.
+
+Missing integer values are -1. The tables are written either as one `.npz`,
+or as a directory of `.npy` files which `load_columns` reopens memory mapped:
+
+    tables = load_columns(dir_path)
+    tables['items']['level']
+"""
+import json
+import os
+
+import numpy as np
+
+from src.bases.errors import Error
+from src.common.profiling import PROFILER
+from src.diff import SaveLayout
+from src.exporters import (
+    ITEM_LISTS, CHARACTER_FIELDS,
+    iter_save_files, iter_items, is_item_file, read_character_header,
+)
+from src.models.item import Item, ModPropertyValues
+
+COLUMNAR_FORMAT_VERSION = 1
+META_FILE_NAME = 'meta.json'
+
+ITEM_CODE_LENGTH = 4
+CHARACTER_NAME_LENGTH = 16
+
+# numeric properties of the mods, every one is a column of the mod table
+MOD_PROPERTIES = [
+    name
+    for name, field in ModPropertyValues.model_fields.items()
+    if name != 'skill_name'
+]
+
+ITEM_INT_COLUMNS = {
+    'character': np.int32,
+    'list': np.int8,
+    'index': np.int32,
+    'unique_id': np.int64,
+    'location': np.int8,
+    'equipped_location': np.int8,
+    'storage': np.int8,
+    'storage_x': np.int8,
+    'storage_y': np.int8,
+    'rarity': np.int8,
+    'level': np.int16,
+    'total_sockets': np.int8,
+    'defense': np.int32,
+    'max_durability': np.int32,
+    'current_durability': np.int32,
+    'quantity': np.int32,
+    'width': np.int8,
+    'height': np.int8,
+    'total_mods': np.int16,
+}
+ITEM_BOOL_COLUMNS = (
+    'is_ear',
+    'is_simple',
+    'is_ethereal',
+    'is_socketed',
+    'is_runeword',
+    'error',
+)
+# fields read as their stored integer instead of their name
+ITEM_RAW_FIELDS = (
+    'location',
+    'equipped_location',
+    'storage',
+)
+
+
+def _none_to_missing(value) -> int:
+    return -1 if value is None else value
+
+
+class ColumnarBuilder:
+    """
+    Accumulates the rows of the three tables, file by file.
+    """
+
+    def __init__(self):
+        self.characters = dict(
+            path=[],
+            is_item_file=[],
+            character_name=[],
+            **{field: [] for field in CHARACTER_FIELDS}
+        )
+        self.items = {
+            column: []
+            for column in [*ITEM_INT_COLUMNS, *ITEM_BOOL_COLUMNS, 'code']
+        }
+        self.mods = dict(
+            item=[],
+            mod_id=[],
+            runeword=[],
+            **{name: [] for name in MOD_PROPERTIES}
+        )
+
+    @property
+    def total_items(self) -> int:
+        return len(self.items['index'])
+
+    def add_file(self, file_path: str):
+        """
+        Adds the rows of a file once all of them are read, a file which fails leaves no rows.
+        """
+        with open(file_path, 'rb') as file_ref:
+            data = file_ref.read()
+
+        with PROFILER.phase('export.columnar_file'):
+            character = self._read_character(file_path, data)
+            items = [
+                self._read_item_rows(ITEM_LISTS.index(list_name), index, item)
+                for list_name, index, _, item in iter_items(data)
+            ]
+
+            character_row = len(self.characters['path'])
+            for column, values in self.characters.items():
+                values.append(character[column])
+
+            for row, mod_rows in items:
+                item_row = self.total_items
+                row['character'] = character_row
+                self._add_item(row)
+                for mod_row in mod_rows:
+                    mod_row['item'] = item_row
+                    for column, values in self.mods.items():
+                        values.append(mod_row[column])
+
+    @staticmethod
+    def _read_character(file_path: str, data: bytes) -> dict:
+        item_file = is_item_file(data)
+        header = dict() if item_file else read_character_header(SaveLayout(data))
+
+        result = dict(
+            path=file_path,
+            is_item_file=item_file,
+            character_name=header.get('character_name', ''),
+        )
+        for field in CHARACTER_FIELDS:
+            result[field] = header.get(field, -1)
+        return result
+
+    def _read_item_rows(self, list_id: int, index: int, item: Item | Exception) -> tuple[dict, list[dict]]:
+        """
+        The row of an item and the rows of its mods, an item which fails to read is an error row without mods.
+        """
+        row = dict(
+            list=list_id,
+            index=index,
+        )
+
+        if isinstance(item, Exception):
+            row['error'] = True
+            return row, []
+
+        try:
+            row.update(self._read_item(item))
+            mod_rows = [self._read_mod(mod) for mod in item._mods.values()]
+        except Exception:
+            return dict(list=list_id, index=index, error=True), []
+        return row, mod_rows
+
+    def _add_item(self, row: dict):
+        for column in ITEM_INT_COLUMNS:
+            self.items[column].append(_none_to_missing(row.get(column)))
+        for column in ITEM_BOOL_COLUMNS:
+            self.items[column].append(bool(row.get(column)))
+        self.items['code'].append(row.get('code') or '')
+
+    @staticmethod
+    def _read_item(item: Item) -> dict:
+        result = dict(
+            code=item.code,
+            unique_id=item.id,
+            rarity=None if item.is_ear or item.is_simple else item._read_data(*item._layout.non_ear_structure['rarity']),
+            level=item.level,
+            total_sockets=item.total_sockets,
+            width=item.base.width,
+            height=item.base.height,
+            storage_x=item.storage_x,
+            storage_y=item.storage_y,
+            total_mods=len(item._mods),
+            is_ear=item.is_ear,
+            is_simple=item.is_simple,
+            is_ethereal=item.is_ethereal,
+            is_socketed=item.is_socketed,
+            is_runeword=item.is_runeword,
+        )
+        for field in ITEM_RAW_FIELDS:
+            result[field] = item._read_data(*item._layout.base_structure[field])
+
+        if not (item.is_ear or item.is_simple):
+            result.update(
+                defense=item.defense,
+                max_durability=item.max_durability,
+                current_durability=item.current_durability,
+                quantity=item.quantity if item.stackable else None,
+            )
+        return result
+
+    @staticmethod
+    def _read_mod(mod) -> dict:
+        values = mod.property_values
+        result = dict(
+            mod_id=mod.base.id,
+            runeword=mod.runeword,
+        )
+        for name in MOD_PROPERTIES:
+            value = getattr(values, name)
+            result[name] = np.nan if value is None else value
+        return result
+
+    def add_paths(self, paths: list[str]) -> dict:
+        errors = []
+        for file_path in iter_save_files(paths):
+            try:
+                self.add_file(file_path)
+            except Exception as e:
+                errors.append(dict(file=file_path, error=f'{e.__class__.__name__}: {e}'))
+        return dict(
+            files=len(self.characters['path']),
+            items=self.total_items,
+            mods=len(self.mods['item']),
+            errors=errors,
+        )
+
+    def build(self) -> dict[str, dict[str, np.ndarray]]:
+        characters = dict(
+            path=np.array(self.characters['path'], dtype=np.str_),
+            is_item_file=np.array(self.characters['is_item_file'], dtype=np.bool_),
+            character_name=np.array(self.characters['character_name'], dtype=f'U{CHARACTER_NAME_LENGTH}'),
+        )
+        for field in CHARACTER_FIELDS:
+            characters[field] = np.array(self.characters[field], dtype=np.int64)
+
+        items = {
+            column: np.array(self.items[column], dtype=dtype)
+            for column, dtype in ITEM_INT_COLUMNS.items()
+        }
+        for column in ITEM_BOOL_COLUMNS:
+            items[column] = np.array(self.items[column], dtype=np.bool_)
+        items['code'] = np.array(self.items['code'], dtype=f'S{ITEM_CODE_LENGTH}')
+
+        mods = dict(
+            item=np.array(self.mods['item'], dtype=np.int64),
+            mod_id=np.array(self.mods['mod_id'], dtype=np.int32),
+            runeword=np.array(self.mods['runeword'], dtype=np.bool_),
+        )
+        for name in MOD_PROPERTIES:
+            mods[name] = np.array(self.mods[name], dtype=np.float64)
+
+        return dict(
+            characters=characters,
+            items=items,
+            mods=mods,
+        )
+
+
+def write_npz(file_path: str, tables: dict[str, dict[str, np.ndarray]]):
+    """
+    Columns are stored as `<table>/<column>` arrays.
+    """
+    np.savez(file_path, **{
+        f'{table}/{column}': values
+        for table, columns in tables.items()
+        for column, values in columns.items()
+    })
+
+
+def load_npz(file_path: str) -> dict[str, dict[str, np.ndarray]]:
+    result = dict()
+    with np.load(file_path) as data:
+        for key in data.files:
+            table, column = key.split('/', 1)
+            result.setdefault(table, dict())[column] = data[key]
+    return result
+
+
+def write_columns(dir_path: str, tables: dict[str, dict[str, np.ndarray]]):
+    """
+    One `.npy` file per column under `<dir_path>/<table>/`, with a `meta.json` listing them.
+    """
+    meta = dict(version=COLUMNAR_FORMAT_VERSION, tables=dict())
+    for table, columns in tables.items():
+        table_dir = os.path.join(dir_path, table)
+        os.makedirs(table_dir, exist_ok=True)
+        for column, values in columns.items():
+            np.save(os.path.join(table_dir, f'{column}.npy'), values, allow_pickle=False)
+        meta['tables'][table] = dict(
+            rows=int(len(next(iter(columns.values())))) if columns else 0,
+            columns=list(columns),
+        )
+
+    # written last, a directory without it is incomplete
+    tmp_path = os.path.join(dir_path, f'{META_FILE_NAME}.tmp')
+    with open(tmp_path, 'w') as file_ref:
+        json.dump(meta, file_ref, indent=2)
+    os.replace(tmp_path, os.path.join(dir_path, META_FILE_NAME))
+
+
+def load_columns(dir_path: str, mmap: bool = True) -> dict[str, dict[str, np.ndarray]]:
+    meta_path = os.path.join(dir_path, META_FILE_NAME)
+    if not os.path.exists(meta_path):
+        raise Error(
+            'InvalidColumnarDir',
+            f'Missing {META_FILE_NAME} in {dir_path}'
+        )
+    with open(meta_path, 'r') as file_ref:
+        meta = json.load(file_ref)
+    if meta.get('version') != COLUMNAR_FORMAT_VERSION:
+        raise Error(
+            'UnsupportedColumnarDir',
+            f'Unsupported columnar format version: {meta.get("version")}'
+        )
+
+    return {
+        table: {
+            column: np.load(
+                os.path.join(dir_path, table, f'{column}.npy'),
+                mmap_mode='r' if mmap else None,
+                allow_pickle=False
+            )
+            for column in info['columns']
+        }
+        for table, info in meta['tables'].items()
+    }
@@ -0,0 +1,34 @@
+"""
+Exports saves as columnar tables:
+
+    python -m src.exporters.columnar saves_dir --output snapshot_dir
+    python -m src.exporters.columnar saves_dir --output snapshot.npz
+"""
+import argparse
+import json
+import sys
+
+from src.exporters.columnar import ColumnarBuilder, write_columns, write_npz
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exports the decoded items of saves as NumPy columns')
+    parser.add_argument('paths', nargs='+', help='save files or directories')
+    parser.add_argument('--output', required=True,
+                        help='a .npz file, or a directory of memory mappable .npy columns')
+    args = parser.parse_args()
+
+    builder = ColumnarBuilder()
+    stats = builder.add_paths(args.paths)
+    tables = builder.build()
+
+    if args.output.endswith('.npz'):
+        write_npz(args.output, tables)
+    else:
+        write_columns(args.output, tables)
+
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
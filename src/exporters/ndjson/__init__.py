@@ -0,0 +1,101 @@
+"""
+Streaming NDJSON export, one JSON object per item:
+
+    {"file": "...", "list": "items", "index": 0, "code": "amu", ..., "mods": [...]}
+
+Saves are read one at a time and their items parsed one at a time,
+so the memory stays bounded by the largest save whatever the number of files.
+Items which fail to parse are written with an `error` instead of their fields.
+`export_to_file` only replaces its output file once the export is done.
+"""
+import json
+from typing import IO, Iterator
+
+from src.common.locks import replace_file
+from src.common.profiling import PROFILER
+from src.exporters import iter_items, iter_save_files, item_record
+
+
+class NdjsonExporter:
+
+    def __init__(self,
+                 output: IO[str],
+                 data: bool = False,
+                 mods: bool = True):
+        self.output = output
+        self.data = data
+        self.mods = mods
+
+        self.total_files = 0
+        self.total_items = 0
+        self.total_errors = 0
+
+    def iter_records(self, file_path: str) -> Iterator[dict]:
+        with open(file_path, 'rb') as file_ref:
+            data = file_ref.read()
+
+        for list_name, index, item_data, item in iter_items(data):
+            record = {
+                'file': file_path,
+                'list': list_name,
+                'index': index,
+            }
+
+            if isinstance(item, Exception):
+                record['error'] = f'{item.__class__.__name__}: {item}'
+            else:
+                try:
+                    record.update(item_record(item, mods=self.mods))
+                except Exception as e:
+                    record['error'] = f'{e.__class__.__name__}: {e}'
+
+            if self.data:
+                record['data'] = item_data.hex()
+
+            yield record
+
+    def export_file(self, file_path: str) -> int:
+        total = 0
+        with PROFILER.phase('export.ndjson_file'):
+            for record in self.iter_records(file_path):
+                self.output.write(json.dumps(record, separators=(',', ':')))
+                self.output.write('\n')
+                total += 1
+                if 'error' in record:
+                    self.total_errors += 1
+
+        self.total_files += 1
+        self.total_items += total
+        return total
+
+    def export(self, paths: list[str]) -> dict:
+        """
+        Exports save files and the save files found under directories.
+        """
+        for file_path in iter_save_files(paths):
+            try:
+                self.export_file(file_path)
+            except Exception as e:
+                self.output.write(json.dumps({
+                    'file': file_path,
+                    'error': f'{e.__class__.__name__}: {e}',
+                }))
+                self.output.write('\n')
+                self.total_errors += 1
+        return self.stats()
+
+    def stats(self) -> dict:
+        return dict(
+            files=self.total_files,
+            items=self.total_items,
+            errors=self.total_errors,
+        )
+
+
+def export_to_file(paths: list[str], file_path: str, data: bool = False, mods: bool = True) -> dict:
+    """
+    Exports to a temporary file renamed over `file_path` once every save is exported,
+    an interrupted export leaves the previous file as it was.
+    """
+    with replace_file(file_path, mode='w') as output:
+        return NdjsonExporter(output=output, data=data, mods=mods).export(paths)
@@ -0,0 +1,31 @@
+"""
+Exports the items of saves as NDJSON:
+
+    python -m src.exporters.ndjson saves_dir other.d2s --output items.ndjson [--data] [--no-mods]
+"""
+import argparse
+import json
+import sys
+
+from src.exporters.ndjson import NdjsonExporter, export_to_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streams the decoded items of saves as NDJSON')
+    parser.add_argument('paths', nargs='+', help='save files or directories')
+    parser.add_argument('--output', help='output file, stdout by default')
+    parser.add_argument('--data', action='store_true', help='include the raw item data as hex')
+    parser.add_argument('--no-mods', action='store_true', help='leave the mods out')
+    args = parser.parse_args()
+
+    if args.output:
+        stats = export_to_file(args.paths, args.output, data=args.data, mods=not args.no_mods)
+    else:
+        exporter = NdjsonExporter(output=sys.stdout, data=args.data, mods=not args.no_mods)
+        stats = exporter.export(args.paths)
+
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,526 @@
+"""
+Synthetic save generator.
+Items are built from the catalog (`BASE_ITEMS`, `ITEM_BASE_MODS`) and encoded with
+the editor itself (`Modifier.update`, `Item.change_position`, `Character.save`),
+so corpora of any size can be produced without shipping real player saves.
+"""
+import os
+import random
+import tempfile
+
+from src.bases.errors import Error
+from src.common.constants.character import (
+    STRUCTURE, ITEM_LIST_HEADER, ITEM_LIST_FOOTER, MERC_ITEM_LIST_HEADER, FOOTER, ITEM_HEADER,
+    STASH_SIZE, INVENTORY_SIZE,
+)
+from src.common.constants.items import (
+    NON_EAR_STRUCTURE, ITEM_FOOTER, RARITIES, STORAGES, LOCATIONS, HORADRIC_CUBE_SIZE,
+    START_DEFENSE_VALUE, START_MAX_DURABILITY_VALUE, START_CURRENT_DURABILITY_VALUE,
+)
+from src.common.data import BASE_ITEMS, ITEM_BASE_MODS
+from src.common.diagnostics import DIAGNOSTICS
+from src.common.utils import get_dict_key_from_value
+from src.models.character import Character
+from src.models.item import Item, BaseItem, BaseModifier, Modifier
+
+SIGNATURE = 0xaa55aa55
+DEFAULT_VERSION = 96
+
+DEFAULT_RARITY_MIX = {
+    'normal': 30,
+    'superior': 15,
+    'magic': 30,
+    'rare': 15,
+    'unique': 7,
+    'set': 3,
+}
+
+# attempts to roll an item that can be parsed back, see `Generator.make_item`
+MAX_ITEM_ATTEMPTS = 100
+
+STORAGE_SIZES = {
+    'inventory': INVENTORY_SIZE,
+    'horadric_cube': HORADRIC_CUBE_SIZE,
+    'stash': STASH_SIZE,
+}
+# storages of a generated character, filled in this order
+CHARACTER_STORAGE_IDS = (5, 1, 4)
+
+
+def find_positions(sizes: list[tuple[int, int]], grid_size: tuple[int, int]) -> list[tuple[int, int] | None]:
+    """
+    Positions of the items of `sizes` in a grid, each at its first free place row by row,
+    None for the items which do not fit.
+    """
+    max_x, max_y = grid_size
+    used = [[False] * max_x for _ in range(max_y)]
+
+    result = []
+    for width, height in sizes:
+        position = next(
+            (
+                (x, y)
+                for y in range(max_y - height + 1)
+                for x in range(max_x - width + 1)
+                if not any(used[y + j][x + i] for j in range(height) for i in range(width))
+            ),
+            None
+        )
+        result.append(position)
+        if position is None:
+            continue
+
+        x, y = position
+        for j in range(height):
+            for i in range(width):
+                used[y + j][x + i] = True
+    return result
+
+
+class BitWriter:
+    """
+    Writes fields the way items store them: least significant bit first.
+    """
+
+    def __init__(self):
+        self.bits = []
+
+    def write(self, value: int, length: int):
+        self.bits.extend(
+            '1' if (value >> i) & 1 else '0'
+            for i in range(length)
+        )
+
+    def write_field(self, structure: dict, name: str, value: int):
+        index, length = structure[name]
+        if index is not None and index != len(self.bits):
+            raise Error(
+                'InvalidStructure',
+                f'Field {name} is expected at bit {index}, got {len(self.bits)}'
+            )
+        self.write(value, length)
+
+    def to_bytes(self) -> bytes:
+        bits = self.bits + ['0'] * (-len(self.bits) % 8)
+        value = int(''.join(reversed(bits)), 2)
+        return value.to_bytes(len(bits) // 8, 'little')
+
+
+def find_mod_candidates() -> list[BaseModifier]:
+    result = []
+    for data in ITEM_BASE_MODS.values():
+        base_mod = BaseModifier(**data)
+        try:
+            properties = Modifier.init_properties(base_mod)
+        except AttributeError:
+            # related damage mod is missing from the catalog
+            continue
+        if sum(p.length for p in properties) <= 0:
+            continue
+        result.append(base_mod)
+    return result
+
+
+def is_splittable(item: bytes) -> bool:
+    # items of a save are split on their header,
+    # so it must not show up anywhere else in the item
+    return ''.join(ITEM_HEADER) not in item.hex()[len(ITEM_HEADER) * 2:]
+
+
+def make_character_data(items: list[bytes],
+                        merc_items: list[bytes] = None,
+                        name: str = 'Synthetic',
+                        version: int = DEFAULT_VERSION) -> bytes:
+    """
+    Raw character data, the file size and checksum are filled by `Character.save`.
+    """
+    index, length = STRUCTURE['npc']
+    header = bytearray(index + length)
+
+    def write(field: str, value: bytes):
+        field_index, field_length = STRUCTURE[field]
+        header[field_index:field_index + len(value)] = value[:field_length]
+
+    write('signature', SIGNATURE.to_bytes(4, 'little'))
+    write('version', version.to_bytes(4, 'little'))
+    write('character_name', name.encode())
+    write('character_level', bytes([80]))
+    # normal difficulty is active
+    write('difficulty', bytes([0x80, 0, 0]))
+    if merc_items is not None:
+        write('mercenary_name_id', (1).to_bytes(2, 'little'))
+
+    result = bytearray(header)
+    result += bytes.fromhex(''.join(ITEM_LIST_HEADER))
+    result += len(items).to_bytes(2, 'little')
+    for item in items:
+        result += item
+    result += bytes.fromhex(''.join(ITEM_LIST_FOOTER))
+
+    if merc_items is not None:
+        result += bytes.fromhex(''.join(MERC_ITEM_LIST_HEADER))
+        result += len(merc_items).to_bytes(2, 'little')
+        for item in merc_items:
+            result += item
+
+    result += bytes.fromhex(''.join(FOOTER))
+
+    return bytes(result)
+
+
+class Generator:
+
+    def __init__(self,
+                 seed: int = 0,
+                 rarity_mix: dict[str, float] = None,
+                 mods_per_item: int | tuple[int, int] = (2, 6),
+                 runeword_ratio: float = 0.05,
+                 socketed_ratio: float = 0.2,
+                 ethereal_ratio: float = 0.1,
+                 simple_ratio: float = 0.05,
+                 version: int = DEFAULT_VERSION):
+        self.random = random.Random(seed)
+
+        rarity_mix = rarity_mix or DEFAULT_RARITY_MIX
+        self.rarity_ids = []
+        self.rarity_weights = []
+        for rarity, weight in rarity_mix.items():
+            rarity_id = get_dict_key_from_value(RARITIES, rarity)
+            if rarity_id is None:
+                raise Error(
+                    'InvalidParams',
+                    f'Unsupported rarity: {rarity}'
+                )
+            self.rarity_ids.append(rarity_id)
+            self.rarity_weights.append(weight)
+
+        if isinstance(mods_per_item, int):
+            mods_per_item = (mods_per_item, mods_per_item)
+        self.mods_per_item = mods_per_item
+
+        self.runeword_ratio = runeword_ratio
+        self.socketed_ratio = socketed_ratio
+        self.ethereal_ratio = ethereal_ratio
+        self.simple_ratio = simple_ratio
+        self.version = version
+
+        self.base_items = [BaseItem(**BASE_ITEMS[code]) for code in sorted(BASE_ITEMS)]
+        self.simple_base_items = [
+            i for i in self.base_items
+            if not i.is_armor and not i.is_weapon
+        ]
+        self.base_mods = find_mod_candidates()
+
+    def _roll_mods(self) -> list[BaseModifier]:
+        min_mods, max_mods = self.mods_per_item
+        total_mods = min(self.random.randint(min_mods, max_mods), len(self.base_mods))
+
+        # one mod per code, duplicated mods are rejected by the parser
+        result = dict()
+        while len(result) < total_mods:
+            base_mod = self.random.choice(self.base_mods)
+            result[base_mod.code] = base_mod
+        return list(result.values())
+
+    def _make_mod_data(self, base_mod: BaseModifier) -> str:
+        values = dict()
+        for p in Modifier.init_properties(base_mod):
+            values[p.code] = self.random.randint(0, (1 << p.length) - 1) * p.conversion_rate + p.min_value
+
+        mod = Modifier(data='0' * base_mod.length, base=base_mod)
+        mod.update(values=values)
+        return mod.data
+
+    def make_item_data(self,
+                       base_item: BaseItem,
+                       rarity_id: int = 2,
+                       mods: list[BaseModifier] = None,
+                       runeword_mods: list[BaseModifier] = None,
+                       unique_id: int = None,
+                       socketed: bool = False,
+                       ethereal: bool = False,
+                       simple: bool = False) -> bytes:
+        writer = BitWriter()
+        structure = NON_EAR_STRUCTURE
+        runeword = runeword_mods is not None
+
+        writer.write_field(structure, 'header', int.from_bytes(bytes.fromhex(''.join(ITEM_HEADER)), 'little'))
+        writer.write_field(structure, 'unknown_1', 0)
+        writer.write_field(structure, 'is_identified', 1)
+        writer.write_field(structure, 'unknown_2', 0)
+        writer.write_field(structure, 'is_socketed', int(socketed or runeword))
+        writer.write_field(structure, 'unknown_3', 0)
+        writer.write_field(structure, 'is_picked_up_since_last_save', 0)
+        writer.write_field(structure, 'unknown_4', 0)
+        writer.write_field(structure, 'is_ear', 0)
+        writer.write_field(structure, 'is_starter_gear', 0)
+        writer.write_field(structure, 'unknown_5', 0)
+        writer.write_field(structure, 'is_simple', int(simple))
+        writer.write_field(structure, 'is_ethereal', int(ethereal))
+        writer.write_field(structure, 'unknown_6', 0)
+        writer.write_field(structure, 'is_personalized', 0)
+        writer.write_field(structure, 'unknown_7', 0)
+        writer.write_field(structure, 'is_runeword', int(runeword))
+        writer.write_field(structure, 'unknown_8', 0)
+        # placed later with `Item.change_position`
+        writer.write_field(structure, 'location', 0)
+        writer.write_field(structure, 'equipped_location', 0)
+        writer.write_field(structure, 'storage_x', 0)
+        writer.write_field(structure, 'storage_y', 0)
+        writer.write_field(structure, 'storage', 5)
+
+        _, code_length = structure['code']
+        for char in base_item.code.ljust(code_length // 8):
+            writer.write(ord(char), 8)
+
+        if simple:
+            return writer.to_bytes()
+
+        if unique_id is None:
+            unique_id = self.random.getrandbits(32)
+
+        writer.write_field(structure, 'sockets', 0)
+        writer.write_field(structure, 'unique_id', unique_id)
+        writer.write_field(structure, 'level', self.random.randint(1, 99))
+        writer.write_field(structure, 'rarity', rarity_id)
+        writer.write_field(structure, 'has_custom_graphic', 0)
+        writer.write_field(structure, 'has_class_spec', 0)
+
+        rarity = RARITIES[rarity_id]
+        if rarity == 'magic':
+            writer.write_field(structure, 'magic_pf_type_id', self.random.getrandbits(11))
+            writer.write_field(structure, 'magic_sf_type_id', self.random.getrandbits(11))
+        elif rarity in ['rare', 'crafted']:
+            writer.write_field(structure, 'cr_pf_type_id', self.random.getrandbits(8))
+            writer.write_field(structure, 'cr_sf_type_id', self.random.getrandbits(8))
+            _, affix_lengths = structure['cr_affixes']
+            affix_min_length, _ = affix_lengths
+            # no affixes
+            writer.write(0, affix_min_length)
+        elif rarity == 'unique':
+            writer.write_field(structure, 'unique_quality_id', self.random.getrandbits(15))
+        elif rarity == 'set':
+            writer.write_field(structure, 'set_quality_id', self.random.getrandbits(15))
+        elif rarity == 'superior':
+            writer.write_field(structure, 'superior_quality_id', self.random.getrandbits(3))
+
+        if runeword:
+            writer.write_field(structure, 'runeword', self.random.getrandbits(12))
+
+        writer.write_field(structure, 'unknown_11', 0)
+
+        if base_item.is_armor:
+            writer.write_field(structure, 'defense_value', self.random.randint(10, 500) - START_DEFENSE_VALUE)
+
+        if base_item.is_armor or base_item.is_weapon:
+            max_durability = self.random.randint(10, 250)
+            writer.write_field(structure, 'max_durability', max_durability - START_MAX_DURABILITY_VALUE)
+            writer.write_field(structure, 'current_durability',
+                               max_durability - START_CURRENT_DURABILITY_VALUE)
+
+        if base_item.stackable:
+            writer.write_field(structure, 'quantity', self.random.randint(1, 500))
+
+        if socketed or runeword:
+            writer.write_field(structure, 'total_sockets', self.random.randint(1, 6))
+
+        if rarity == 'set':
+            writer.write_field(structure, 'set_mod_bit_field', 0)
+
+        for base_mod in mods or []:
+            writer.bits.extend(self._make_mod_data(base_mod))
+        writer.bits.extend(ITEM_FOOTER)
+
+        if runeword:
+            for base_mod in runeword_mods:
+                writer.bits.extend(self._make_mod_data(base_mod))
+            writer.bits.extend(ITEM_FOOTER)
+
+        return writer.to_bytes()
+
+    def make_item(self) -> bytes:
+        for _ in range(MAX_ITEM_ATTEMPTS):
+            simple = self.simple_base_items and self.random.random() < self.simple_ratio
+            if simple:
+                base_item = self.random.choice(self.simple_base_items)
+            else:
+                base_item = self.random.choice(self.base_items)
+
+            runeword_mods = None
+            if not simple and (base_item.is_armor or base_item.is_weapon):
+                if self.random.random() < self.runeword_ratio:
+                    runeword_mods = self._roll_mods()
+
+            data = self.make_item_data(
+                base_item=base_item,
+                rarity_id=self.random.choices(self.rarity_ids, self.rarity_weights)[0],
+                mods=self._roll_mods(),
+                runeword_mods=runeword_mods,
+                socketed=self.random.random() < self.socketed_ratio,
+                ethereal=self.random.random() < self.ethereal_ratio,
+                simple=simple,
+            )
+
+            if not is_splittable(data):
+                continue
+
+            if runeword_mods is not None:
+                # the mod parser reads the padding after the runeword mods as another mod,
+                # so runeword items are only kept when they have no padding to read
+                try:
+                    # the rejected padding shows up as unknown mods
+                    with DIAGNOSTICS.collect():
+                        item = Item(data=data.hex())
+                except Error:
+                    continue
+                if len(item.rw_mods) != len(runeword_mods):
+                    continue
+
+            return data
+
+        raise Error(
+            'GenerationFailed',
+            f'Cannot generate a parsable item in {MAX_ITEM_ATTEMPTS} attempts'
+        )
+
+    def make_items(self, count: int) -> list[bytes]:
+        return [self.make_item() for _ in range(count)]
+
+    def place_items(self,
+                    items: list[bytes],
+                    storage_id: int = 5,
+                    location_id: int = 0) -> list[bytes]:
+        """
+        Moves the items over the storage grid with `Item.change_position`, without overlapping.
+        Raises `StorageFull` when the grid has no room left for an item.
+        """
+        result, rest = self._place_items(items, storage_id, location_id)
+        if rest:
+            raise Error(
+                'StorageFull',
+                f'Only {len(result)} of the {len(items)} items fit in the {STORAGES[storage_id]}'
+            )
+        return result
+
+    @staticmethod
+    def _place_items(items: list[bytes], storage_id: int, location_id: int) -> tuple[list[bytes], list[bytes]]:
+        """
+        The items moved over the grid and the items which do not fit.
+        """
+        if storage_id not in STORAGES or location_id not in LOCATIONS:
+            raise Error(
+                'InvalidParams',
+                f'Unsupported storage or location: {storage_id}, {location_id}'
+            )
+
+        parsed_items = [Item(data=data.hex()) for data in items]
+        positions = find_positions(
+            [item.size for item in parsed_items],
+            STORAGE_SIZES[STORAGES[storage_id]]
+        )
+
+        result = []
+        rest = []
+        for data, item, position in zip(items, parsed_items, positions):
+            if position is None:
+                rest.append(data)
+                continue
+            x, y = position
+            item.change_position(
+                storage_id=storage_id,
+                location_id=location_id,
+                storage_x=x,
+                storage_y=y
+            )
+            result.append(bytes.fromhex(''.join(item.updated_data)))
+
+        return result, rest
+
+    def make_character(self,
+                       total_items: int,
+                       total_merc_items: int = None,
+                       name: str = 'Synthetic') -> bytes:
+        """
+        A character file, with a mercenary when `total_merc_items` is given.
+        Its items fill the stash, then the inventory and the cube, `StorageFull` is raised
+        when they do not fit.
+        It is saved once with `Character.save` so that its file size and checksum are valid.
+        """
+        rest = self.make_items(total_items)
+        items = []
+        for storage_id in CHARACTER_STORAGE_IDS:
+            if not rest:
+                break
+            placed, rest = self._place_items(rest, storage_id, location_id=0)
+            items.extend(placed)
+
+        if rest:
+            raise Error(
+                'StorageFull',
+                f'{len(rest)} of the {total_items} items do not fit in the storages of a character'
+            )
+
+        merc_items = None
+        if total_merc_items is not None:
+            merc_items = self.make_items(total_merc_items)
+
+        character = Character(data=make_character_data(
+            items=items,
+            merc_items=merc_items,
+            name=name,
+            version=self.version
+        ).hex())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'character.d2s')
+            character.save(file_path)
+            with open(file_path, 'rb') as fr:
+                return fr.read()
+
+    def write_characters(self,
+                         dir_path: str,
+                         count: int,
+                         total_items: int,
+                         total_merc_items: int = None) -> list[str]:
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+
+        result = []
+        for index in range(count):
+            name = f'Synthetic{index:06d}'
+            file_path = os.path.join(dir_path, f'{name}.d2s')
+            with open(file_path, 'wb') as fr:
+                fr.write(self.make_character(
+                    total_items=total_items,
+                    total_merc_items=total_merc_items,
+                    name=name
+                ))
+            result.append(file_path)
+        return result
+
+    def write_item_library(self,
+                           dir_path: str,
+                           count: int,
+                           files_per_dir: int = 1000,
+                           items: list[bytes] = None) -> list[str]:
+        """
+        Item files spread over sub directories of `files_per_dir` files,
+        the way item libraries are kept in `d2s_storage`.
+        The given `items` are written, up to `count`, otherwise `count` items are made.
+        """
+        if items is not None:
+            count = min(count, len(items))
+
+        result = []
+        for index in range(count):
+            sub_dir_path = os.path.join(dir_path, f'{index // files_per_dir:04d}')
+            if not index % files_per_dir and not os.path.exists(sub_dir_path):
+                os.makedirs(sub_dir_path)
+
+            data = items[index] if items is not None else self.make_item()
+
+            file_path = os.path.join(sub_dir_path, f'item_{index:06d}.d2s')
+            with open(file_path, 'wb') as fr:
+                fr.write(data)
+            result.append(file_path)
+        return result
@@ -0,0 +1,65 @@
+"""
+Writes a synthetic corpus:
+
+    python -m src.generators out_dir --characters 100 --items 150 --merc-items 10 --library 10000
+"""
+import argparse
+import os
+
+from src.generators import Generator, DEFAULT_RARITY_MIX
+
+
+def parse_rarity_mix(value: str) -> dict[str, float]:
+    result = dict()
+    for i in value.split(','):
+        rarity, weight = i.split('=')
+        result[rarity.strip()] = float(weight)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates synthetic characters and item libraries')
+    parser.add_argument('out_dir')
+    parser.add_argument('--characters', type=int, default=0, help='number of character files')
+    parser.add_argument('--items', type=int, default=100, help='items per character, as many as fit in its stash, inventory and cube')
+    parser.add_argument('--merc-items', type=int, default=None, help='mercenary items per character')
+    parser.add_argument('--library', type=int, default=0, help='number of item files in the item library')
+    parser.add_argument('--files-per-dir', type=int, default=1000)
+    parser.add_argument('--mods', type=int, nargs=2, default=(2, 6), metavar=('MIN', 'MAX'),
+                        help='mods per item')
+    parser.add_argument('--rarity-mix', type=parse_rarity_mix,
+                        default=DEFAULT_RARITY_MIX,
+                        help='weights per rarity, e.g. "magic=30,rare=10,unique=5"')
+    parser.add_argument('--runeword-ratio', type=float, default=0.05)
+    parser.add_argument('--socketed-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generator = Generator(
+        seed=args.seed,
+        rarity_mix=args.rarity_mix,
+        mods_per_item=tuple(args.mods),
+        runeword_ratio=args.runeword_ratio,
+        socketed_ratio=args.socketed_ratio,
+    )
+
+    if args.characters:
+        characters = generator.write_characters(
+            dir_path=os.path.join(args.out_dir, 'characters'),
+            count=args.characters,
+            total_items=args.items,
+            total_merc_items=args.merc_items
+        )
+        print(f'Wrote {len(characters)} characters')
+
+    if args.library:
+        items = generator.write_item_library(
+            dir_path=os.path.join(args.out_dir, 'library'),
+            count=args.library,
+            files_per_dir=args.files_per_dir
+        )
+        print(f'Wrote {len(items)} item files')
+
+
+if __name__ == '__main__':
+    main()
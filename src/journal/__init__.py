@@ -0,0 +1,486 @@
+"""
+Undo and redo of character edits.
+
+Each recorded operation keeps only the bit ranges that changed in the items and difficulties,
+and the items added to or removed from the item lists:
+
+    journal = Journal(character)
+    with journal.record('upgrade'):
+        character.items[0].change_rarity(7)
+    journal.undo()
+    journal.redo()
+
+Items tell the journal before their first change, only the changed items are encoded when recording.
+Undoing restores the bits of the touched items and decodes their mods again,
+nothing else of the save is parsed.
+"""
+import contextlib
+import hashlib
+import json
+import os
+
+from src.bases.errors import Error
+from src.common.diagnostics import DIAGNOSTICS, DEBUG
+from src.common.layouts import DEFAULT_LAYOUT, FormatLayout
+from src.common.profiling import PROFILER
+from src.models.character import Character
+from src.models.item import Item
+
+JOURNAL_FORMAT_VERSION = 1
+JOURNAL_FILE_EXTENSION = '.journal'
+
+ITEM_LISTS = (
+    'items',
+    'merc_items',
+)
+DIFFICULTIES = 'difficulties'
+
+# kinds of delta
+BITS = 'bits'
+ADD = 'add'
+REMOVE = 'remove'
+
+
+def make_bits_delta(before: str, after: str) -> tuple[int, str, str]:
+    """
+    Trims the common prefix and suffix of two bit strings,
+    returns the start of the changed range with its old and new bits.
+    """
+    length = min(len(before), len(after))
+
+    start = 0
+    while start < length and before[start] == after[start]:
+        start += 1
+
+    end = 0
+    while end < length - start and before[-1 - end] == after[-1 - end]:
+        end += 1
+
+    return start, before[start:len(before) - end], after[start:len(after) - end]
+
+
+def bits_to_hex(bits: str) -> str:
+    """
+    Bit `i` is bit `i` of the little endian integer of the bytes.
+    """
+    length = (len(bits) + 7) // 8
+    return int(bits[::-1] or '0', 2).to_bytes(length, 'little').hex()
+
+
+def apply_bits_delta(bits: str, start: int, old: str, new: str) -> str:
+    if bits[start:start + len(old)] != old:
+        raise Error(
+            'JournalConflict',
+            f'Bits at {start} do not match the journal'
+        )
+    return bits[:start] + new + bits[start + len(old):]
+
+
+class Delta:
+    """
+    A change of one target: `list_name` is an item list or the difficulties,
+    `index` the position in it when the delta applies.
+    Bits deltas replace `old` with `new` from `start`,
+    add and remove deltas insert and take out `item`, whose bits are then `new`.
+    """
+
+    def __init__(self,
+                 kind: str,
+                 list_name: str,
+                 index: int,
+                 start: int = 0,
+                 old: str = '',
+                 new: str = '',
+                 item: Item = None):
+        self.kind = kind
+        self.list_name = list_name
+        self.index = index
+        self.start = start
+        self.old = old
+        self.new = new
+        self.item = item
+
+    def inverse(self) -> 'Delta':
+        if self.kind == BITS:
+            return Delta(BITS, self.list_name, self.index, start=self.start, old=self.new, new=self.old)
+
+        kind = REMOVE if self.kind == ADD else ADD
+        return Delta(kind, self.list_name, self.index, new=self.new, item=self.item)
+
+    def merge(self, other: 'Delta') -> 'Delta | None':
+        """
+        Merges a bits delta applied right after this one on the same target,
+        when their ranges overlap or touch.
+        """
+        if self.kind != BITS or other.kind != BITS:
+            return None
+        if (self.list_name, self.index) != (other.list_name, other.index):
+            return None
+
+        end = self.start + len(self.new)
+        other_end = other.start + len(other.old)
+        if other.start > end or other_end < self.start:
+            return None
+
+        # both ranges are known in the bits between the two deltas
+        start = min(self.start, other.start)
+        middle = self.new
+        if other.start < self.start:
+            middle = other.old[:self.start - other.start] + middle
+        if other_end > end:
+            middle = middle + other.old[end - other.start:]
+
+        prefix = self.start - start
+        old = middle[:prefix] + self.old + middle[prefix + len(self.new):]
+        new = middle[:other.start - start] + other.new + middle[other.start - start + len(other.old):]
+
+        return Delta(BITS, self.list_name, self.index, start=start, old=old, new=new)
+
+    def output(self) -> dict:
+        result = dict(
+            kind=self.kind,
+            list_name=self.list_name,
+            index=self.index,
+        )
+        if self.kind == BITS:
+            result.update(start=self.start, old=self.old, new=self.new)
+        else:
+            result['data'] = bits_to_hex(self.new)
+        return result
+
+    @classmethod
+    def from_output(cls, data: dict, layout: FormatLayout = DEFAULT_LAYOUT) -> 'Delta':
+        if data['kind'] != BITS:
+            # read with the structures of the character the journal was saved for
+            item = Item(data=data['data'], layout=layout)
+            return cls(
+                kind=data['kind'],
+                list_name=data['list_name'],
+                index=data['index'],
+                new=Journal._get_bits(item),
+                item=item
+            )
+        return cls(
+            kind=data['kind'],
+            list_name=data['list_name'],
+            index=data['index'],
+            start=data['start'],
+            old=data['old'],
+            new=data['new']
+        )
+
+
+class JournalEntry:
+
+    def __init__(self, label: str, deltas: list[Delta]):
+        self.label = label
+        self.deltas = deltas
+
+    @property
+    def size(self) -> int:
+        return sum(len(delta.old) + len(delta.new) for delta in self.deltas)
+
+    def output(self) -> dict:
+        return dict(
+            label=self.label,
+            deltas=[delta.output() for delta in self.deltas],
+        )
+
+
+class Journal:
+    """
+    `entries[:position]` are applied to the character, the others can be redone.
+    """
+
+    def __init__(self, character: Character):
+        self.character = character
+        self.entries: list[JournalEntry] = []
+        self.position = 0
+
+        self._recording = False
+        # id of the targets changed while recording, with their bits before
+        self._changed: dict[int, tuple] = dict()
+
+    @property
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.position < len(self.entries)
+
+    def _get_list(self, list_name: str) -> list:
+        if list_name == DIFFICULTIES:
+            return self.character._difficulties
+        return getattr(self.character, list_name)
+
+    @staticmethod
+    def _get_bits(target) -> str:
+        if isinstance(target, Item):
+            return ''.join(target._encode_bits())
+        return ''.join(target._bin_data_as_array)
+
+    @staticmethod
+    def _set_bits(target, bits: str):
+        if isinstance(target, Item):
+            target._restore_bits(list(bits))
+        else:
+            target._bin_data_as_array = list(bits)
+
+    def _watch(self, item: Item):
+        # the bits before the first change of the item
+        if id(item) not in self._changed:
+            self._changed[id(item)] = (item, self._get_bits(item))
+
+    def _snapshot(self) -> dict:
+        """
+        The targets of the lists, the items watched for their changes.
+        Difficulties are few and small, their bits are always kept.
+        """
+        self._changed = dict()
+
+        result = dict()
+        for list_name in ITEM_LISTS:
+            result[list_name] = list(self._get_list(list_name))
+            for item in result[list_name]:
+                item._watcher = self._watch
+
+        result[DIFFICULTIES] = list(self._get_list(DIFFICULTIES))
+        for diff in result[DIFFICULTIES]:
+            self._changed[id(diff)] = (diff, self._get_bits(diff))
+        return result
+
+    def _unwatch(self, snapshot: dict):
+        for list_name in ITEM_LISTS:
+            for item in snapshot[list_name]:
+                item._watcher = None
+
+    def _make_deltas(self, snapshot: dict) -> list[Delta]:
+        bits_deltas = []
+        removes = []
+        adds = []
+
+        for list_name, before in snapshot.items():
+            after = self._get_list(list_name)
+
+            # the kept targets have to stay in order,
+            # the others are taken out and inserted back
+            after_indexes = {id(target): i for i, target in enumerate(after)}
+            kept = set()
+            last_index = -1
+            for target in before:
+                index = after_indexes.get(id(target))
+                if index is not None and index > last_index:
+                    kept.add(id(target))
+                    last_index = index
+
+            for index, target in enumerate(before):
+                changed = self._changed.get(id(target))
+                if changed is None:
+                    continue
+                bits = changed[1]
+                current_bits = self._get_bits(target)
+                if current_bits != bits:
+                    start, old, new = make_bits_delta(bits, current_bits)
+                    bits_deltas.append(Delta(BITS, list_name, index, start=start, old=old, new=new))
+
+            for index in reversed(range(len(before))):
+                target = before[index]
+                if id(target) not in kept:
+                    removes.append(Delta(REMOVE, list_name, index, new=self._get_bits(target), item=target))
+
+            for index, target in enumerate(after):
+                if id(target) not in kept:
+                    adds.append(Delta(ADD, list_name, index, new=self._get_bits(target), item=target))
+
+        return bits_deltas + removes + adds
+
+    def _apply(self, delta: Delta):
+        targets = self._get_list(delta.list_name)
+
+        if delta.kind == BITS:
+            target = targets[delta.index]
+            self._set_bits(target, apply_bits_delta(
+                bits=self._get_bits(target),
+                start=delta.start,
+                old=delta.old,
+                new=delta.new
+            ))
+        elif delta.kind == ADD:
+            targets.insert(delta.index, delta.item)
+        else:
+            if delta.index >= len(targets) or self._get_bits(targets[delta.index]) != delta.new:
+                raise Error(
+                    'JournalConflict',
+                    f'Item at {delta.index} of {delta.list_name} does not match the journal'
+                )
+            # the removed object is kept, redoing inserts it back as is
+            delta.item = targets.pop(delta.index)
+
+    @contextlib.contextmanager
+    def record(self, label: str = None):
+        """
+        Records the changes of a block as one entry, and reverts them if it raises.
+        Only the items changed in the block, and the ones added or removed, are encoded,
+        items have to be changed through their methods.
+        """
+        if self._recording:
+            raise Error(
+                'RecordInProgress',
+                'The journal is already recording'
+            )
+
+        with PROFILER.phase('journal.snapshot'):
+            snapshot = self._snapshot()
+
+        self._recording = True
+        try:
+            yield self
+        except BaseException:
+            deltas = self._make_deltas(snapshot)
+            for delta in reversed(deltas):
+                self._apply(delta.inverse())
+            raise
+        else:
+            with PROFILER.phase('journal.diff'):
+                deltas = self._make_deltas(snapshot)
+            if deltas:
+                self._push(JournalEntry(label=label, deltas=deltas))
+        finally:
+            self._unwatch(snapshot)
+            self._changed = dict()
+            self._recording = False
+
+    def _push(self, entry: JournalEntry):
+        # a new entry drops the undone ones
+        del self.entries[self.position:]
+        self.entries.append(entry)
+        self.position += 1
+
+        if DIAGNOSTICS.enabled_for(DEBUG):
+            DIAGNOSTICS.debug(
+                'JournalRecorded',
+                'Recorded {label}: {deltas} deltas, {size} bits',
+                label=entry.label,
+                deltas=len(entry.deltas),
+                size=entry.size
+            )
+
+    def undo(self) -> JournalEntry:
+        if not self.can_undo:
+            raise Error('NothingToUndo', 'There is no entry to undo')
+
+        entry = self.entries[self.position - 1]
+        with PROFILER.phase('journal.undo'):
+            for delta in reversed(entry.deltas):
+                self._apply(delta.inverse())
+        self.position -= 1
+        return entry
+
+    def redo(self) -> JournalEntry:
+        if not self.can_redo:
+            raise Error('NothingToRedo', 'There is no entry to redo')
+
+        entry = self.entries[self.position]
+        with PROFILER.phase('journal.redo'):
+            for delta in entry.deltas:
+                self._apply(delta)
+        self.position += 1
+        return entry
+
+    def squash(self, start: int = 0, end: int = None, label: str = None) -> JournalEntry:
+        """
+        Replaces the applied entries from `start` to `end` with a single one.
+        """
+        if end is None:
+            end = self.position
+        if not 0 <= start < end <= self.position:
+            raise Error(
+                'InvalidParams',
+                f'Cannot squash entries {start} to {end}, {self.position} are applied'
+            )
+
+        entries = self.entries[start:end]
+
+        deltas = []
+        for entry in entries:
+            for delta in entry.deltas:
+                merged = deltas[-1].merge(delta) if deltas else None
+                if merged is not None:
+                    deltas[-1] = merged
+                else:
+                    deltas.append(delta)
+
+        # deltas that cancel out are dropped
+        deltas = [
+            delta for delta in deltas
+            if delta.kind != BITS or delta.old != delta.new
+        ]
+
+        if label is None:
+            label = entries[-1].label
+
+        result = JournalEntry(label=label, deltas=deltas)
+        self.entries[start:end] = [result]
+        self.position -= len(entries) - 1
+        return result
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the bits of the items and difficulties of the character.
+        """
+        result = hashlib.sha1()
+        for list_name in ITEM_LISTS + (DIFFICULTIES,):
+            for target in self._get_list(list_name):
+                result.update(self._get_bits(target).encode())
+                result.update(b'|')
+            result.update(b'#')
+        return result.hexdigest()
+
+    @staticmethod
+    def make_sidecar_path(file_path: str) -> str:
+        return file_path + JOURNAL_FILE_EXTENSION
+
+    def save(self, file_path: str):
+        data = dict(
+            version=JOURNAL_FORMAT_VERSION,
+            fingerprint=self.fingerprint(),
+            position=self.position,
+            entries=[entry.output() for entry in self.entries],
+        )
+
+        tmp_path = f'{file_path}.tmp'
+        with open(tmp_path, 'w') as file_ref:
+            json.dump(data, file_ref, separators=(',', ':'))
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str, character: Character) -> 'Journal':
+        """
+        Loads a journal saved for the current state of the character.
+        """
+        with open(file_path, 'r') as file_ref:
+            data = json.load(file_ref)
+
+        if data.get('version') != JOURNAL_FORMAT_VERSION:
+            raise Error(
+                'UnsupportedJournal',
+                f'Unsupported journal version: {data.get("version")}'
+            )
+
+        result = cls(character)
+        if data['fingerprint'] != result.fingerprint():
+            raise Error(
+                'JournalMismatch',
+                f'Journal {file_path} was not saved for this character'
+            )
+
+        result.entries = [
+            JournalEntry(
+                label=entry['label'],
+                deltas=[Delta.from_output(delta, layout=character._layout) for delta in entry['deltas']]
+            )
+            for entry in data['entries']
+        ]
+        result.position = data['position']
+        return result
@@ -12,12 +12,17 @@ from src.common.constants.character import (
     ITEM_LIST_HEADER, ITEM_LIST_FOOTER, ITEM_HEADER, STRUCTURE,
     MERC_ITEM_LIST_HEADER, FOOTER, STASH_SIZE, INVENTORY_SIZE, DIFFICULTY_STRUCTURE, DIFFICULTY_INDEX_MAPPING
 )
-from src.models.item import Item
+from src.models.item import Item, ItemTemplate
+from src.storage import ItemStore
 from src.common.utils import (
     dec_to_hex, make_byte_array_from_hex,
     get_dict_key_from_value, dec_to_bin, convert_byte_array_to_bit, bin_to_dec, bin_to_hex
 )
 from src.common.constants.dirs import D2S_STORAGE_DIR
+from src.common.layouts import FormatLayout, get_layout, read_version
+from src.common.locks import write_file
+from src.common.profiling import PROFILER
+from src.common.diagnostics import DIAGNOSTICS, DEBUG, INFO
 from src.common.constants.items import HORADRIC_CUBE_SIZE, LOCATIONS, STORAGES
 
 
@@ -100,34 +105,83 @@ class CharacterDifficulty(IngameModel):
 
 class Character(IngameModel):
     _hex_data_as_byte_array: list[str]
+    _layout: FormatLayout
+    _header: tuple | None = None
     _difficulties: list[CharacterDifficulty]
     _items: list[Item]
     _merc_items: list[Item]
 
     def __init__(self, **kwargs):
-        super(Character, self).__init__(**kwargs)
+        with PROFILER.phase('character.init'):
+            super(Character, self).__init__(**kwargs)
 
-        self._hex_data_as_byte_array = make_byte_array_from_hex(self.data)
+            with PROFILER.phase('character.hex'):
+                self._hex_data_as_byte_array = make_byte_array_from_hex(self.data)
 
-        self._difficulties = self._load_difficulties()
+            # offsets of every structure are taken from this layout from now on
+            self._layout = get_layout(read_version(bytes.fromhex(self.data[:16])))
 
-        self._items = self._parse_items(self.item_start_index, self.item_list_footer_index)
+            self._difficulties = self._load_difficulties()
 
-        self._merc_items = []
+            with PROFILER.phase('character.layout'):
+                item_start_index = self.item_start_index
+                item_list_footer_index = self.item_list_footer_index
 
-        if self.merc_name_id:
-            self._merc_items = self._parse_items(self.merc_item_start_index)
+            self._items = self._parse_items(item_start_index, item_list_footer_index)
+
+            self._merc_items = []
+
+            if self.merc_name_id:
+                with PROFILER.phase('character.layout'):
+                    merc_item_start_index = self.merc_item_start_index
+
+                self._merc_items = self._parse_items(merc_item_start_index)
 
     @property
     def items(self):
         return self._items
 
+    @property
+    def merc_items(self):
+        return self._merc_items
+
+    @property
+    def header(self):
+        """
+        The fields of the fixed header, unpacked once.
+        """
+        if self._header is None:
+            self._header = self._layout.header.unpack(bytes.fromhex(
+                ''.join(self._hex_data_as_byte_array[:self._layout.header.size])
+            ))
+        return self._header
+
+    def update_header(self, **values):
+        """
+        Writes header fields, by their names in `STRUCTURE`.
+        """
+        header = self.header._replace(**values)
+        self._hex_data_as_byte_array[:self._layout.header.size] = make_byte_array_from_hex(
+            self._layout.header.pack(header).hex()
+        )
+        self._header = header
+        return self
+
     @property
     def version(self):
-        index, length = STRUCTURE['version']
-        value = self._hex_data_as_byte_array[index:index + length]
-        value = ''.join(value[::-1])
-        return int(value, 16)
+        return self.header.version
+
+    @property
+    def name(self) -> str:
+        return self.header.character_name.split(b'\x00')[0].decode('latin-1')
+
+    @property
+    def class_id(self) -> int:
+        return self.header.character_class
+
+    @property
+    def level(self) -> int:
+        return self.header.character_level
 
     @property
     def item_list_header_index(self):
@@ -145,7 +199,7 @@ class Character(IngameModel):
 
     @property
     def difficulty_struct(self) -> tuple[int, int]:
-        return STRUCTURE['difficulty']
+        return self._layout.structure['difficulty']
 
     def _load_difficulties(self) -> list[CharacterDifficulty]:
         result = list()
@@ -167,7 +221,13 @@ class Character(IngameModel):
         result = dict()
         for diff in self._difficulties:
             result[diff.code] = diff.to_dict()
-            print(diff.code, diff.updated_data)
+            if DIAGNOSTICS.enabled_for(DEBUG):
+                DIAGNOSTICS.debug(
+                    'DifficultyData',
+                    '{code}: {data}',
+                    code=diff.code,
+                    data=diff.updated_data
+                )
         return result
 
     def change_act(self, act_id: int):
@@ -185,13 +245,11 @@ class Character(IngameModel):
 
     @property
     def map_info(self):
-        index, length = STRUCTURE['map']
-        value = self._hex_data_as_byte_array[index:index + length]
-        value = ''.join(value[::-1])
+        _, length = self._layout.structure['map']
 
         # TODO: decode this data
 
-        return value
+        return f'{self.header.map:0{length * 2}x}'
 
     @property
     def item_start_index(self):
@@ -199,10 +257,7 @@ class Character(IngameModel):
 
     @property
     def merc_name_id(self):
-        index, length = STRUCTURE['mercenary_name_id']
-        value = self._hex_data_as_byte_array[index: index + length][::-1]
-        value = ''.join(value)
-        return int(value, 16)
+        return self.header.mercenary_name_id
 
     @property
     def merc_item_list_header_index(self):
@@ -221,6 +276,10 @@ class Character(IngameModel):
         return len(self._hex_data_as_byte_array) - len(FOOTER)
 
     def _parse_items(self, start: int, end: int = None):
+        with PROFILER.phase('character.parse_items'):
+            return self._split_items(start, end)
+
+    def _split_items(self, start: int, end: int = None):
         if not end:
             end = self.footer_index
 
@@ -234,13 +293,13 @@ class Character(IngameModel):
             if not i:
                 continue
             item_data = item_header_as_str + i
-            result.append(Item(data=item_data))
+            result.append(Item(data=item_data, layout=self._layout))
 
         return result
 
     @staticmethod
-    def calculate_checksum(data):
-        index, length = STRUCTURE['checksum']
+    def calculate_checksum(data, structure: dict = STRUCTURE):
+        index, length = structure['checksum']
         result = np.int32(0)
         for i, b in enumerate(data):
             if index <= i < (index + length):
@@ -251,18 +310,35 @@ class Character(IngameModel):
         return result
 
     def save(self, file_path: str, backup_path: str = None):
+        with PROFILER.phase('character.save'):
+            self._save(file_path, backup_path=backup_path)
 
-        diff_index, diff_length = self.difficulty_struct
+    def _save(self, file_path: str, backup_path: str = None):
+        data = self.encode()
 
-        result = self._hex_data_as_byte_array[:diff_index]
+        # backup
+        if backup_path:
+            write_file(backup_path, bytes.fromhex(self.data))
+
+        with PROFILER.phase('character.write'):
+            write_file(file_path, data)
+
+    def encode(self) -> bytes:
+        """
+        The save as written by `save`, with its file size and checksum.
+        """
+        header_layout = self._layout.header
 
         diff_data = []
         for diff in self._difficulties:
             diff_data.extend(diff.updated_data)
-        result.extend(diff_data)
 
-        # fill data from difficulties to item start index
-        result.extend(self._hex_data_as_byte_array[diff_index + diff_length:self.item_list_header_index])
+        header = self.header._replace(difficulty=bytes.fromhex(''.join(diff_data)), file_size=0, checksum=0)
+
+        result = make_byte_array_from_hex(header_layout.pack(header).hex())
+
+        # fill data from the header to item start index
+        result.extend(self._hex_data_as_byte_array[header_layout.size:self.item_list_header_index])
 
         item_list_data = []
         item_list_data.extend(ITEM_LIST_HEADER)
@@ -296,31 +372,15 @@ class Character(IngameModel):
 
         result.extend(FOOTER)
 
-        file_size_index, file_size_length = STRUCTURE['file_size']
-        file_size = make_byte_array_from_hex(dec_to_hex(len(result), length=file_size_length * 2))[::-1]
-        result[file_size_index: file_size_index + file_size_length] = file_size
+        header = header._replace(file_size=len(result))
+        result[:header_layout.size] = make_byte_array_from_hex(header_layout.pack(header).hex())
 
-        checksum_index, checksum_length = STRUCTURE['checksum']
-        checksum = self.calculate_checksum(result)
-        checksum = make_byte_array_from_hex(dec_to_hex(
-            checksum,
-            length=checksum_length * 2
-        ))[::-1]
-        result[checksum_index: checksum_index + checksum_length] = checksum
+        with PROFILER.phase('character.checksum'):
+            checksum = self.calculate_checksum(result, self._layout.structure)
+        header = header._replace(checksum=int(checksum))
+        result[:header_layout.size] = make_byte_array_from_hex(header_layout.pack(header).hex())
 
-        # backup
-        if backup_path:
-            with open(backup_path, 'wb') as file_ref:
-                file_ref.write(bytes.fromhex(self.data))
-
-        # origin = make_byte_array_from_hex(self._raw_data)
-        #
-        # for index, byte in enumerate(result):
-        #     if byte != origin[index]:
-        #         print('diff', index, byte, origin[index])
-
-        with open(file_path, 'wb') as file_ref:
-            file_ref.write(bytes.fromhex(''.join(result)))
+        return bytes.fromhex(''.join(result))
 
     def scan_items_by_position(self,
                                location_code: int,
@@ -369,10 +429,16 @@ class Character(IngameModel):
                   dir_path: str = None,
                   item_list: list[dict] = None,
                   storage_x: int = 0,
+                  item_store: ItemStore = None,
                   ):
 
+        # template and quantity of each adding item
         adding_items = []
 
+        # equivalent item files are parsed only once
+        if item_store is None:
+            item_store = ItemStore(D2S_STORAGE_DIR)
+
         if from_dir:
             if not dir_path:
                 raise Error(
@@ -384,15 +450,14 @@ class Character(IngameModel):
                 if not n.endswith('.d2s'):
                     continue
                 item_full_path = os.path.join(abs_dir_path, n)
-                with open(item_full_path, 'rb') as fr:
-                    try:
-                        item = Item(data=fr.read().hex())
-                    except Exception as e:
-                        raise Error(
-                            'InvalidParams',
-                            f'Invalid item from {item_full_path}: {e}'
-                        )
-                    adding_items.append(item)
+                try:
+                    item = item_store.load(item_full_path)
+                except Exception as e:
+                    raise Error(
+                        'InvalidParams',
+                        f'Invalid item from {item_full_path}: {e}'
+                    )
+                adding_items.append((ItemTemplate(item), 1))
         else:
             for item_data in item_list:
                 try:
@@ -404,18 +469,16 @@ class Character(IngameModel):
                         f'Missing {e} for item data'
                     )
                 item_full_path = os.path.join(D2S_STORAGE_DIR, item_path)
-                with open(item_full_path, 'rb') as fr:
-                    try:
-                        item = Item(data=fr.read().hex())
-                    except Exception as e:
-                        raise Error(
-                            'InvalidParams',
-                            f'Invalid item from {item_full_path}: {e}'
-                        )
-                    for i in range(quantity):
-                        adding_items.append(item.clone())
-
-        storage = LOCATIONS.get(storage_id)
+                try:
+                    item = item_store.load(item_full_path)
+                except Exception as e:
+                    raise Error(
+                        'InvalidParams',
+                        f'Invalid item from {item_full_path}: {e}'
+                    )
+                adding_items.append((ItemTemplate(item), quantity))
+
+        storage = STORAGES.get(storage_id)
         if not storage:
             raise Error(
                 'InvalidParams',
@@ -431,23 +494,36 @@ class Character(IngameModel):
         y = 0
         x = storage_x or 0
 
-        for index, item in enumerate(adding_items):
-            width, height = item.size
+        unique_id = int(time.time())
+
+        for template, quantity in adding_items:
+            width, height = template.size
+
+            positions = []
+            for i in range(quantity):
+                positions.append((x, y))
+
+                x += width
+                if (x + width - 1) > max_x:
+                    x = 0
+                    y = min(y + height, max_y)
 
-            item.change_position(
+            items = template.build_many(
                 storage_id=storage_id,
                 location_id=location_id,
-                storage_x=x,
-                storage_y=y
+                positions=positions,
+                unique_id=unique_id
             )
-            item.update_id(int(time.time()))
-            self._items.append(item)
-            print(f'Added item: {item.code}')
-
-            x += width
-            if (x + width - 1) > max_x:
-                x = 0
-                y = min(y + height, max_y)
+            for item, (storage_x, storage_y) in zip(items, positions):
+                self._items.append(item)
+                if DIAGNOSTICS.enabled_for(INFO):
+                    DIAGNOSTICS.info(
+                        'ItemAdded',
+                        'Added item: {code}',
+                        code=item.code,
+                        storage_x=storage_x,
+                        storage_y=storage_y
+                    )
 
     def duplicate_items(self,
                         item: Item,
@@ -474,14 +550,20 @@ class Character(IngameModel):
         y = 0
         x = storage_x or 0
         for i in range(quantity):
-            cloned_item = item.clone()
-            print(x, y, i)
-            cloned_item.change_position(
+            cloned_item = item.clone(
                 location_id=location_id,
                 storage_id=storage_id,
                 storage_x=x,
                 storage_y=y
             )
+            if DIAGNOSTICS.enabled_for(DEBUG):
+                DIAGNOSTICS.debug(
+                    'ItemDuplicated',
+                    'Duplicated item {index} at {storage_x}, {storage_y}',
+                    index=i,
+                    storage_x=x,
+                    storage_y=y
+                )
 
             self._items.append(cloned_item)
 
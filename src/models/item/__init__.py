@@ -1,12 +1,14 @@
-import copy
+import functools
 import time
 from math import ceil
+from collections.abc import Mapping
+from typing import Any, Callable
 
 from src.bases.errors import Error
 from src.bases.models import IngameModel, BaseModel
 from src.common.constants.items import (
-    NON_EAR_STRUCTURE, RARITIES,
-    BASE_STRUCTURE, LOCATIONS, STORAGES, EQUIPPED_LOCATIONS, ITEM_FOOTER,
+    RARITIES,
+    LOCATIONS, STORAGES, EQUIPPED_LOCATIONS, ITEM_FOOTER,
     START_DEFENSE_VALUE, START_MAX_DURABILITY_VALUE,
     START_CURRENT_DURABILITY_VALUE, MOD_ID_LENGTH,
     END_OF_MOD_SECTION,
@@ -20,10 +22,15 @@ from src.common.constants.items import (
     ITEM_UPGRADED_MOD_CODE,
     SHRINE_BLESSED_MOD_CODE
 )
-from src.common.data import ITEM_BASE_STATS, ITEM_TYPES, ITEM_BASE_MODS, BASE_ITEMS, SKILLS
+from src.common.data import ITEM_BASE_STATS, ITEM_TYPES, ITEM_BASE_MODS, BASE_ITEMS, SKILLS, get_catalog_index
+from src.common.layouts import FormatLayout, DEFAULT_LAYOUT
+from src.common.locks import write_file
+from src.common.profiling import PROFILER
+from src.common.diagnostics import DIAGNOSTICS, TRACE
 from src.common.utils import (
     bin_to_hex, bin_to_dec, split_array,
     dec_to_bin, make_byte_array_from_hex, convert_byte_array_to_bit,
+    LazyDenseTable,
 )
 
 
@@ -113,6 +120,29 @@ class Stat(IngameModel):
     pass
 
 
+def make_table_by_id(name: str, catalog: Mapping, build: Callable[[dict], Any]) -> LazyDenseTable:
+    """
+    The entries of a catalog by id, each built on its first lookup
+    so a worker mapping the shared catalog only decodes the ones its items use.
+    """
+    index = get_catalog_index(name, 'id')
+    size = max((int(catalog_id) + 1 for catalog_id in index), default=0)
+
+    def load(catalog_id: int):
+        key = index.get(str(catalog_id))
+        if key is None:
+            return None
+        return build(catalog[key])
+
+    return LazyDenseTable(size, load)
+
+
+# stats by id, for the unknown mods of which only the length is needed
+BASE_STATS_BY_ID: LazyDenseTable = make_table_by_id(
+    'item_stats', ITEM_BASE_STATS, lambda stat: BaseStat(**stat)
+)
+
+
 class BaseModifierProperty(BaseModel):
     code: str
     length: int
@@ -129,6 +159,17 @@ class BaseModifier(BaseModel):
     conversion_rate: int | float = 1
 
 
+# the decode loops index these by the integer ids read from the items, the catalogs are keyed by str
+BASE_MODS_BY_ID: LazyDenseTable = make_table_by_id(
+    'item_mods', ITEM_BASE_MODS, lambda data: BaseModifier(**data)
+)
+SKILL_NAMES_BY_ID: LazyDenseTable = make_table_by_id(
+    'skills', SKILLS, lambda skill: skill.get('name')
+)
+# properties of the mods of BASE_MODS_BY_ID, filled on first use
+_MOD_PROPERTIES_BY_ID: list[list['BaseModifierProperty'] | None] = [None] * len(BASE_MODS_BY_ID)
+
+
 class ModPropertyValues(BaseModel):
     value: float | int | None = None
     monster_id: int | None = None
@@ -187,7 +228,7 @@ class Modifier(IngameModel):
         result = ModPropertyValues()
         start_index = MOD_ID_LENGTH
 
-        for p in self.init_properties(self.base):
+        for p in self.get_properties(self.base):
             prop_code_data_type_info = result.__fields__.get(p.code)
             if prop_code_data_type_info is None:
                 raise Error(
@@ -209,9 +250,8 @@ class Modifier(IngameModel):
             ADDING_OSKILL_MOD_CODE
         ]:
             skill_id = result.skill_id
-            skill = SKILLS.get(str(skill_id))
-            if skill:
-                result.skill_name = skill.get('name')
+            if skill_id is not None and 0 <= skill_id < len(SKILL_NAMES_BY_ID):
+                result.skill_name = SKILL_NAMES_BY_ID[skill_id]
 
         return result
 
@@ -221,7 +261,7 @@ class Modifier(IngameModel):
 
         prop_data = []
 
-        for p in self.init_properties(self.base):
+        for p in self.get_properties(self.base):
 
             min_value = p.min_value
             max_value = bin_to_dec('1' * p.length)
@@ -247,6 +287,20 @@ class Modifier(IngameModel):
 
         self.data = ''.join(data_as_array)
 
+    @staticmethod
+    def get_properties(base_mod: BaseModifier) -> list[BaseModifierProperty]:
+        """
+        `init_properties` of a catalog mod computed once, the returned list is shared.
+        """
+        mod_id = base_mod.id
+        if not (0 <= mod_id < len(BASE_MODS_BY_ID)) or BASE_MODS_BY_ID[mod_id] is not base_mod:
+            return Modifier.init_properties(base_mod)
+
+        result = _MOD_PROPERTIES_BY_ID[mod_id]
+        if result is None:
+            result = _MOD_PROPERTIES_BY_ID[mod_id] = Modifier.init_properties(base_mod)
+        return result
+
     @staticmethod
     def init_properties(base_mod: BaseModifier) -> list[BaseModifierProperty]:
         default_property = BaseModifierProperty(
@@ -335,6 +389,18 @@ class Modifier(IngameModel):
         return result
 
 
+def mutation(method):
+    """
+    Marks a method changing an item, its watcher is called before the change.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._watcher is not None:
+            self._watcher(self)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
 class Item(IngameModel):
     _hex_data_as_byte_array: list[str]
     _bin_data_as_array: list[str]
@@ -345,18 +411,35 @@ class Item(IngameModel):
 
     _stats: dict[str, Stat]
 
-    def __init__(self, **kwargs):
-        super(Item, self).__init__(**kwargs)
+    # structures of the save format of the item, from its character
+    _layout: FormatLayout
 
-        self._hex_data_as_byte_array = make_byte_array_from_hex(self.data)
-        # reverse because little endian
-        self._bin_data_as_array = list(reversed(
-            convert_byte_array_to_bit(
-                data=list(reversed(self._hex_data_as_byte_array))
-            )
-        ))
-        self._base = self._load_base_item()
-        self._mods = self._load_mods()
+    # structural edits are queued while a batch is open, see `Item.batch`
+    _batch: 'ItemBatch | None' = None
+
+    # called with the item before its changes, see `Journal.record`
+    _watcher: Callable[['Item'], None] | None = None
+
+    def __init__(self, layout: FormatLayout = None, **kwargs):
+        with PROFILER.phase('item.init'):
+            super(Item, self).__init__(**kwargs)
+
+            self._layout = layout or DEFAULT_LAYOUT
+
+            with PROFILER.phase('item.bits'):
+                self._hex_data_as_byte_array = make_byte_array_from_hex(self.data)
+                # reverse because little endian
+                self._bin_data_as_array = list(reversed(
+                    convert_byte_array_to_bit(
+                        data=list(reversed(self._hex_data_as_byte_array))
+                    )
+                ))
+            PROFILER.count('item.bits_decoded', len(self._bin_data_as_array))
+
+            with PROFILER.phase('item.base'):
+                self._base = self._load_base_item()
+
+            self._mods = self._load_mods()
 
     @property
     def mods(self):
@@ -368,10 +451,10 @@ class Item(IngameModel):
 
     @staticmethod
     def get_base_mod_from_stat_code(stat_code: str) -> BaseModifier | None:
-        for i in ITEM_BASE_MODS.values():
-            if i['stat_code'] == stat_code:
-                return BaseModifier(**i)
-        return None
+        key = get_catalog_index('item_mods', 'stat_code').get(stat_code)
+        if key is None:
+            return None
+        return BaseModifier(**ITEM_BASE_MODS[key])
 
     @property
     def base(self):
@@ -392,26 +475,28 @@ class Item(IngameModel):
 
     @staticmethod
     def find_item_stat_from_id(stat_id: int) -> BaseStat | None:
-        for stat in ITEM_BASE_STATS.values():
-            if stat['id'] == stat_id:
-                return BaseStat(**stat)
+        if 0 <= stat_id < len(BASE_STATS_BY_ID):
+            return BASE_STATS_BY_ID[stat_id]
         return None
 
     @staticmethod
     def find_base_mod_by_id(id: int) -> BaseModifier | None:
-        id_as_str = str(id)
-        if id_as_str not in ITEM_BASE_MODS:
-            return None
-        return BaseModifier(**ITEM_BASE_MODS[id_as_str])
+        if 0 <= id < len(BASE_MODS_BY_ID):
+            return BASE_MODS_BY_ID[id]
+        return None
 
     @staticmethod
     def find_base_mod_by_code(code: str) -> BaseModifier | None:
-        for i in ITEM_BASE_MODS.values():
-            if i['code'] == code:
-                return BaseModifier(**i)
-        return None
+        key = get_catalog_index('item_mods', 'code').get(code)
+        if key is None:
+            return None
+        return BaseModifier(**ITEM_BASE_MODS[key])
 
     def _load_mods(self):
+        with PROFILER.phase('item.load_mods'):
+            return self._decode_mods()
+
+    def _decode_mods(self):
         mods = dict()
 
         if self.is_ear or self.is_simple:
@@ -444,15 +529,18 @@ class Item(IngameModel):
             if item_base_mod:
                 mod_data_length = sum(map(
                     lambda f: f.length,
-                    Modifier.init_properties(item_base_mod)
+                    Modifier.get_properties(item_base_mod)
                 ))
                 next_mod_index = mod_data_index + mod_data_length
 
                 mod_data_as_bin_array = total_mod_data[start_index: next_mod_index]
                 mod_data = ''.join(mod_data_as_bin_array)
-                mod = Modifier(data=mod_data,
-                               runeword=rw_loading,
-                               base=item_base_mod)
+                with PROFILER.phase('item.mod_validation'):
+                    mod = Modifier(data=mod_data,
+                                   runeword=rw_loading,
+                                   base=item_base_mod)
+                PROFILER.count('item.mods_decoded')
+                PROFILER.count('item.mod_bits_decoded', len(mod_data))
 
                 if mod.id in mods:
                     raise Error(
@@ -466,15 +554,27 @@ class Item(IngameModel):
                 # if we encounter an unknown mod,
                 # we find the item stat using mod_code as stat id
                 # then we use the bit length from stat to skip to the next mod
-                print(f'Mod not found: {base_mod_id} at index {start_index}'
-                      f' - item: {self._base.model_dump_json()} - id: {self.id}')
+                DIAGNOSTICS.warning(
+                    'ModNotFound',
+                    'Mod not found: {mod_id} at index {index} - item: {item_code} - id: {item_id}',
+                    mod_id=base_mod_id,
+                    index=self.start_mod_index + start_index,
+                    item_code=self._base.code,
+                    item_id=self.id
+                )
 
                 item_stat = self.find_item_stat_from_id(stat_id=base_mod_id)
                 # if there's no such stat,
                 # we stop
                 if not item_stat:
-                    print(f'Stat not found: {base_mod_id} at index {start_index}'
-                          f' - item: {self._base.name} - id: {self.id}')
+                    DIAGNOSTICS.warning(
+                        'StatNotFound',
+                        'Stat not found: {mod_id} at index {index} - item: {item_name} - id: {item_id}',
+                        mod_id=base_mod_id,
+                        index=self.start_mod_index + start_index,
+                        item_name=self._base.name,
+                        item_id=self.id
+                    )
                     break
 
                 stat_length = item_stat.length
@@ -486,31 +586,31 @@ class Item(IngameModel):
 
     @property
     def is_socketed(self):
-        index, length = BASE_STRUCTURE['is_socketed']
+        index, length = self._layout.base_structure['is_socketed']
         value = self._bin_data_as_array[index]
         return value == '1'
 
     @property
     def is_runeword(self):
-        index, length = BASE_STRUCTURE['is_runeword']
+        index, length = self._layout.base_structure['is_runeword']
         value = self._bin_data_as_array[index]
         return value == '1'
 
     @property
     def is_ear(self):
-        index, length = BASE_STRUCTURE['is_ear']
+        index, length = self._layout.base_structure['is_ear']
         value = self._bin_data_as_array[index]
         return value == '1'
 
     @property
     def is_simple(self):
-        index, length = BASE_STRUCTURE['is_simple']
+        index, length = self._layout.base_structure['is_simple']
         value = self._bin_data_as_array[index]
         return value == '1'
 
     @property
     def location(self):
-        index, length = BASE_STRUCTURE['location']
+        index, length = self._layout.base_structure['location']
         value = self._bin_data_as_array[index:index + length][::-1]
         value = ''.join(value)
         value = bin_to_dec(value)
@@ -518,7 +618,7 @@ class Item(IngameModel):
 
     @property
     def equipped_location(self):
-        index, length = BASE_STRUCTURE['equipped_location']
+        index, length = self._layout.base_structure['equipped_location']
         value = self._bin_data_as_array[index:index + length][::-1]
         value = ''.join(value)
         value = bin_to_dec(value)
@@ -526,7 +626,7 @@ class Item(IngameModel):
 
     @property
     def storage(self):
-        index, length = BASE_STRUCTURE['storage']
+        index, length = self._layout.base_structure['storage']
         value = self._bin_data_as_array[index: index + length][::-1]
         value = ''.join(value)
         value = bin_to_dec(value)
@@ -534,14 +634,14 @@ class Item(IngameModel):
 
     @property
     def storage_x(self):
-        index, length = BASE_STRUCTURE['storage_x']
+        index, length = self._layout.base_structure['storage_x']
         value = self._bin_data_as_array[index: index + length][::-1]
         value = ''.join(value)
         return bin_to_dec(value)
 
     @property
     def storage_y(self):
-        index, length = BASE_STRUCTURE['storage_y']
+        index, length = self._layout.base_structure['storage_y']
         value = self._bin_data_as_array[index: index + length][::-1]
         value = ''.join(value)
         return bin_to_dec(value)
@@ -550,7 +650,7 @@ class Item(IngameModel):
     def code(self):
         if self.is_ear:
             return None
-        index, length = NON_EAR_STRUCTURE['code']
+        index, length = self._layout.non_ear_structure['code']
         value = self._bin_data_as_array[index:index + length]
         result = ''
         for v in split_array(value, 8, padding='0'):
@@ -564,7 +664,7 @@ class Item(IngameModel):
     def id(self):
         if self.is_ear or self.is_simple:
             return None
-        index, length = NON_EAR_STRUCTURE['unique_id']
+        index, length = self._layout.non_ear_structure['unique_id']
         value = self._bin_data_as_array[index:index + length][::-1]
         return bin_to_dec(''.join(value))
 
@@ -572,24 +672,24 @@ class Item(IngameModel):
     def level(self):
         if self.is_ear or self.is_simple:
             return None
-        return self._read_data(*NON_EAR_STRUCTURE['level'])
+        return self._read_data(*self._layout.non_ear_structure['level'])
 
     @property
     def rarity(self):
         if self.is_ear or self.is_simple:
             return None
-        return RARITIES.get(self._read_data(*NON_EAR_STRUCTURE['rarity']))
+        return RARITIES.get(self._read_data(*self._layout.non_ear_structure['rarity']))
 
     @property
     def has_custom_graphic(self):
         if self.is_ear or self.is_simple:
             return None
-        return self._read_data(*NON_EAR_STRUCTURE['has_custom_graphic']) > 0
+        return self._read_data(*self._layout.non_ear_structure['has_custom_graphic']) > 0
 
     @property
     def has_class_spec_index(self):
-        has_custom_graphic_index, has_custom_graphic_length = NON_EAR_STRUCTURE['has_custom_graphic']
-        _, custom_graphic_length = NON_EAR_STRUCTURE['custom_graphic']
+        has_custom_graphic_index, has_custom_graphic_length = self._layout.non_ear_structure['has_custom_graphic']
+        _, custom_graphic_length = self._layout.non_ear_structure['custom_graphic']
 
         result = has_custom_graphic_index + has_custom_graphic_length
 
@@ -602,12 +702,12 @@ class Item(IngameModel):
     def has_class_spec(self):
         if self.is_ear or self.is_simple:
             return None
-        _, length = NON_EAR_STRUCTURE['has_class_spec']
+        _, length = self._layout.non_ear_structure['has_class_spec']
         return self._read_data(self.has_class_spec_index, length) > 0
 
     @property
     def class_spec_index(self):
-        _, has_class_spec_length = NON_EAR_STRUCTURE['has_class_spec']
+        _, has_class_spec_length = self._layout.non_ear_structure['has_class_spec']
         result = self.has_class_spec_index + has_class_spec_length
 
         return result
@@ -617,7 +717,7 @@ class Item(IngameModel):
         if not self.has_class_spec:
             return None
 
-        _, length = NON_EAR_STRUCTURE['class_spec']
+        _, length = self._layout.non_ear_structure['class_spec']
         class_spec_data = self._read_data(self.class_spec_index, length)
         return class_spec_data
 
@@ -629,16 +729,16 @@ class Item(IngameModel):
         details_index = self.class_spec_index
 
         if self.has_class_spec:
-            _, class_spec_length = NON_EAR_STRUCTURE['class_spec']
+            _, class_spec_length = self._layout.non_ear_structure['class_spec']
             details_index += class_spec_length
 
         result['index'] = details_index
 
         if self.rarity in ['rare', 'crafted']:
-            _, prefix_id_length = NON_EAR_STRUCTURE[
+            _, prefix_id_length = self._layout.non_ear_structure[
                 'cr_pf_type_id'
             ]
-            _, suffix_id_length = NON_EAR_STRUCTURE[
+            _, suffix_id_length = self._layout.non_ear_structure[
                 'cr_sf_type_id'
             ]
 
@@ -684,8 +784,8 @@ class Item(IngameModel):
             result['length'] = current_aff_index - details_index
 
         elif self.rarity == 'magic':
-            _, pf_type_id_length = NON_EAR_STRUCTURE['magic_pf_type_id']
-            _, sf_type_id_length = NON_EAR_STRUCTURE['magic_sf_type_id']
+            _, pf_type_id_length = self._layout.non_ear_structure['magic_pf_type_id']
+            _, sf_type_id_length = self._layout.non_ear_structure['magic_sf_type_id']
 
             prefix_id_index = details_index
             result['prefix_id_index'] = prefix_id_index
@@ -703,7 +803,7 @@ class Item(IngameModel):
             result['length'] = suffix_id_index + sf_type_id_length - details_index
 
         elif self.rarity == 'unique':
-            _, quality_id_length = NON_EAR_STRUCTURE['unique_quality_id']
+            _, quality_id_length = self._layout.non_ear_structure['unique_quality_id']
             bin_quality_id = reversed(
                 self._bin_data_as_array[details_index: details_index + quality_id_length]
             )
@@ -713,7 +813,7 @@ class Item(IngameModel):
             result['length'] = quality_id_length
 
         elif self.rarity == 'set':
-            _, quality_id_length = NON_EAR_STRUCTURE['set_quality_id']
+            _, quality_id_length = self._layout.non_ear_structure['set_quality_id']
             bin_quality_id = reversed(
                 self._bin_data_as_array[details_index: details_index + quality_id_length]
             )
@@ -723,7 +823,7 @@ class Item(IngameModel):
             result['length'] = quality_id_length
 
         elif self.rarity == 'superior':
-            _, quality_id_length = NON_EAR_STRUCTURE['superior_quality_id']
+            _, quality_id_length = self._layout.non_ear_structure['superior_quality_id']
             bin_quality_id = self._bin_data_as_array[details_index: details_index + quality_id_length]
             quality_id = bin_to_dec(''.join(reversed(bin_quality_id)))
             result['quality_id'] = quality_id
@@ -739,7 +839,7 @@ class Item(IngameModel):
         total_socket_index = self.total_socket_index
 
         if self.is_socketed:
-            _, total_socket_length = NON_EAR_STRUCTURE['total_sockets']
+            _, total_socket_length = self._layout.non_ear_structure['total_sockets']
             return total_socket_index + total_socket_length
 
         return total_socket_index
@@ -749,7 +849,7 @@ class Item(IngameModel):
         set_mod_bit_field_index = self.set_mod_bit_field_index
 
         if self.rarity == 'set':
-            _, set_mod_bit_field_length = NON_EAR_STRUCTURE['set_mod_bit_field']
+            _, set_mod_bit_field_length = self._layout.non_ear_structure['set_mod_bit_field']
             return set_mod_bit_field_index + set_mod_bit_field_length
 
         return set_mod_bit_field_index
@@ -781,7 +881,7 @@ class Item(IngameModel):
         result = rarity_details['index'] + rarity_details['length']
 
         if self.is_runeword:
-            _, length = NON_EAR_STRUCTURE['runeword']
+            _, length = self._layout.non_ear_structure['runeword']
             result += length
 
         return result
@@ -793,7 +893,7 @@ class Item(IngameModel):
 
         index = self.runeword_index
 
-        _, length = NON_EAR_STRUCTURE['runeword']
+        _, length = self._layout.non_ear_structure['runeword']
 
         result_as_bin = reversed(self._bin_data_as_array[index: index + length])
 
@@ -814,7 +914,7 @@ class Item(IngameModel):
     def max_durability_index(self):
         defense_index = self.defense_index
         if self.has_defense:
-            _, defense_length = NON_EAR_STRUCTURE['defense_value']
+            _, defense_length = self._layout.non_ear_structure['defense_value']
             return defense_index + defense_length
         return defense_index
 
@@ -823,7 +923,7 @@ class Item(IngameModel):
         if not self.has_defense:
             return None
         index = self.defense_index
-        _, length = NON_EAR_STRUCTURE['defense_value']
+        _, length = self._layout.non_ear_structure['defense_value']
         result_as_bin = reversed(self._bin_data_as_array[index: index + length])
         return bin_to_dec(''.join(result_as_bin)) + START_DEFENSE_VALUE
 
@@ -833,7 +933,7 @@ class Item(IngameModel):
             return None
 
         index = self.max_durability_index
-        _, length = NON_EAR_STRUCTURE['max_durability']
+        _, length = self._layout.non_ear_structure['max_durability']
         result_as_bin = list(reversed(self._bin_data_as_array[index: index + length]))
         return bin_to_dec(''.join(result_as_bin)) + START_MAX_DURABILITY_VALUE
 
@@ -841,7 +941,7 @@ class Item(IngameModel):
     def current_durability_index(self):
         result = self.max_durability_index
         if self.has_durability:
-            _, max_durability_length = NON_EAR_STRUCTURE['max_durability']
+            _, max_durability_length = self._layout.non_ear_structure['max_durability']
             result += max_durability_length
 
         return result
@@ -851,7 +951,7 @@ class Item(IngameModel):
         if not self.max_durability:
             return None
         index = self.current_durability_index
-        _, length = NON_EAR_STRUCTURE['current_durability']
+        _, length = self._layout.non_ear_structure['current_durability']
         result_as_bin = reversed(self._bin_data_as_array[index: index + length])
         return bin_to_dec(
             ''.join(result_as_bin)
@@ -861,7 +961,7 @@ class Item(IngameModel):
     def quantity_index(self):
         result = self.current_durability_index
         if self.max_durability:
-            _, current_durability_length = NON_EAR_STRUCTURE['current_durability']
+            _, current_durability_length = self._layout.non_ear_structure['current_durability']
             result += current_durability_length
         return result
 
@@ -869,7 +969,7 @@ class Item(IngameModel):
     def quantity(self):
         if self.is_ear or self.is_simple:
             return None
-        _, length = NON_EAR_STRUCTURE['quantity']
+        _, length = self._layout.non_ear_structure['quantity']
         result_as_bin = reversed(self._bin_data_as_array[self.quantity_index: self.quantity_index + length])
         return bin_to_dec(
             ''.join(result_as_bin)
@@ -879,7 +979,7 @@ class Item(IngameModel):
     def total_socket_index(self):
         quantity_index = self.quantity_index
         if self.stackable:
-            _, quantity_length = NON_EAR_STRUCTURE['quantity']
+            _, quantity_length = self._layout.non_ear_structure['quantity']
             return quantity_index + quantity_length
         return quantity_index
 
@@ -893,12 +993,13 @@ class Item(IngameModel):
 
         index = self.total_socket_index
 
-        _, length = NON_EAR_STRUCTURE['total_sockets']
+        _, length = self._layout.non_ear_structure['total_sockets']
         result_as_bin = reversed(self._bin_data_as_array[index: index + length])
         return bin_to_dec(
             ''.join(result_as_bin)
         )
 
+    @mutation
     def maximize_sockets(self):
         if self.is_ear or self.is_simple:
             raise Error(
@@ -908,11 +1009,11 @@ class Item(IngameModel):
 
         # set flag
         if not self.is_socketed:
-            flag_index, flag_length = BASE_STRUCTURE['is_socketed']
+            flag_index, flag_length = self._layout.base_structure['is_socketed']
             flag_data = '1' * flag_length
             self.edit(flag_index, list(flag_data))
 
-        _, length = NON_EAR_STRUCTURE['total_sockets']
+        _, length = self._layout.non_ear_structure['total_sockets']
         index = self.total_socket_index
         width, height = self.size
 
@@ -924,6 +1025,13 @@ class Item(IngameModel):
 
     @property
     def updated_data(self) -> list[str]:
+        with PROFILER.phase('item.updated_data'):
+            return self._encode()
+
+    def _encode(self) -> list[str]:
+        return self.bits_to_byte_array(self._encode_bits())
+
+    def _encode_bits(self) -> list[str]:
         # strip the data to the start mod index
         if self.is_ear or self.is_simple:
             bin_data_as_array = self._bin_data_as_array
@@ -943,8 +1051,12 @@ class Item(IngameModel):
                 # add mod ending section
                 bin_data_as_array.extend(ITEM_FOOTER)
 
+        return bin_data_as_array
+
+    @staticmethod
+    def bits_to_byte_array(bits: list[str]) -> list[str]:
         hex_data = bin_to_hex(
-            ''.join(reversed(bin_data_as_array))
+            ''.join(reversed(bits))
         )
         result = reversed(
             make_byte_array_from_hex(hex_data)
@@ -952,21 +1064,28 @@ class Item(IngameModel):
 
         return list(result)
 
+    def _restore_bits(self, bits: list[str]):
+        """
+        Replaces the bits of the item with encoded ones, only its base and mods are decoded again.
+        """
+        self._bin_data_as_array = bits
+        self._base = self._load_base_item()
+        self._mods = self._load_mods()
+
     def save(self, file_path):
-        with open(file_path, 'wb') as file_ref:
-            file_ref.write(
-                bytes.fromhex(''.join(self.updated_data))
-            )
+        write_file(file_path, bytes.fromhex(''.join(self.updated_data)))
 
+    @mutation
     def update_id(self, value: int):
         if self.is_ear or self.is_simple:
             return
-        id_index, id_length = NON_EAR_STRUCTURE['unique_id']
+        id_index, id_length = self._layout.non_ear_structure['unique_id']
         value_as_bin = dec_to_bin(value, length=id_length)
         self._bin_data_as_array[id_index: id_index + id_length] = list(
             value_as_bin[::-1]
         )
 
+    @mutation
     def clear_mods(self,
                    include_affix_count: bool = False,
                    include_cube_upgrades: bool = False,
@@ -1018,18 +1137,20 @@ class Item(IngameModel):
 
             self._mods.pop(mod.id)
 
+    @mutation
     def change_max_durability(self, value: int):
         if not self.has_durability:
             raise Error('UnsupportedAction',
                         'Item does not have durability')
 
         index = self.max_durability_index
-        _, length = NON_EAR_STRUCTURE['max_durability']
+        _, length = self._layout.non_ear_structure['max_durability']
 
         bin_value = dec_to_bin(value - START_MAX_DURABILITY_VALUE, length=length)
 
         self.edit(index, list(reversed(bin_value)))
 
+    @mutation
     def change_position(self,
                         storage_id: int,
                         location_id: int,
@@ -1048,72 +1169,114 @@ class Item(IngameModel):
             storage_y = 0
 
         # update storage
-        storage_index, storage_length = BASE_STRUCTURE['storage']
+        storage_index, storage_length = self._layout.base_structure['storage']
         storage_code_as_bin = dec_to_bin(storage_id, length=storage_length)[::-1]
         self._bin_data_as_array[storage_index: storage_index + storage_length] = list(storage_code_as_bin)
 
         # update location
-        location_index, location_length = BASE_STRUCTURE['location']
+        location_index, location_length = self._layout.base_structure['location']
         location_code_as_bin = dec_to_bin(location_id, length=location_length)[::-1]
         self._bin_data_as_array[location_index: location_index + location_length] = list(location_code_as_bin)
 
         # update location coordinate
-        storage_x_index, storage_x_length = BASE_STRUCTURE['storage_x']
-        storage_y_index, storage_y_length = BASE_STRUCTURE['storage_y']
+        storage_x_index, storage_x_length = self._layout.base_structure['storage_x']
+        storage_y_index, storage_y_length = self._layout.base_structure['storage_y']
         storage_x_as_bin = dec_to_bin(storage_x, length=storage_x_length)[::-1]
         storage_y_as_bin = dec_to_bin(storage_y, length=storage_y_length)[::-1]
         self._bin_data_as_array[storage_x_index: storage_x_index + storage_x_length] = list(storage_x_as_bin)
         self._bin_data_as_array[storage_y_index: storage_y_index + storage_y_length] = list(storage_y_as_bin)
 
+    def batch(self) -> 'ItemBatch':
+        """
+        Queues the edits, inserts and deletes of a block and applies them in one pass on exit:
+
+            with item.batch():
+                item.change_rarity(7)
+                item.maximize_sockets()
+                item.set_ethereal(True)
+
+        Offsets inside the batch are the ones of the item when it started,
+        and properties read inside it see the item as it was.
+        """
+        if self._batch is not None:
+            raise Error(
+                'BatchInProgress',
+                'A batch is already open for this item'
+            )
+        return ItemBatch(self)
+
+    @mutation
     def edit(self, index: int, data: list):
+        if self._batch is not None:
+            self._batch.edit(index, data)
+            return
+
         length = len(data)
-        before = ''.join(self._bin_data_as_array[index - length:])
+
+        tracing = DIAGNOSTICS.enabled_for(TRACE)
+        if tracing:
+            before = ''.join(self._bin_data_as_array[index: index + length])
+
         self._bin_data_as_array[index: index + length] = data
-        after = (' ' * length) + ''.join(self._bin_data_as_array[index:index + length])
 
-        print('===== changes =====')
-        print(before)
-        print(after)
+        if tracing:
+            DIAGNOSTICS.trace(
+                'BitsEdited',
+                'Edited bits {index}-{end}: {before} -> {after}',
+                index=index,
+                end=index + length,
+                before=before,
+                after=''.join(data)
+            )
 
+    @mutation
     def insert(self, index, data: list):
-        length = len(data)
-        before = '{}{}{}'.format(
-            ''.join(self._bin_data_as_array[index - length:index]),
-            (' ' * length),
-            ''.join(self._bin_data_as_array[index: index + length])
-        )
-        for bit in reversed(data):
-            self._bin_data_as_array.insert(index, bit)
+        if self._batch is not None:
+            self._batch.insert(index, data)
+            return
 
-        after = '{}{}'.format(
-            ' ' * length,
-            ''.join(data),
-        )
+        self._bin_data_as_array[index:index] = data
 
-        print('===== changes =====')
-        print(before)
-        print(after)
+        if DIAGNOSTICS.enabled_for(TRACE):
+            DIAGNOSTICS.trace(
+                'BitsInserted',
+                'Inserted {length} bits at {index}: {after}',
+                index=index,
+                length=len(data),
+                after=''.join(data)
+            )
 
+    @mutation
     def delete_data(self, index: int, length: int):
-        before = ''.join(self._bin_data_as_array[index - length: index + length])
-        after = '{}{}{}'.format(
-            ''.join(self._bin_data_as_array[index - length:index]),
-            ' ' * length,
-            ''.join(self._bin_data_as_array[index + length:])
-        )
+        if self._batch is not None:
+            self._batch.delete(index, length)
+            return
+
+        tracing = DIAGNOSTICS.enabled_for(TRACE)
+        if tracing:
+            before = ''.join(self._bin_data_as_array[index: index + length])
+
         del self._bin_data_as_array[index: index + length]
-        print('===== changes =====')
-        print(before)
-        print(after)
 
+        if tracing:
+            DIAGNOSTICS.trace(
+                'BitsDeleted',
+                'Deleted {length} bits at {index}: {before}',
+                index=index,
+                length=length,
+                before=before
+            )
+
+    @mutation
     def change_level(self, value: int):
         if self.is_ear or self.is_simple:
             return
 
-        level_index, level_length = NON_EAR_STRUCTURE['level']
+        level_index, level_length = self._layout.non_ear_structure['level']
         bin_value = dec_to_bin(value, length=level_length)
         self.edit(level_index, list(reversed(bin_value)))
 
+    @mutation
     def add_mod(self,
                 mod_code: str,
                 values: dict = None,
@@ -1146,6 +1309,7 @@ class Item(IngameModel):
 
         return mod
 
+    @mutation
     def edit_mod(self,
                  mod_id: str,
                  values: dict = None):
@@ -1164,6 +1328,7 @@ class Item(IngameModel):
 
         return mod
 
+    @mutation
     def delete_mod(self, mod_id: str):
         if self.is_ear or self.is_simple:
             raise Error(code='UnsupportedAction',
@@ -1175,6 +1340,7 @@ class Item(IngameModel):
 
         return self._mods.pop(mod_id, None)
 
+    @mutation
     def change_rarity(self, rarity_id: int, **kwargs):
         if self.is_ear or self.is_simple:
             raise Error('UnsupportedAction',
@@ -1188,15 +1354,15 @@ class Item(IngameModel):
         new_detail_data = []
 
         if rarity == 'unique':
-            _, quality_id_length = NON_EAR_STRUCTURE['unique_quality_id']
+            _, quality_id_length = self._layout.non_ear_structure['unique_quality_id']
             quality_id = kwargs.get('quality_id') or 0
             bin_quality_id = dec_to_bin(value=quality_id,
                                         length=quality_id_length)
             new_detail_data.extend(reversed(bin_quality_id))
 
         elif rarity == 'magic':
-            _, prefix_id_length = NON_EAR_STRUCTURE['magic_pf_type_id']
-            _, suffix_id_length = NON_EAR_STRUCTURE['magic_sf_type_id']
+            _, prefix_id_length = self._layout.non_ear_structure['magic_pf_type_id']
+            _, suffix_id_length = self._layout.non_ear_structure['magic_sf_type_id']
 
             prefix_id = kwargs.get('prefix_id') or 0
             suffix_id = kwargs.get('suffix_id') or 0
@@ -1212,9 +1378,9 @@ class Item(IngameModel):
             new_detail_data.extend(reversed(bin_suffix_id))
 
         elif rarity in ['rare', 'crafted']:
-            _, prefix_id_length = NON_EAR_STRUCTURE['cr_pf_type_id']
-            _, suffix_id_length = NON_EAR_STRUCTURE['cr_sf_type_id']
-            _, affix_lengths = NON_EAR_STRUCTURE['cr_affixes']
+            _, prefix_id_length = self._layout.non_ear_structure['cr_pf_type_id']
+            _, suffix_id_length = self._layout.non_ear_structure['cr_sf_type_id']
+            _, affix_lengths = self._layout.non_ear_structure['cr_affixes']
             affix_min_length, affix_max_length = affix_lengths
 
             prefix_id = kwargs.get('prefix_id') or 0
@@ -1249,7 +1415,7 @@ class Item(IngameModel):
         self.insert(detail_index, new_detail_data)
 
         # update rarity
-        rarity_index, rarity_length = NON_EAR_STRUCTURE['rarity']
+        rarity_index, rarity_length = self._layout.non_ear_structure['rarity']
         bin_rarity = dec_to_bin(value=rarity_id, length=rarity_length)
         self.edit(rarity_index, list(reversed(bin_rarity)))
 
@@ -1273,6 +1439,7 @@ class Item(IngameModel):
             ]
         )
 
+    @mutation
     def change_code(self, value: str):
         if self.is_ear:
             raise Error('UnsupportedAction',
@@ -1280,7 +1447,7 @@ class Item(IngameModel):
 
         new_data = []
 
-        index, length = NON_EAR_STRUCTURE['code']
+        index, length = self._layout.non_ear_structure['code']
 
         max_char = length / 8
 
@@ -1301,6 +1468,7 @@ class Item(IngameModel):
 
         self.edit(index, new_data)
 
+    @mutation
     def maximize_affixes(self):
         max_values = dict(value=3)
 
@@ -1325,12 +1493,13 @@ class Item(IngameModel):
 
     @property
     def is_ethereal(self):
-        index, length = BASE_STRUCTURE['is_ethereal']
+        index, length = self._layout.base_structure['is_ethereal']
         value = self._bin_data_as_array[index]
         return value == '1'
 
+    @mutation
     def set_ethereal(self, value: bool):
-        index, length = BASE_STRUCTURE['is_ethereal']
+        index, length = self._layout.base_structure['is_ethereal']
 
         value_as_bin = '1' if value else '0'
 
@@ -1338,6 +1507,7 @@ class Item(IngameModel):
 
         return self
 
+    @mutation
     def shrine_bless(self, shrine_name: str):
         shrine_mod_mappings = {
             # shrine names
@@ -1429,6 +1599,7 @@ class Item(IngameModel):
                 self.add_mod(mod_code=mod_code, values=bless_max_value)
         self.add_mod(mod_code=SHRINE_BLESSED_MOD_CODE)
 
+    @mutation
     def upgrade(self, formular: str):
         formular_mappings = {
             # formular
@@ -1618,6 +1789,7 @@ class Item(IngameModel):
                 self.add_mod(mod_code=mod_code, values=upgrading_values)
         self.add_mod(mod_code=ITEM_UPGRADED_MOD_CODE)
 
+    @mutation
     def corrupt(self, mod_data: list[dict]):
         if self.is_ear or self.is_simple:
             raise Error(
@@ -1651,9 +1823,35 @@ class Item(IngameModel):
                 self.add_mod(mod_code=mod_code, values=corrupting_values)
         self.add_mod(mod_code=ITEM_CORRUPTED_MOD_CODE)
 
-    def clone(self):
-        result = copy.deepcopy(self)
-        result.update_id(int(time.time()))
+    def clone(self,
+              unique_id: int = None,
+              storage_id: int = None,
+              location_id: int = None,
+              storage_x: int = None,
+              storage_y: int = None) -> 'Item':
+        # the base item and the base mods are shared,
+        # only the bits and the mods (their data is replaced on update) are copied
+        result = self.model_copy()
+        result._batch = None
+        result._watcher = None
+        result._bin_data_as_array = self._bin_data_as_array.copy()
+        result._mods = {
+            mod_id: mod.model_copy()
+            for mod_id, mod in self._mods.items()
+        }
+
+        if unique_id is None:
+            unique_id = int(time.time())
+        result.update_id(unique_id)
+
+        if storage_id is not None and location_id is not None:
+            result.change_position(
+                storage_id=storage_id,
+                location_id=location_id,
+                storage_x=storage_x,
+                storage_y=storage_y
+            )
+
         return result
 
     def print_all_mods(self):
@@ -1675,3 +1873,229 @@ class Item(IngameModel):
             data = self._bin_data_as_array[offset:]
 
         print(''.join(data))
+
+
+class ItemBatch:
+    """
+    Edits, inserts and deletes of an item, addressed in the offsets of the item
+    when the batch started and applied in a single pass on commit.
+    """
+
+    def __init__(self, item: Item):
+        self.item = item
+
+        self._edits: list[tuple[int, list]] = []
+        self._inserts: list[tuple[int, list]] = []
+        self._deletes: list[tuple[int, int]] = []
+
+    def __enter__(self) -> 'ItemBatch':
+        self.item._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.item._batch = None
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def edit(self, index: int, data: list):
+        self._edits.append((index, list(data)))
+
+    def insert(self, index: int, data: list):
+        self._inserts.append((index, list(data)))
+
+    def delete(self, index: int, length: int):
+        if length > 0:
+            self._deletes.append((index, length))
+
+    def commit(self):
+        with PROFILER.phase('item.batch_commit'):
+            self._apply()
+
+        if DIAGNOSTICS.enabled_for(TRACE):
+            DIAGNOSTICS.trace(
+                'BatchCommitted',
+                'Committed {edits} edits, {inserts} inserts and {deletes} deletes',
+                edits=len(self._edits),
+                inserts=len(self._inserts),
+                deletes=len(self._deletes)
+            )
+
+        self._edits = []
+        self._inserts = []
+        self._deletes = []
+
+    def _apply(self):
+        bits = self.item._bin_data_as_array
+
+        if not self._inserts and not self._deletes:
+            for index, data in self._edits:
+                bits[index: index + len(data)] = data
+            return
+
+        # field writes go to a copy, later writes win
+        bits = bits.copy()
+        for index, data in self._edits:
+            bits[index: index + len(data)] = data
+
+        # at the same offset, inserted bits come before the deleted range
+        operations = [
+            (index, 0, order, data)
+            for order, (index, data) in enumerate(self._inserts)
+        ]
+        operations.extend(
+            (index, 1, order, length)
+            for order, (index, length) in enumerate(self._deletes)
+        )
+        operations.sort(key=lambda o: o[:3])
+
+        result = []
+        position = 0
+        for index, kind, _, value in operations:
+            if index < position:
+                raise Error(
+                    'InvalidBatch',
+                    f'Batch operation at {index} overlaps a deleted range ending at {position}'
+                )
+            result.extend(bits[position:index])
+            position = index
+
+            if kind == 0:
+                result.extend(value)
+            else:
+                position = index + value
+
+        result.extend(bits[position:])
+
+        self.item._bin_data_as_array = result
+
+
+class ItemTemplate:
+    """
+    An item encoded once, copies of it are stamped out by patching
+    only the unique id and the position fields of the encoded bits.
+    """
+
+    def __init__(self, item: Item):
+        self.item = item
+        self.has_id = not (item.is_ear or item.is_simple)
+
+        self._data = None
+        self._value = None
+
+    @property
+    def data(self) -> bytes:
+        # encoded on first stamp
+        if self._data is None:
+            self._data = bytes.fromhex(''.join(self.item.updated_data))
+        return self._data
+
+    @property
+    def value(self) -> int:
+        if self._value is None:
+            self._value = int.from_bytes(self.data, 'little')
+        return self._value
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.item.size
+
+    @staticmethod
+    def _patch(value: int, field: tuple[int, int], field_value: int) -> int:
+        index, length = field
+        mask = ((1 << length) - 1) << index
+        return (value & ~mask) | ((field_value << index) & mask)
+
+    def _patch_location(self, storage_id: int, location_id: int) -> int:
+        if storage_id not in STORAGES:
+            raise Error('UnsupportedStorage')
+
+        if location_id not in LOCATIONS:
+            raise Error('UnsupportedLocation')
+
+        value = self._patch(self.value, self.item._layout.base_structure['storage'], storage_id)
+        value = self._patch(value, self.item._layout.base_structure['location'], location_id)
+        return value
+
+    def _encode(self,
+                value: int,
+                unique_id: int,
+                storage_x: int,
+                storage_y: int) -> bytes:
+        value = self._patch(value, self.item._layout.base_structure['storage_x'], storage_x)
+        value = self._patch(value, self.item._layout.base_structure['storage_y'], storage_y)
+        if self.has_id:
+            value = self._patch(value, self.item._layout.non_ear_structure['unique_id'], unique_id)
+        return value.to_bytes(len(self.data), 'little')
+
+    def stamp(self,
+              storage_id: int,
+              location_id: int,
+              storage_x: int = 0,
+              storage_y: int = 0,
+              unique_id: int = None) -> bytes:
+        if unique_id is None:
+            unique_id = int(time.time())
+
+        value = self._patch_location(storage_id=storage_id, location_id=location_id)
+
+        return self._encode(value, unique_id, storage_x or 0, storage_y or 0)
+
+    def stamp_many(self,
+                   storage_id: int,
+                   location_id: int,
+                   positions: list[tuple[int, int]],
+                   unique_id: int = None) -> list[bytes]:
+        if unique_id is None:
+            unique_id = int(time.time())
+
+        value = self._patch_location(storage_id=storage_id, location_id=location_id)
+
+        return [
+            self._encode(value, unique_id, storage_x, storage_y)
+            for storage_x, storage_y in positions
+        ]
+
+    def _make_item(self, data: bytes) -> Item:
+        # only fields before the mods are patched, the mods of the template are copied as they are
+        result = self.item.model_copy(update=dict(data=data.hex()))
+        result._batch = None
+        result._watcher = None
+        result._bin_data_as_array = list(format(int.from_bytes(data, 'little'), f'0{len(data) * 8}b')[::-1])
+        result._mods = {
+            mod_id: mod.model_copy()
+            for mod_id, mod in self.item._mods.items()
+        }
+        return result
+
+    def build(self,
+              storage_id: int,
+              location_id: int,
+              storage_x: int = 0,
+              storage_y: int = 0,
+              unique_id: int = None) -> Item:
+        return self._make_item(self.stamp(
+            storage_id=storage_id,
+            location_id=location_id,
+            storage_x=storage_x,
+            storage_y=storage_y,
+            unique_id=unique_id
+        ))
+
+    def build_many(self,
+                   storage_id: int,
+                   location_id: int,
+                   positions: list[tuple[int, int]],
+                   unique_id: int = None) -> list[Item]:
+        """
+        Items of the stamped copies, their bits are the stamped bytes and their mods are not decoded again.
+        """
+        return [
+            self._make_item(data)
+            for data in self.stamp_many(
+                storage_id=storage_id,
+                location_id=location_id,
+                positions=positions,
+                unique_id=unique_id
+            )
+        ]
@@ -0,0 +1,152 @@
+"""
+Fixed offset fields of items and characters read straight from their bytes,
+for listings and scans which do not need the parsed models:
+
+    peek_item(item_data).code
+    peek_file(item_or_save_path)
+    peek_character(save_data).version
+
+Nothing past the fixed part of the structures of the format is decoded,
+so the items of a save, the mods and the catalogs are never loaded.
+Saves are read with the layout of their version, item files with `DEFAULT_LAYOUT`.
+"""
+from typing import NamedTuple
+
+from src.common.constants.character import STRUCTURE, ITEM_HEADER
+from src.common.constants.items import LOCATIONS, EQUIPPED_LOCATIONS, STORAGES, RARITIES
+from src.common.layouts import FormatLayout, DEFAULT_LAYOUT, get_layout, read_version
+
+
+def get_item_peek_size(layout: FormatLayout) -> int:
+    # bytes holding the fixed fields of an item, up to the rarity
+    return (sum(layout.non_ear_structure['rarity']) + 7) // 8
+
+
+ITEM_PEEK_SIZE = get_item_peek_size(DEFAULT_LAYOUT)
+CHARACTER_PEEK_SIZE = DEFAULT_LAYOUT.header.size
+
+
+def read_field(value: int, structure: dict, name: str) -> int:
+    index, length = structure[name]
+    return (value >> index) & ((1 << length) - 1)
+
+
+def read_bytes_field(data: bytes, name: str, structure: dict = STRUCTURE) -> int:
+    index, length = structure[name]
+    return int.from_bytes(data[index:index + length], 'little')
+
+
+class ItemPeek(NamedTuple):
+    code: str | None
+    unique_id: int | None
+    level: int | None
+    rarity: str | None
+    location: str | None
+    equipped_location: str | None
+    storage: str | None
+    storage_x: int
+    storage_y: int
+    is_ear: bool
+    is_simple: bool
+    is_socketed: bool
+    is_ethereal: bool
+    is_runeword: bool
+
+
+class CharacterPeek(NamedTuple):
+    version: int
+    file_size: int
+    checksum: int
+    name: str
+    status: int
+    progression: int
+    class_id: int
+    level: int
+    time: int
+    merc_name_id: int
+    merc_type: int
+    merc_exp: int
+
+
+def peek_item(data: bytes, layout: FormatLayout = DEFAULT_LAYOUT) -> ItemPeek:
+    """
+    The fixed fields of an item, its bytes starting with the item header.
+    Same values as the properties of `Item`, None where the item does not have the field.
+    """
+    base_structure = layout.base_structure
+    non_ear_structure = layout.non_ear_structure
+
+    value = int.from_bytes(data[:get_item_peek_size(layout)], 'little')
+
+    is_ear = read_field(value, base_structure, 'is_ear') == 1
+    is_simple = read_field(value, base_structure, 'is_simple') == 1
+
+    code = None
+    if not is_ear:
+        code = read_field(value, non_ear_structure, 'code').to_bytes(4, 'little').decode('latin-1').strip()
+
+    unique_id = level = rarity = None
+    if not (is_ear or is_simple):
+        unique_id = read_field(value, non_ear_structure, 'unique_id')
+        level = read_field(value, non_ear_structure, 'level')
+        rarity = RARITIES.get(read_field(value, non_ear_structure, 'rarity'))
+
+    return ItemPeek(
+        code=code,
+        unique_id=unique_id,
+        level=level,
+        rarity=rarity,
+        location=LOCATIONS.get(read_field(value, base_structure, 'location')),
+        equipped_location=EQUIPPED_LOCATIONS.get(read_field(value, base_structure, 'equipped_location')),
+        storage=STORAGES.get(read_field(value, base_structure, 'storage')),
+        storage_x=read_field(value, base_structure, 'storage_x'),
+        storage_y=read_field(value, base_structure, 'storage_y'),
+        is_ear=is_ear,
+        is_simple=is_simple,
+        is_socketed=read_field(value, base_structure, 'is_socketed') == 1,
+        is_ethereal=read_field(value, base_structure, 'is_ethereal') == 1,
+        is_runeword=read_field(value, base_structure, 'is_runeword') == 1,
+    )
+
+
+def peek_character(data: bytes) -> CharacterPeek:
+    """
+    The fixed header of a save, only the bytes of the header of its layout are needed,
+    `CHARACTER_PEEK_SIZE` for the default one.
+    """
+    structure = get_layout(read_version(data)).structure
+
+    index, length = structure['character_name']
+    name = data[index:index + length].split(b'\x00')[0].decode('latin-1')
+
+    return CharacterPeek(
+        version=read_bytes_field(data, 'version', structure),
+        file_size=read_bytes_field(data, 'file_size', structure),
+        checksum=read_bytes_field(data, 'checksum', structure),
+        name=name,
+        status=read_bytes_field(data, 'character_status', structure),
+        progression=read_bytes_field(data, 'character_progression', structure),
+        class_id=read_bytes_field(data, 'character_class', structure),
+        level=read_bytes_field(data, 'character_level', structure),
+        time=read_bytes_field(data, 'time', structure),
+        merc_name_id=read_bytes_field(data, 'mercenary_name_id', structure),
+        merc_type=read_bytes_field(data, 'mercenary_type', structure),
+        merc_exp=read_bytes_field(data, 'mercenary_exp', structure),
+    )
+
+
+def peek_file(file_path: str) -> ItemPeek | CharacterPeek:
+    """
+    Peeks an item file of the library or a save, reading only the bytes of its fixed fields.
+    """
+    with open(file_path, 'rb') as fr:
+        data = fr.read(max(ITEM_PEEK_SIZE, CHARACTER_PEEK_SIZE))
+
+        if data[:len(ITEM_HEADER)] == bytes.fromhex(''.join(ITEM_HEADER)):
+            return peek_item(data)
+
+        # the header of other versions may be longer
+        header_size = get_layout(read_version(data)).header.size
+        if header_size > len(data):
+            data += fr.read(header_size - len(data))
+    return peek_character(data)
@@ -0,0 +1,321 @@
+"""
+Bulk edits of saves: every file is read, parsed, transformed, encoded and written back,
+with the stages of different files overlapping:
+
+    pipeline = Pipeline(maximize_sockets, jobs=4)
+    report = pipeline.run(iter_save_files(['saves/']))
+
+Reads and writes run in threads, parsing, the transform and encoding in a process pool.
+At most `max_pending` files are in flight, so the memory used does not grow with the number of files.
+A file failing at any stage is reported without stopping the others. It is retried when the failure
+may be transient: a lock timeout, an interrupted or busy I/O call, or the file changed on disk while it was processed.
+Transforms run in the worker processes, they must be top level functions.
+"""
+import contextlib
+import errno
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from src.bases.errors import Error
+from src.common.data import ENV_SHARED_CATALOG, publish_catalog
+from src.common.diagnostics import DIAGNOSTICS
+from src.common.locks import FileLock, write_file, DEFAULT_LOCK_TIMEOUT
+from src.common.profiling import PROFILER
+from src.models.character import Character
+
+WRITTEN = 'written'
+UNCHANGED = 'unchanged'
+DRY_RUN = 'dry_run'
+FAILED = 'failed'
+
+BACKUP_FILE_EXTENSION = '.bak'
+DEFAULT_IO_THREADS = 4
+MAX_UNIQUE_ID = (1 << 32) - 1
+
+# I/O errors worth another attempt, a missing file or a denied access are not
+RETRYABLE_ERRNOS = frozenset((
+    errno.EAGAIN,
+    errno.EWOULDBLOCK,
+    errno.EINTR,
+    errno.EBUSY,
+    errno.ETIMEDOUT,
+    errno.ESTALE,
+))
+
+Transform = Callable[[Character], None]
+
+
+def re_id_items(character: Character):
+    unique_id = int(time.time())
+    for offset, item in enumerate(character.items + character.merc_items):
+        item.update_id((unique_id + offset) & MAX_UNIQUE_ID)
+
+
+def maximize_sockets(character: Character):
+    for item in character.items + character.merc_items:
+        if item.is_ear or item.is_simple or item.location == 'socketed':
+            continue
+        item.maximize_sockets()
+
+
+def clear_mods(character: Character):
+    for item in character.items + character.merc_items:
+        # the mods of runewords come from their runes
+        if item.is_ear or item.is_simple or item.is_runeword:
+            continue
+        item.clear_mods()
+
+
+TRANSFORMS: dict[str, Transform] = {
+    're_id_items': re_id_items,
+    'maximize_sockets': maximize_sockets,
+    'clear_mods': clear_mods,
+}
+
+
+def transform_save(data: bytes, transform: Transform) -> bytes:
+    """
+    Parses, transforms and encodes a save, run in the worker processes.
+    """
+    character = Character(data=data.hex())
+    transform(character)
+    return character.encode()
+
+
+def stat_file(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, Error):
+        return error.code in ('ConcurrentModification', 'LockTimeout')
+    return isinstance(error, OSError) and error.errno in RETRYABLE_ERRNOS
+
+
+class FileResult:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status = None
+        self.error = None
+        self.attempts = 0
+        self.size = None
+
+    def output(self) -> dict:
+        return dict(
+            path=self.path,
+            status=self.status,
+            error=self.error,
+            attempts=self.attempts,
+            size=self.size,
+        )
+
+
+class PipelineReport:
+
+    def __init__(self):
+        self.results: list[FileResult] = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def counts(self) -> dict[str, int]:
+        result = {status: 0 for status in (WRITTEN, UNCHANGED, DRY_RUN, FAILED)}
+        for file_result in self.results:
+            result[file_result.status] += 1
+        return result
+
+    @property
+    def failed(self) -> list[FileResult]:
+        return [i for i in self.results if i.status == FAILED]
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def output(self) -> dict:
+        return dict(
+            total=len(self.results),
+            elapsed=self.elapsed,
+            counts=self.counts,
+            failed=[i.output() for i in self.failed],
+        )
+
+
+class Pipeline:
+    """
+    Runs a transform on many saves.
+    `progress` is called from the I/O threads with the report after each file,
+    `dry_run` runs every stage but the write.
+    """
+
+    def __init__(self,
+                 transform: Transform,
+                 jobs: int = None,
+                 io_threads: int = DEFAULT_IO_THREADS,
+                 max_pending: int = None,
+                 retries: int = 2,
+                 dry_run: bool = False,
+                 backup: bool = False,
+                 progress: Callable[[PipelineReport], None] = None,
+                 lock_timeout: float | None = DEFAULT_LOCK_TIMEOUT):
+        self.transform = transform
+        self.jobs = jobs or os.cpu_count() or 1
+        self.io_threads = io_threads
+        # enough to keep every worker busy while others are read or written
+        self.max_pending = max_pending or 2 * self.jobs + io_threads
+        self.retries = retries
+        self.dry_run = dry_run
+        self.backup = backup
+        self.progress = progress
+        self.lock_timeout = lock_timeout
+
+        self._report = None
+        self._report_lock = threading.Lock()
+        self._io_pool = None
+        self._process_pool = None
+        self._pending = None
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _share_catalog():
+        """
+        Publishes the catalogs for the workers of a run, to a file of its own removed afterwards.
+        """
+        if os.environ.get(ENV_SHARED_CATALOG):
+            yield
+            return
+
+        fd, file_path = tempfile.mkstemp(prefix='d2s-catalog-', suffix='.shared')
+        os.close(fd)
+        try:
+            publish_catalog(file_path)
+            yield
+        finally:
+            os.environ.pop(ENV_SHARED_CATALOG, None)
+            os.unlink(file_path)
+
+    def run(self, paths: Iterable[str]) -> PipelineReport:
+        # workers map the catalogs of this process instead of each loading them
+        with self._share_catalog():
+            return self._run(paths)
+
+    def _run(self, paths: Iterable[str]) -> PipelineReport:
+        self._report = PipelineReport()
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        done = []
+
+        with ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix='d2s-pipeline') as io_pool, \
+                ProcessPoolExecutor(max_workers=self.jobs) as process_pool:
+            self._io_pool = io_pool
+            self._process_pool = process_pool
+
+            for path in paths:
+                # blocks while `max_pending` files are in flight
+                self._pending.acquire()
+                file_result = FileResult(path)
+                finished = Future()
+                done.append(finished)
+                self._start(file_result, finished)
+
+            for finished in done:
+                finished.result()
+
+        self._report.finished_at = time.monotonic()
+        return self._report
+
+    def _start(self, file_result: FileResult, finished: Future):
+        file_result.attempts += 1
+        read = self._io_pool.submit(self._read, file_result.path)
+        read.add_done_callback(lambda f: self._on_read(file_result, finished, f))
+
+    def _read(self, path: str) -> tuple[bytes, tuple[int, int]]:
+        with PROFILER.phase('pipeline.read'):
+            with FileLock(path, shared=True, timeout=self.lock_timeout):
+                version = stat_file(path)
+                with open(path, 'rb') as fr:
+                    return fr.read(), version
+
+    def _on_read(self, file_result: FileResult, finished: Future, read: Future):
+        if read.exception() is not None:
+            self._fail(file_result, finished, read.exception())
+            return
+
+        data, version = read.result()
+        try:
+            transformed = self._process_pool.submit(transform_save, data, self.transform)
+        except Exception as e:
+            # broken pool, the callbacks must not raise or the file would never finish
+            self._fail(file_result, finished, e)
+            return
+        transformed.add_done_callback(
+            lambda f: self._on_transformed(file_result, finished, data, version, f)
+        )
+
+    def _on_transformed(self,
+                        file_result: FileResult,
+                        finished: Future,
+                        data: bytes,
+                        version: tuple[int, int],
+                        transformed: Future):
+        if transformed.exception() is not None:
+            self._fail(file_result, finished, transformed.exception())
+            return
+
+        new_data = transformed.result()
+        file_result.size = len(new_data)
+
+        if new_data == data:
+            self._finish(file_result, finished, UNCHANGED)
+        elif self.dry_run:
+            self._finish(file_result, finished, DRY_RUN)
+        else:
+            written = self._io_pool.submit(self._write, file_result.path, data, new_data, version)
+            written.add_done_callback(lambda f: self._on_written(file_result, finished, f))
+
+    def _write(self, path: str, data: bytes, new_data: bytes, version: tuple[int, int]):
+        with PROFILER.phase('pipeline.write'):
+            with FileLock(path, timeout=self.lock_timeout):
+                if stat_file(path) != version:
+                    raise Error(
+                        'ConcurrentModification',
+                        f'{path} changed since it was read'
+                    )
+                if self.backup:
+                    write_file(path + BACKUP_FILE_EXTENSION, data, timeout=self.lock_timeout)
+                write_file(path, new_data, timeout=self.lock_timeout)
+
+    def _on_written(self, file_result: FileResult, finished: Future, written: Future):
+        if written.exception() is not None:
+            self._fail(file_result, finished, written.exception())
+            return
+        self._finish(file_result, finished, WRITTEN)
+
+    def _fail(self, file_result: FileResult, finished: Future, error: BaseException):
+        if is_retryable(error) and file_result.attempts <= self.retries:
+            self._start(file_result, finished)
+            return
+
+        file_result.error = str(error)
+        DIAGNOSTICS.warning(
+            'PipelineFileFailed',
+            'Failed to process {path} after {attempts} attempts: {error}',
+            path=file_result.path,
+            attempts=file_result.attempts,
+            error=file_result.error
+        )
+        self._finish(file_result, finished, FAILED)
+
+    def _finish(self, file_result: FileResult, finished: Future, status: str):
+        file_result.status = status
+        with self._report_lock:
+            self._report.results.append(file_result)
+            if self.progress is not None:
+                self.progress(self._report)
+        self._pending.release()
+        finished.set_result(file_result)
@@ -0,0 +1,54 @@
+"""
+Runs a bulk edit on saves:
+
+    python -m src.pipeline maximize_sockets saves_dir other.d2s [--jobs 4] [--dry-run] [--backup]
+"""
+import argparse
+import json
+import sys
+
+from src.exporters import iter_save_files
+from src.pipeline import Pipeline, PipelineReport, TRANSFORMS
+
+
+def print_progress(report: PipelineReport):
+    counts = ', '.join(f'{status}: {count}' for status, count in report.counts.items())
+    print(f'\r{len(report.results)} files - {counts}', end='', file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transforms saves in parallel')
+    parser.add_argument('transform', choices=list(TRANSFORMS))
+    parser.add_argument('paths', nargs='+', help='save files or directories')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--io-threads', type=int, default=None, help='number of read and write threads')
+    parser.add_argument('--max-pending', type=int, default=None, help='files in flight at most')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--dry-run', action='store_true', help='transform without writing')
+    parser.add_argument('--backup', action='store_true', help='keep the previous save next to it as .bak')
+    parser.add_argument('--quiet', action='store_true', help='no progress')
+    args = parser.parse_args()
+
+    options = dict(
+        jobs=args.jobs,
+        max_pending=args.max_pending,
+        retries=args.retries,
+        dry_run=args.dry_run,
+        backup=args.backup,
+        progress=None if args.quiet else print_progress,
+    )
+    if args.io_threads:
+        options['io_threads'] = args.io_threads
+
+    report = Pipeline(TRANSFORMS[args.transform], **options).run(iter_save_files(args.paths))
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(json.dumps(report.output()))
+
+    if report.failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Concurrent safe saving.
+
+`edit_character` holds the lock of a save for a whole load, modify and save cycle:
+
+    with edit_character(file_path) as character:
+        character.change_act(2)
+
+`SaveExecutor` saves many characters from a thread pool,
+the saves of one file are run one after the other in submission order.
+"""
+import contextlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.common.diagnostics import DIAGNOSTICS, DEBUG
+from src.common.locks import FileLock, DEFAULT_LOCK_TIMEOUT
+from src.common.profiling import PROFILER
+from src.models.character import Character
+
+
+@contextlib.contextmanager
+def edit_character(file_path: str,
+                   output_path: str = None,
+                   backup_path: str = None,
+                   timeout: float | None = DEFAULT_LOCK_TIMEOUT):
+    """
+    Loads a character under the lock of its file and saves it when the block exits without error.
+    """
+    with FileLock(file_path, timeout=timeout):
+        with open(file_path, 'rb') as file_ref:
+            character = Character(data=file_ref.read().hex())
+
+        yield character
+
+        if output_path and output_path != file_path:
+            with FileLock(output_path, timeout=timeout):
+                character.save(output_path, backup_path=backup_path)
+        else:
+            character.save(file_path, backup_path=backup_path)
+
+
+class SaveExecutor:
+
+    def __init__(self, max_workers: int = None, timeout: float | None = DEFAULT_LOCK_TIMEOUT):
+        self.timeout = timeout
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='d2s-save')
+        self._lock = threading.Lock()
+        # path -> future of its last submitted save
+        self._tails: dict[str, Future] = dict()
+
+    def submit(self, character: Character, file_path: str, backup_path: str = None) -> Future:
+        """
+        Queues a save, the returned future resolves to the file path once written.
+        """
+        path = os.path.abspath(file_path)
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                self._finish(path, future)
+                return
+            try:
+                with PROFILER.phase('save_executor.save'):
+                    with FileLock(path, timeout=self.timeout):
+                        character.save(path, backup_path=backup_path)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(path)
+            finally:
+                self._finish(path, future)
+
+        with self._lock:
+            previous = self._tails.get(path)
+            self._tails[path] = future
+
+        if previous is None:
+            self._pool.submit(run)
+        else:
+            if DIAGNOSTICS.enabled_for(DEBUG):
+                DIAGNOSTICS.debug(
+                    'SaveQueued',
+                    'Save of {path} waits for the previous one',
+                    path=path
+                )
+            # runs right away if the previous save is already done
+            previous.add_done_callback(lambda _: self._pool.submit(run))
+
+        return future
+
+    def _finish(self, path: str, future: Future):
+        with self._lock:
+            if self._tails.get(path) is future:
+                del self._tails[path]
+
+    def save_many(self, saves: list[tuple[Character, str] | tuple[Character, str, str | None]]) -> list[Future]:
+        """
+        Queues `(character, file_path)` saves, or `(character, file_path, backup_path)` ones.
+        """
+        return [
+            self.submit(*save)
+            for save in saves
+        ]
+
+    def flush(self):
+        """
+        Waits for the submitted saves, raises the first error.
+        """
+        while True:
+            with self._lock:
+                futures = list(self._tails.values())
+            if not futures:
+                return
+            for future in futures:
+                future.result()
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            with self._lock:
+                futures = list(self._tails.values())
+            for future in futures:
+                # errors are reported through the futures
+                future.exception()
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self) -> 'SaveExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True)
+        return False
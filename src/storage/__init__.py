@@ -0,0 +1,230 @@
+import functools
+import hashlib
+import json
+import os
+
+from src.bases.errors import Error
+from src.common.constants.dirs import D2S_STORAGE_DIR
+from src.common.layouts import FormatLayout, DEFAULT_LAYOUT
+from src.common.profiling import PROFILER
+from src.models.item import Item
+
+OBJECTS_DIR_NAME = '.objects'
+INDEX_FILE_NAME = 'index.json'
+
+# fields that differ between copies of the same item,
+# they are zeroed before hashing so that equivalent items share one blob
+POSITION_FIELDS = [
+    'location',
+    'equipped_location',
+    'storage_x',
+    'storage_y',
+    'storage',
+]
+ID_FIELDS = [
+    'unique_id',
+]
+
+
+def _make_field_mask(structure: dict, fields: list[str]) -> int:
+    result = 0
+    for field in fields:
+        index, length = structure[field]
+        result |= ((1 << length) - 1) << index
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_masks(layout: FormatLayout) -> tuple[int, int]:
+    """
+    Masks of the position and the id fields of the items of a format.
+    """
+    return (
+        _make_field_mask(layout.base_structure, POSITION_FIELDS),
+        _make_field_mask(layout.non_ear_structure, ID_FIELDS),
+    )
+
+
+POSITION_MASK, ID_MASK = get_masks(DEFAULT_LAYOUT)
+
+
+def normalize_item_data(data: bytes, layout: FormatLayout = DEFAULT_LAYOUT) -> bytes:
+    """
+    Zero the unique id and position fields of raw item data.
+    Bit `i` of the item is bit `i` of the little endian integer of its bytes.
+    """
+    value = int.from_bytes(data, 'little')
+
+    mask, id_mask = get_masks(layout)
+
+    is_ear_index, _ = layout.base_structure['is_ear']
+    is_simple_index, _ = layout.base_structure['is_simple']
+    has_id = not ((value >> is_ear_index) & 1 or (value >> is_simple_index) & 1)
+    if has_id:
+        mask |= id_mask
+
+    return (value & ~mask).to_bytes(len(data), 'little')
+
+
+def hash_item_data(data: bytes, layout: FormatLayout = DEFAULT_LAYOUT) -> str:
+    return hashlib.sha1(normalize_item_data(data, layout=layout)).hexdigest()
+
+
+class ItemStore:
+    """
+    Content addressed store of item files.
+    Items are hashed with their unique id and position masked out,
+    each distinct item is stored as one blob and parsed only once.
+    Parsed items are shared, clone them before editing.
+    """
+
+    def __init__(self, root_dir: str = None):
+        if not root_dir:
+            root_dir = D2S_STORAGE_DIR
+
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, OBJECTS_DIR_NAME)
+        self.index_path = os.path.join(self.objects_dir, INDEX_FILE_NAME)
+
+        # relative item path -> digest
+        self._index = None
+        # digest -> parsed item
+        self._items = dict()
+
+    @property
+    def index(self) -> dict[str, str]:
+        if self._index is None:
+            self._index = dict()
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as fr:
+                    self._index = json.load(fr)
+        return self._index
+
+    def save_index(self):
+        if not os.path.exists(self.objects_dir):
+            os.makedirs(self.objects_dir)
+
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as fr:
+            json.dump(self.index, fr)
+        os.replace(tmp_path, self.index_path)
+
+    def make_blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _make_abs_path(self, path: str) -> str:
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.root_dir, path)
+
+    def has(self, digest: str) -> bool:
+        return digest in self._items or os.path.exists(self.make_blob_path(digest))
+
+    def put(self, data: bytes) -> str:
+        digest, _ = self._put(data)
+        return digest
+
+    def _put(self, data: bytes) -> tuple[str, bool]:
+        normalized_data = normalize_item_data(data)
+        digest = hashlib.sha1(normalized_data).hexdigest()
+
+        blob_path = self.make_blob_path(digest)
+        if os.path.exists(blob_path):
+            return digest, False
+
+        blob_dir = os.path.dirname(blob_path)
+        if not os.path.exists(blob_dir):
+            os.makedirs(blob_dir)
+
+        tmp_path = blob_path + '.tmp'
+        with open(tmp_path, 'wb') as fr:
+            fr.write(normalized_data)
+        os.replace(tmp_path, blob_path)
+
+        return digest, True
+
+    def get_data(self, digest: str) -> bytes:
+        blob_path = self.make_blob_path(digest)
+        if not os.path.exists(blob_path):
+            raise Error(
+                'ItemNotFound',
+                f'Item not found in store: {digest}'
+            )
+        with open(blob_path, 'rb') as fr:
+            return fr.read()
+
+    def get(self, digest: str) -> Item:
+        item = self._items.get(digest)
+        if item is None:
+            PROFILER.miss('item_store')
+            item = self._parse(digest, self.get_data(digest))
+        else:
+            PROFILER.hit('item_store')
+        return item
+
+    def _parse(self, digest: str, normalized_data: bytes) -> Item:
+        item = Item(data=normalized_data.hex())
+        self._items[digest] = item
+        return item
+
+    def load(self, path: str) -> Item:
+        """
+        Load the parsed item of a file,
+        files with equivalent content share the same parsed item.
+        """
+        abs_path = self._make_abs_path(path)
+        with open(abs_path, 'rb') as fr:
+            data = fr.read()
+
+        normalized_data = normalize_item_data(data)
+        digest = hashlib.sha1(normalized_data).hexdigest()
+
+        item = self._items.get(digest)
+        if item is None:
+            PROFILER.miss('item_store')
+            item = self._parse(digest, normalized_data)
+        else:
+            PROFILER.hit('item_store')
+        return item
+
+    def import_tree(self, dir_path: str = None) -> dict:
+        """
+        Store every item file found under `dir_path` and index it by its path.
+        The files themselves are left as they are.
+        """
+        abs_dir_path = self._make_abs_path(dir_path or '')
+
+        total_files = 0
+        new_blobs = 0
+
+        for current_dir, dir_names, file_names in os.walk(abs_dir_path):
+            # skip the store itself
+            dir_names[:] = [d for d in dir_names if d != OBJECTS_DIR_NAME]
+
+            for file_name in file_names:
+                if not file_name.endswith('.d2s'):
+                    continue
+
+                file_path = os.path.join(current_dir, file_name)
+                with open(file_path, 'rb') as fr:
+                    data = fr.read()
+
+                total_files += 1
+
+                digest, created = self._put(data)
+                if created:
+                    new_blobs += 1
+
+                rel_path = os.path.relpath(file_path, self.root_dir)
+                self.index[rel_path] = digest
+
+        self.save_index()
+
+        return dict(
+            total_files=total_files,
+            new_blobs=new_blobs,
+        )
+
+    def lookup(self, path: str) -> str | None:
+        abs_path = self._make_abs_path(path)
+        return self.index.get(os.path.relpath(abs_path, self.root_dir))
@@ -0,0 +1,24 @@
+import pytest
+
+from src.generators import Generator
+from src.models.character import Character
+
+
+@pytest.fixture
+def generator() -> Generator:
+    return Generator(seed=1)
+
+
+@pytest.fixture
+def item_data(generator: Generator) -> list[bytes]:
+    return generator.make_items(40)
+
+
+@pytest.fixture
+def save_data(generator: Generator) -> bytes:
+    return generator.make_character(total_items=40, total_merc_items=5)
+
+
+@pytest.fixture
+def character(save_data: bytes) -> Character:
+    return Character(data=save_data.hex())
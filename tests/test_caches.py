@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from src.caches import CharacterCache, estimate_character_size
+from src.models.character import Character
+
+
+@pytest.fixture
+def save_paths(generator, tmp_path) -> list[str]:
+    result = []
+    for index in range(3):
+        file_path = tmp_path / f'character{index}.d2s'
+        file_path.write_bytes(generator.make_character(total_items=5))
+        result.append(str(file_path))
+    return result
+
+
+def test_hits_and_misses(save_paths: list[str]):
+    cache = CharacterCache()
+
+    character = cache.get(save_paths[0])
+    assert cache.get(save_paths[0]) is character
+    assert cache.get(save_paths[1]) is not character
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+    assert stats['memory'] == sum(estimate_character_size(cache.get(path)) for path in save_paths[:2])
+
+
+def test_least_recently_used_are_evicted(save_paths: list[str]):
+    cache = CharacterCache(max_entries=2)
+
+    first = cache.get(save_paths[0])
+    cache.get(save_paths[1])
+    # the first one is now the most recently used
+    assert cache.get(save_paths[0]) is first
+    cache.get(save_paths[2])
+
+    assert save_paths[0] in cache and save_paths[2] in cache
+    assert save_paths[1] not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memory_limit(save_paths: list[str]):
+    with open(save_paths[0], 'rb') as fr:
+        size = estimate_character_size(Character(data=fr.read().hex()))
+    cache = CharacterCache(max_memory=size)
+
+    for path in save_paths:
+        cache.get(path)
+
+    # the last one is kept even above the limit
+    assert len(cache) == 1 and save_paths[2] in cache
+    assert cache.stats()['evictions'] == 2
+
+
+def test_changed_and_saved_files(save_paths: list[str]):
+    cache = CharacterCache()
+
+    character = cache.get(save_paths[0])
+    character.change_act(2)
+    cache.save(character, save_paths[0])
+    assert save_paths[0] not in cache
+
+    reloaded = cache.get(save_paths[0])
+    assert reloaded is not character
+    assert reloaded.encode() == character.encode()
+
+    # a file changed on disk is parsed again
+    with open(save_paths[1], 'rb') as fr:
+        data = fr.read()
+    cache.get(save_paths[0])
+    with open(save_paths[0], 'wb') as fw:
+        fw.write(data)
+    os.utime(save_paths[0], ns=(0, 0))
+    assert cache.get(save_paths[0]).encode() == data
+
+    assert cache.invalidate(save_paths[0])
+    assert not cache.invalidate(save_paths[0])
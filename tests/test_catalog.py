@@ -0,0 +1,95 @@
+import pytest
+
+from src.bases.errors import Error
+from src.common import data
+from src.common.catalog import SharedCatalog, write_shared_catalog
+from src.common.data import ENV_SHARED_CATALOG, open_shared_catalog, publish_catalog
+
+
+@pytest.fixture
+def catalog_path(tmp_path) -> str:
+    result = str(tmp_path / 'catalog.shared')
+    write_shared_catalog(
+        result,
+        dict(
+            numbers={str(number): dict(value=number) for number in range(100)},
+            words={'b': 2, 'a': 1, 'é': 3},
+            empty=dict(),
+        ),
+        metadata=dict(version=1)
+    )
+    return result
+
+
+def test_round_trip(catalog_path: str):
+    with SharedCatalog(catalog_path) as catalog:
+        assert list(catalog) == ['numbers', 'words', 'empty']
+        assert catalog.metadata == dict(version=1)
+
+        numbers = catalog['numbers']
+        assert len(numbers) == 100
+        assert dict(numbers) == {str(number): dict(value=number) for number in range(100)}
+        assert list(numbers) == sorted(numbers, key=lambda key: key.encode())
+
+        assert dict(catalog['words']) == {'a': 1, 'b': 2, 'é': 3}
+        assert dict(catalog['empty']) == dict()
+
+
+def test_missing_keys(catalog_path: str):
+    with SharedCatalog(catalog_path) as catalog:
+        numbers = catalog['numbers']
+        for key in ('100', '', '-1', 'z', 5):
+            assert key not in numbers
+            with pytest.raises(KeyError):
+                numbers[key]
+        assert numbers.get('100') is None
+        assert 'any' not in catalog['empty']
+
+
+def test_values_are_cached(catalog_path: str):
+    with SharedCatalog(catalog_path) as catalog:
+        numbers = catalog['numbers']
+        assert numbers['42'] is numbers['42']
+
+        for number in range(100):
+            numbers[str(number)]
+        info = numbers._load_value.cache_info()
+        assert info.currsize == 100
+        assert info.hits == 2
+
+
+def test_not_a_catalog(tmp_path):
+    file_path = str(tmp_path / 'catalog.shared')
+    for content in (b'', b'not a shared catalog at all'):
+        with open(file_path, 'wb') as fw:
+            fw.write(content)
+        with pytest.raises(Error) as error:
+            SharedCatalog(file_path)
+        assert error.value.code == 'InvalidSharedCatalog'
+
+
+def test_published_catalog(tmp_path, monkeypatch):
+    monkeypatch.delenv(ENV_SHARED_CATALOG, raising=False)
+    file_path = publish_catalog(str(tmp_path / 'catalog.shared'))
+    monkeypatch.delenv(ENV_SHARED_CATALOG)
+
+    catalog = open_shared_catalog(file_path)
+    assert catalog is not None
+    try:
+        for name in data.CATALOG_NAMES:
+            assert dict(catalog[name]) == data.CATALOGS[name]
+        assert dict(catalog['item_mods.code']) == data.make_catalog_index(data.ITEM_BASE_MODS, 'code')
+    finally:
+        catalog.close()
+
+
+def test_stale_catalog_is_not_used(tmp_path, monkeypatch):
+    monkeypatch.delenv(ENV_SHARED_CATALOG, raising=False)
+    file_path = publish_catalog(str(tmp_path / 'catalog.shared'))
+    monkeypatch.delenv(ENV_SHARED_CATALOG)
+
+    # the sources changed after the catalog was published
+    monkeypatch.setitem(data.SOURCE_HASHES, 'base_items', '0' * 64)
+    assert open_shared_catalog(file_path) is None
+
+    assert open_shared_catalog(str(tmp_path / 'missing.shared')) is None
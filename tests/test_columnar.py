@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.exporters import columnar
+from src.exporters.columnar import ColumnarBuilder, load_columns, write_columns
+from src.models.character import Character
+
+
+@pytest.fixture
+def save_path(save_data: bytes, tmp_path) -> str:
+    result = tmp_path / 'character.d2s'
+    result.write_bytes(save_data)
+    return str(result)
+
+
+def test_rows_are_linked(save_path: str, character: Character, tmp_path):
+    builder = ColumnarBuilder()
+    stats = builder.add_paths([save_path])
+    assert stats['errors'] == []
+    assert stats['items'] == len(character.items) + len(character.merc_items)
+
+    write_columns(str(tmp_path / 'snapshot'), builder.build())
+    tables = load_columns(str(tmp_path / 'snapshot'))
+
+    items, mods = tables['items'], tables['mods']
+    assert not items['error'].any()
+    assert (items['character'] == 0).all()
+    assert items['level'][0] == character.items[0].level
+    assert len(mods['item']) == sum(items['total_mods'])
+    for item_row, total_mods in enumerate(items['total_mods']):
+        assert (mods['item'] == item_row).sum() == total_mods
+
+
+def test_failed_file_leaves_no_rows(save_path: str, monkeypatch):
+    iter_items = columnar.iter_items
+
+    def fail_midway(data: bytes):
+        for index, entry in enumerate(iter_items(data)):
+            if index == 3:
+                raise ValueError('truncated save')
+            yield entry
+
+    builder = ColumnarBuilder()
+    builder.add_paths([save_path])
+    expected = builder.build()
+
+    monkeypatch.setattr(columnar, 'iter_items', fail_midway)
+    stats = builder.add_paths([save_path])
+    assert len(stats['errors']) == 1
+
+    tables = builder.build()
+    for table, columns in expected.items():
+        for column, values in columns.items():
+            np.testing.assert_array_equal(tables[table][column], values)
+
+
+def test_failed_mod_leaves_no_orphan_rows(save_path: str, monkeypatch):
+    read_mod = ColumnarBuilder._read_mod
+    calls = []
+
+    def fail_second_mod(mod):
+        calls.append(mod)
+        if len(calls) == 2:
+            raise ValueError('bad mod')
+        return read_mod(mod)
+
+    monkeypatch.setattr(ColumnarBuilder, '_read_mod', staticmethod(fail_second_mod))
+    builder = ColumnarBuilder()
+    builder.add_paths([save_path])
+    tables = builder.build()
+
+    items, mods = tables['items'], tables['mods']
+    [failed_row] = items['error'].nonzero()[0]
+    assert failed_row not in mods['item']
+    assert items['total_mods'][failed_row] == -1
+    for item_row, total_mods in enumerate(items['total_mods']):
+        assert (mods['item'] == item_row).sum() == max(total_mods, 0)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src import daemon
+from src.daemon import APPLICATION_ERROR, INVALID_PARAMS, JSONRPC_VERSION, METHOD_NOT_FOUND, Daemon
+from src.models.character import Character
+
+
+@pytest.fixture
+def storage_dir(save_data: bytes, tmp_path, monkeypatch) -> str:
+    (tmp_path / 'character.d2s').write_bytes(save_data)
+    monkeypatch.setattr(daemon, 'D2S_STORAGE_DIR', str(tmp_path))
+    return str(tmp_path)
+
+
+def call(server: Daemon, method: str, request_id: int | None = 1, **params) -> dict | None:
+    request = dict(jsonrpc=JSONRPC_VERSION, method=method, params=params)
+    if request_id is not None:
+        request['id'] = request_id
+    return asyncio.run(server.handle(request))
+
+
+def test_edit_undo_save(storage_dir: str, character: Character):
+    server = Daemon()
+    item = character.items[0]
+    level = item.level % 90 + 1
+
+    response = call(server, 'edit', path='character.d2s', operations=[
+        dict(item=0, method='change_level', params=dict(value=level)),
+    ])
+    assert response['result']['dirty']
+
+    [summary] = call(server, 'query', path='character.d2s', filters=dict(index=0))['result']
+    assert summary['level'] == level
+
+    assert not call(server, 'undo', path='character.d2s')['result']['dirty']
+    call(server, 'redo', path='character.d2s')
+    assert not call(server, 'save', path='character.d2s')['result']['dirty']
+
+    item.change_level(level)
+    with open(f'{storage_dir}/character.d2s', 'rb') as fr:
+        assert fr.read() == character.encode()
+
+
+def test_notifications_are_not_answered(storage_dir: str, save_data: bytes):
+    server = Daemon()
+
+    assert call(server, 'ping', request_id=None) is None
+    assert call(server, 'missing', request_id=None) is None
+    assert call(server, 'edit', request_id=None, path='character.d2s', operations=[
+        dict(item=0, method='change_level', params=dict(value=1)),
+        dict(item=10 ** 6, method='change_level', params=dict(value=1)),
+    ]) is None
+
+    # the failed edit was not kept
+    response = call(server, 'save', path='character.d2s')
+    assert not response['result']['can_undo']
+    with open(f'{storage_dir}/character.d2s', 'rb') as fr:
+        assert fr.read() == save_data
+
+    assert call(server, 'ping', request_id=None) is None
+    assert call(server, 'ping', request_id=0)['result'] == 'pong'
+    assert call(server, 'missing')['error']['code'] == METHOD_NOT_FOUND
+
+
+@pytest.mark.parametrize('operation', [
+    dict(method='duplicate_items', params=dict(location_id=0, storage_id=5)),
+    dict(method='duplicate_items', params=dict(item=10 ** 6, location_id=0, storage_id=5)),
+    dict(method='duplicate_items', params=dict(item='0', location_id=0, storage_id=5)),
+    dict(method='change_act', params=dict(act=2)),
+    dict(method='change_act', params=[2]),
+    dict(item=10 ** 6, method='change_level', params=dict(value=1)),
+    dict(item=0, method='change_level', params=dict()),
+    dict(item=0, method='save', params=dict(file_path='other.d2s')),
+    'change_act',
+])
+def test_invalid_params(storage_dir: str, operation):
+    response = call(Daemon(), 'edit', path='character.d2s', operations=[operation])
+    assert response['error']['code'] == INVALID_PARAMS
+
+
+def test_path_outside_of_the_storage(storage_dir: str):
+    response = call(Daemon(), 'load', path='../character.d2s')
+    assert response['error']['code'] == APPLICATION_ERROR
+    assert response['error']['data']['code'] == 'InvalidPath'
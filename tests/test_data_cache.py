@@ -0,0 +1,52 @@
+import json
+import os
+import pickle
+
+from src.common import data
+from src.common.data import CACHE_FORMAT_VERSION, load_data_from_file, read_cache, write_cache
+from src.common.utils import compress_data, hash_file
+
+
+def test_cache_of_the_source(tmp_path):
+    cache_path = str(tmp_path / 'table.pickle')
+    write_cache(cache_path, 'hash', dict(a=1))
+
+    assert read_cache(cache_path, 'hash') == dict(a=1)
+    assert read_cache(cache_path, 'other hash') is None
+    assert read_cache(str(tmp_path / 'missing.pickle'), 'hash') is None
+    assert os.listdir(tmp_path) == ['table.pickle']
+
+
+def test_cache_of_another_format(tmp_path):
+    cache_path = str(tmp_path / 'table.pickle')
+    with open(cache_path, 'wb') as fw:
+        pickle.dump(dict(format_version=CACHE_FORMAT_VERSION - 1, source_hash='hash'), fw)
+        pickle.dump(dict(a=1), fw)
+    assert read_cache(cache_path, 'hash') is None
+
+    for content in (b'', b'not a pickle', pickle.dumps(dict(format_version=CACHE_FORMAT_VERSION))):
+        with open(cache_path, 'wb') as fw:
+            fw.write(content)
+        assert read_cache(cache_path, 'hash') is None
+
+
+def test_changed_source_is_loaded_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'DATA_ENCRYPTION_KEY', '')
+    data_path = str(tmp_path / 'table.dat')
+    cache_path = str(tmp_path / 'table.pickle')
+
+    def write_source(value: dict):
+        with open(data_path, 'wb') as fw:
+            fw.write(compress_data(json.dumps(value).encode()))
+
+    write_source(dict(a=1))
+    assert load_data_from_file(data_path, cache_path) == dict(a=1)
+    assert read_cache(cache_path, hash_file(data_path)) == dict(a=1)
+
+    # the cache is used while the source is the same
+    write_cache(cache_path, hash_file(data_path), dict(a='cached'))
+    assert load_data_from_file(data_path, cache_path) == dict(a='cached')
+
+    write_source(dict(a=2))
+    assert load_data_from_file(data_path, cache_path) == dict(a=2)
+    assert read_cache(cache_path, hash_file(data_path)) == dict(a=2)
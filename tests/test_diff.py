@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from src.bases.errors import Error
+from src.diff import SavePatch, diff_saves
+from src.models.character import Character
+
+
+@pytest.fixture
+def changed_data(character: Character) -> bytes:
+    character.items[2].change_level(99)
+    character.items[3].change_position(storage_id=5, location_id=0, storage_x=10, storage_y=10)
+    character.items.pop(5)
+    character.duplicate_items(item=character.items[0], location_id=0, storage_id=5, quantity=2)
+    character.change_act(3)
+    return character.encode()
+
+
+def test_items_are_aligned(save_data: bytes, changed_data: bytes):
+    diff = diff_saves(save_data, changed_data)
+    items = diff.items['items']
+
+    assert len(items.added) == 2
+    assert len(items.removed) == 1
+    assert len(items.moved) == 1
+    assert len(items.changed) == 1
+    assert not diff.items['merc_items'].output()['changed']
+
+    changed = items.changed[0]
+    assert changed.old.unique_id == changed.new.unique_id
+    assert changed.old.position == changed.new.position
+
+    assert diff.output()['difficulties']['normal'] == [dict(name='act_id', old=0, new=3)]
+
+
+def test_patch_reproduces_the_save(save_data: bytes, changed_data: bytes):
+    diff = diff_saves(save_data, changed_data)
+
+    patch = SavePatch.from_output(json.loads(json.dumps(diff.patch.output())))
+    patched = patch.apply(save_data)
+
+    assert patched == changed_data
+    assert diff_saves(changed_data, patched).empty
+
+
+def test_same_saves(save_data: bytes):
+    assert diff_saves(save_data, save_data).empty
+
+
+def test_patch_conflict(save_data: bytes, changed_data: bytes, generator):
+    patch = diff_saves(save_data, changed_data).patch
+    other_data = generator.make_character(total_items=10)
+
+    with pytest.raises(Error) as error:
+        patch.apply(other_data)
+    assert error.value.code == 'PatchConflict'
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from src.bases.errors import Error
+from src.common.constants.character import STASH_SIZE
+from src.generators import Generator, find_positions
+from src.models.character import Character
+from src.models.item import Item
+
+
+def get_cells(item: Item) -> set[tuple[int, int, int]]:
+    width, height = item.size
+    return {
+        (item.storage, item.storage_x + i, item.storage_y + j)
+        for i in range(width)
+        for j in range(height)
+    }
+
+
+def test_find_positions():
+    assert find_positions([(2, 2), (1, 1), (2, 1), (1, 1)], (3, 2)) == [(0, 0), (2, 0), None, (2, 1)]
+    assert find_positions([(1, 1)] * 3, (2, 1)) == [(0, 0), (1, 0), None]
+
+
+def test_items_do_not_overlap(character: Character):
+    max_x, max_y = STASH_SIZE
+    cells = set()
+    for item in character.items:
+        item_cells = get_cells(item)
+        assert not cells & item_cells
+        cells |= item_cells
+        assert item.storage_x + item.size[0] <= max_x
+        assert item.storage_y + item.size[1] <= max_y
+
+
+def test_full_storage(generator: Generator):
+    items = generator.make_items(100)
+
+    with pytest.raises(Error) as error:
+        generator.place_items(items, storage_id=5)
+    assert error.value.code == 'StorageFull'
+
+    with pytest.raises(Error) as error:
+        generator.make_character(total_items=500)
+    assert error.value.code == 'StorageFull'
+
+    data = generator.make_character(total_items=100)
+    placed = Character(data=data.hex()).items
+    assert len(placed) == 100
+    assert {item.storage for item in placed} == {'stash', 'inventory'}
+
+    cells = set()
+    for item in placed:
+        assert not cells & get_cells(item)
+        cells |= get_cells(item)
+
+
+def test_item_library(generator: Generator, item_data: list[bytes], tmp_path):
+    files = generator.write_item_library(str(tmp_path), count=100, files_per_dir=16, items=item_data)
+
+    assert len(files) == len(item_data)
+    assert sorted(os.listdir(tmp_path)) == ['0000', '0001', '0002']
+    for file_path, data in zip(files, item_data):
+        with open(file_path, 'rb') as fr:
+            assert fr.read() == data
+
+    assert len(generator.write_item_library(str(tmp_path / 'made'), count=3)) == 3
@@ -0,0 +1,91 @@
+import pytest
+
+from src.bases.errors import Error
+from src.models.item import Item
+
+
+def edit_fields(item: Item):
+    item.change_level(50)
+    item.set_ethereal(True)
+    if item.has_durability:
+        item.change_max_durability(77)
+    item.maximize_sockets()
+
+
+def test_batched_edits_encode_like_unbatched(item_data):
+    total = 0
+    for data in item_data:
+        unbatched = Item(data=data.hex())
+        batched = Item(data=data.hex())
+        if unbatched.is_ear or unbatched.is_simple:
+            continue
+
+        edit_fields(unbatched)
+        with batched.batch():
+            edit_fields(batched)
+
+        assert batched.updated_data == unbatched.updated_data
+        total += 1
+
+    assert total
+
+
+def test_batch_offsets_are_the_ones_before_the_batch(item_data):
+    for data in item_data:
+        unbatched = Item(data=data.hex())
+        batched = Item(data=data.hex())
+
+        # the delete comes after the insert, its offset is unchanged by it
+        unbatched.delete_data(40, 5)
+        unbatched.insert(20, list('101'))
+
+        with batched.batch():
+            batched.insert(20, list('101'))
+            batched.delete_data(40, 5)
+
+        assert batched._bin_data_as_array == unbatched._bin_data_as_array
+
+
+def test_batch_reads_the_item_as_it_was(item_data):
+    item = Item(data=item_data[0].hex())
+    level = item.level
+
+    with item.batch():
+        item.change_level(level % 90 + 1)
+        assert item.level == level
+
+    assert item.level == level % 90 + 1
+
+
+def test_batch_is_dropped_on_error(item_data):
+    item = Item(data=item_data[0].hex())
+    bits = item._bin_data_as_array.copy()
+
+    with pytest.raises(ValueError):
+        with item.batch():
+            item.insert(0, list('1111'))
+            raise ValueError
+
+    assert item._bin_data_as_array == bits
+    assert item._batch is None
+
+
+def test_nested_batch(item_data):
+    item = Item(data=item_data[0].hex())
+
+    with item.batch():
+        with pytest.raises(Error) as error:
+            item.batch()
+
+    assert error.value.code == 'BatchInProgress'
+
+
+def test_overlapping_operations(item_data):
+    item = Item(data=item_data[0].hex())
+
+    with pytest.raises(Error) as error:
+        with item.batch():
+            item.delete_data(20, 10)
+            item.insert(25, list('1'))
+
+    assert error.value.code == 'InvalidBatch'
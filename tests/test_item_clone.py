@@ -0,0 +1,52 @@
+import pytest
+
+from src.models.character import Character
+from src.models.item import Item
+
+
+def encode(item: Item) -> str:
+    return ''.join(item.updated_data)
+
+
+@pytest.fixture
+def item(character: Character) -> Item:
+    return next(item for item in character.items if item.mods and not item.is_simple)
+
+
+def test_clone_is_the_item_with_a_new_id(item: Item):
+    clone = item.clone(unique_id=1234, storage_id=1, location_id=0, storage_x=2, storage_y=3)
+
+    expected = Item(data=item.data)
+    expected.update_id(1234)
+    expected.change_position(storage_id=1, location_id=0, storage_x=2, storage_y=3)
+
+    assert encode(clone) == encode(expected)
+    assert clone.id == 1234
+    assert (clone.storage, clone.storage_x, clone.storage_y) == ('inventory', 2, 3)
+
+
+def test_clone_is_independent(item: Item):
+    original = encode(item)
+    clone = item.clone(unique_id=1234)
+
+    # the catalog entries are shared
+    assert clone.base is item.base
+    assert all(a.base is b.base for a, b in zip(clone.mods, item.mods))
+
+    clone.change_level(item.level % 90 + 1)
+    clone.clear_mods()
+    clone.change_position(storage_id=1, location_id=0, storage_x=0, storage_y=0)
+
+    assert encode(item) == original
+    assert item.mods and not clone.mods
+
+
+def test_clones_of_a_watched_item(character: Character):
+    item = character.items[0]
+    item._watcher = lambda target: None
+    try:
+        clone = item.clone(unique_id=1)
+    finally:
+        item._watcher = None
+    assert clone._watcher is None
+    assert clone._batch is None
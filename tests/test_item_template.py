@@ -0,0 +1,52 @@
+import pytest
+
+from src.bases.errors import Error
+from src.models.character import Character
+from src.models.item import Item, ItemTemplate
+
+
+def encode(item: Item) -> bytes:
+    return bytes.fromhex(''.join(item.updated_data))
+
+
+@pytest.fixture
+def items(character: Character) -> list[Item]:
+    simple = next(item for item in character.items if item.is_simple)
+    full = next(item for item in character.items if item.mods)
+    return [simple, full]
+
+
+def test_stamp_is_the_clone(items: list[Item]):
+    for item in items:
+        template = ItemTemplate(item)
+        stamped = template.stamp(storage_id=1, location_id=0, storage_x=4, storage_y=2, unique_id=99)
+
+        expected = item.clone(unique_id=99, storage_id=1, location_id=0, storage_x=4, storage_y=2)
+        assert stamped == encode(expected)
+
+
+def test_build_many(items: list[Item]):
+    positions = [(0, 0), (2, 0), (4, 1)]
+    for item in items:
+        template = ItemTemplate(item)
+        built = template.build_many(storage_id=5, location_id=0, positions=positions, unique_id=7)
+
+        assert [encode(copy) for copy in built] == template.stamp_many(
+            storage_id=5, location_id=0, positions=positions, unique_id=7
+        )
+        for copy, (x, y) in zip(built, positions):
+            assert (copy.storage, copy.storage_x, copy.storage_y) == ('stash', x, y)
+            assert copy.code == item.code
+
+        # the copies do not share their bits or mods
+        built[0].change_position(storage_id=1, location_id=0, storage_x=9, storage_y=0)
+        assert built[1].storage_x == 2
+        if item.mods:
+            built[0].clear_mods()
+            assert len(built[1].mods) == len(item.mods)
+
+
+def test_unsupported_storage(items: list[Item]):
+    with pytest.raises(Error) as error:
+        ItemTemplate(items[0]).stamp(storage_id=99, location_id=0)
+    assert error.value.code == 'UnsupportedStorage'
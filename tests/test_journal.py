@@ -0,0 +1,144 @@
+import pytest
+
+from src.bases.errors import Error
+from src.common.layouts import LAYOUTS, FormatLayout, read_version, register_layout
+from src.journal import Journal
+from src.models.character import Character
+from src.models.item import Item
+
+
+def test_undo_restores_the_save(character: Character, save_data: bytes):
+    journal = Journal(character)
+
+    with journal.record('level'):
+        for item in character.items[:5]:
+            item.change_level(90)
+    changed = character.encode()
+    assert changed != save_data
+
+    journal.undo()
+    assert character.encode() == save_data
+
+    journal.redo()
+    assert character.encode() == changed
+
+
+def test_added_and_removed_items(character: Character, save_data: bytes):
+    journal = Journal(character)
+
+    with journal.record('duplicate'):
+        character.duplicate_items(item=character.items[0], location_id=0, storage_id=5, quantity=3)
+        character.items.pop(3)
+    changed = character.encode()
+
+    journal.undo()
+    assert character.encode() == save_data
+
+    journal.redo()
+    assert character.encode() == changed
+
+
+def test_failed_block_is_reverted(character: Character, save_data: bytes):
+    journal = Journal(character)
+
+    with pytest.raises(ValueError):
+        with journal.record('fail'):
+            character.items[1].change_level(1)
+            character.items.pop(0)
+            raise ValueError
+
+    assert character.encode() == save_data
+    assert not journal.can_undo
+
+
+def test_only_changed_items_are_encoded(character: Character, monkeypatch):
+    encoded = []
+    get_bits = Journal._get_bits
+
+    def spy(target):
+        if isinstance(target, Item):
+            encoded.append(target)
+        return get_bits(target)
+
+    monkeypatch.setattr(Journal, '_get_bits', staticmethod(spy))
+
+    journal = Journal(character)
+    with journal.record('id'):
+        character.items[0].update_id(1234)
+
+    assert {id(item) for item in encoded} == {id(character.items[0])}
+    assert all(item._watcher is None for item in character.items)
+
+
+def test_squash(character: Character, save_data: bytes):
+    journal = Journal(character)
+
+    with journal.record('level'):
+        character.items[0].change_level(90)
+    with journal.record('act'):
+        character.change_act(2)
+    with journal.record('level again'):
+        character.items[0].change_level(80)
+    changed = character.encode()
+
+    entry = journal.squash()
+    assert len(journal.entries) == 1
+    assert journal.position == 1
+    assert entry.label == 'level again'
+
+    journal.undo()
+    assert character.encode() == save_data
+
+    journal.redo()
+    assert character.encode() == changed
+
+
+def test_sidecar_round_trip(character: Character, save_data: bytes, tmp_path):
+    journal = Journal(character)
+    with journal.record('level'):
+        character.items[0].change_level(90)
+    with journal.record('act'):
+        character.change_act(2)
+    journal.undo()
+    changed = character.encode()
+
+    file_path = Journal.make_sidecar_path(str(tmp_path / 'character.d2s'))
+    journal.save(file_path)
+
+    loaded = Journal.load(file_path, Character(data=changed.hex()))
+    assert loaded.position == 1
+    assert [entry.label for entry in loaded.entries] == ['level', 'act']
+
+    loaded.undo()
+    assert loaded.character.encode() == save_data
+
+
+def test_sidecar_of_another_character(character: Character, save_data: bytes, tmp_path):
+    journal = Journal(character)
+    with journal.record('level'):
+        character.items[0].change_level(90)
+
+    file_path = str(tmp_path / 'character.journal')
+    journal.save(file_path)
+
+    with pytest.raises(Error) as error:
+        Journal.load(file_path, Character(data=save_data.hex()))
+    assert error.value.code == 'JournalMismatch'
+
+
+def test_sidecar_items_use_the_layout_of_the_save(character: Character, save_data: bytes, tmp_path):
+    journal = Journal(character)
+    with journal.record('duplicate'):
+        character.duplicate_items(item=character.items[0], location_id=0, storage_id=5, quantity=1)
+    file_path = str(tmp_path / 'character.journal')
+    journal.save(file_path)
+
+    layout = register_layout(FormatLayout(read_version(save_data)))
+    try:
+        loaded = Journal.load(file_path, Character(data=character.encode().hex()))
+    finally:
+        LAYOUTS.clear()
+
+    items = [delta.item for entry in loaded.entries for delta in entry.deltas if delta.item is not None]
+    assert items
+    assert all(item._layout is layout for item in items)
@@ -0,0 +1,80 @@
+import pytest
+
+from src.bases.errors import Error
+from src.common.constants.character import STRUCTURE
+from src.common.layouts import (
+    DEFAULT_LAYOUT, LAYOUTS, FormatLayout, StructLayout, get_layout, read_version, register_layout,
+)
+from src.models.character import Character
+
+
+def test_header_round_trip(save_data: bytes):
+    layout = get_layout(read_version(save_data))
+    header = layout.header.unpack(save_data)
+
+    assert layout.header.pack(header) == save_data[:layout.header.size]
+    for field, (index, length) in STRUCTURE.items():
+        value = getattr(header, field)
+        if length in (1, 2, 4):
+            assert value == int.from_bytes(save_data[index:index + length], 'little')
+        else:
+            assert value == save_data[index:index + length]
+
+
+def test_encode_is_the_saved_file(character: Character, save_data: bytes, tmp_path):
+    assert character.encode() == save_data
+
+    character.change_act(2)
+    file_path = str(tmp_path / 'character.d2s')
+    character.save(file_path)
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == character.encode()
+
+
+def test_update_header(character: Character):
+    character.update_header(character_level=90)
+    data = character.encode()
+
+    assert Character(data=data.hex()).level == 90
+    assert DEFAULT_LAYOUT.header.unpack(data).character_level == 90
+
+
+def test_short_data():
+    with pytest.raises(Error) as error:
+        DEFAULT_LAYOUT.header.unpack(b'\x00' * (DEFAULT_LAYOUT.header.size - 1))
+    assert error.value.code == 'InvalidStructure'
+
+
+def test_overlapping_fields():
+    with pytest.raises(Error) as error:
+        StructLayout('Overlapping', dict(first=(0, 4), second=(2, 2)))
+    assert error.value.code == 'InvalidStructure'
+
+
+def test_gaps_are_kept():
+    layout = StructLayout('Gap', dict(first=(0, 1), second=(3, 2)))
+    data = bytes([1, 0xaa, 0xbb, 2, 0])
+
+    record = layout.unpack(data)
+    assert (record.first, record.second) == (1, 2)
+    assert record.gap_1 == bytes([0xaa, 0xbb])
+
+    assert layout.pack(record) == data
+    assert layout.pack(record._replace(second=3)) == bytes([1, 0xaa, 0xbb, 3, 0])
+
+
+def test_gaps_of_a_save_survive_encode(save_data: bytes):
+    # the header of this format does not know the signature
+    structure = {field: value for field, value in STRUCTURE.items() if field != 'signature'}
+    register_layout(FormatLayout(read_version(save_data), structure=structure))
+    try:
+        character = Character(data=save_data.hex())
+        character.update_header(character_level=90)
+        data = character.encode()
+    finally:
+        LAYOUTS.clear()
+
+    index, length = STRUCTURE['signature']
+    assert data[index:index + length] == save_data[index:index + length]
+    assert Character(data=data.hex()).level == 90
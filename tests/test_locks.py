@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from config import ROOT_PATH
+from src.bases.errors import Error
+from src.common import locks
+from src.common.locks import FileLock, write_file
+from src.models.character import Character
+from src.saving import SaveExecutor, edit_character
+
+
+def test_lock_is_reentrant(tmp_path):
+    file_path = str(tmp_path / 'character.d2s')
+
+    with FileLock(file_path, timeout=1):
+        with FileLock(file_path, timeout=1):
+            # takes the lock a third time
+            write_file(file_path, b'data', timeout=1)
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == b'data'
+
+
+def test_lock_of_another_thread_times_out(tmp_path):
+    file_path = str(tmp_path / 'character.d2s')
+    errors = []
+
+    def try_lock():
+        try:
+            with FileLock(file_path, timeout=0.1):
+                pass
+        except Error as e:
+            errors.append(e.code)
+
+    with FileLock(file_path):
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    assert errors == ['LockTimeout']
+
+
+@pytest.mark.skipif(locks.fcntl is None, reason='file locks need fcntl')
+def test_lock_of_another_process_times_out(tmp_path):
+    file_path = str(tmp_path / 'character.d2s')
+    code = (
+        'import sys\n'
+        'from src.bases.errors import Error\n'
+        'from src.common.locks import FileLock\n'
+        'try:\n'
+        '    FileLock(sys.argv[1], timeout=0.1).acquire()\n'
+        'except Error as e:\n'
+        '    print(e.code)\n'
+    )
+
+    with FileLock(file_path):
+        result = subprocess.run(
+            [sys.executable, '-c', code, file_path],
+            cwd=ROOT_PATH,
+            capture_output=True,
+            text=True
+        )
+
+    assert result.stdout.strip() == 'LockTimeout'
+
+
+def test_write_file_replaces_the_file(tmp_path):
+    file_path = str(tmp_path / 'character.d2s')
+
+    write_file(file_path, b'old')
+    write_file(file_path, b'new')
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == b'new'
+    assert sorted(os.listdir(tmp_path)) == ['character.d2s', 'character.d2s.lock']
+
+
+def test_failed_write_keeps_the_file(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'character.d2s')
+    write_file(file_path, b'old')
+
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(locks.os, 'replace', fail)
+    with pytest.raises(OSError):
+        write_file(file_path, b'new')
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == b'old'
+    assert sorted(os.listdir(tmp_path)) == ['character.d2s', 'character.d2s.lock']
+
+
+def test_edit_character(save_data: bytes, tmp_path):
+    file_path = str(tmp_path / 'character.d2s')
+    write_file(file_path, save_data)
+
+    with edit_character(file_path) as character:
+        character.change_act(2)
+    changed = character.encode()
+
+    with pytest.raises(ValueError):
+        with edit_character(file_path) as character:
+            character.change_act(3)
+            raise ValueError
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == changed
+
+
+def test_saves_of_a_file_run_in_order(generator, tmp_path):
+    characters = [
+        Character(data=generator.make_character(total_items=5).hex())
+        for _ in range(4)
+    ]
+    file_path = str(tmp_path / 'character.d2s')
+    backup_path = str(tmp_path / 'character.d2s.bak')
+
+    with SaveExecutor(max_workers=4) as executor:
+        futures = executor.save_many(
+            [(character, file_path) for character in characters[:-1]]
+            + [(characters[-1], file_path, backup_path)]
+        )
+    assert [future.result() for future in futures] == [os.path.abspath(file_path)] * 4
+
+    with open(file_path, 'rb') as fr:
+        assert fr.read() == characters[-1].encode()
+    with open(backup_path, 'rb') as fr:
+        assert fr.read() == bytes.fromhex(characters[-1].data)
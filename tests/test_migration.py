@@ -0,0 +1,105 @@
+import json
+import zlib
+
+import pytest
+
+from migration.scripts import update_data_from_decapicator as migration
+from migration.utils import DECAPITATOR_DATA_OFFSET
+from src.common.utils import decompress_data
+
+SOURCES = {
+    'props.dat': (
+        '#code\tstat\tdescPositive\tdescGroupIDs\tbits\tsaveParamBits\tadd\n'
+        '1\tstr\t+str\ta,b\t7\t\t32\n'
+        '2\tdex\t+dex\t\tx\t2\t\n'
+    ),
+    'itemstatcost.tsv': (
+        'Stat\tID\tSave Add\tSave Bits\tSave Param Bits\n'
+        'str\t0\t32\t8\t\n'
+        'bad\tx\t\t\t\n'
+    ),
+    'items.dat': (
+        '#code\tname\twidth\theight\ttype\tclass\tstackable\n'
+        'hax\tHand Axe\t1\t3\taxe,weap\t-1\t0\n'
+    ),
+    'itemtypes.dat': '#code\tname\tequiv\naxe\tAxe\tweap\n',
+    'skills.dat': '#code\tname\tclass\n0\tAttack\t\n',
+}
+
+
+def write_source(dir_path, name: str, text: str):
+    if name.endswith('.tsv'):
+        (dir_path / name).write_text(text)
+    else:
+        (dir_path / name).write_bytes(bytes(DECAPITATOR_DATA_OFFSET) + zlib.compress(text.encode()))
+
+
+def read_table(data_dir, name: str) -> dict:
+    return json.loads(decompress_data((data_dir / f'{name}.dat').read_bytes()))
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    decapitator_dir = tmp_path / 'decapitator'
+    data_dir = tmp_path / 'data'
+    decapitator_dir.mkdir()
+    data_dir.mkdir()
+    for name, text in SOURCES.items():
+        write_source(decapitator_dir, name, text)
+
+    monkeypatch.setattr(migration, 'DECAPITATOR_DIR', str(decapitator_dir))
+    monkeypatch.setattr(migration, 'DATA_DIR', str(data_dir))
+    monkeypatch.setattr(migration, 'MANIFEST_PATH', str(decapitator_dir / 'manifest.json'))
+    monkeypatch.setattr(migration, 'DATA_ENCRYPTION_KEY', '')
+    return decapitator_dir, data_dir
+
+
+def test_build_tables(dirs):
+    _, data_dir = dirs
+
+    assert migration.update_tables(jobs=1) == {name: 'rebuilt' for name in migration.TABLES}
+
+    assert read_table(data_dir, 'item_mods') == {
+        '1': dict(code='str', id=1, stat_code='str', positive_desc='+str',
+                  teammate_codes=['a', 'b'], min_value=32, length=7),
+        '2': dict(code='dex', id=2, stat_code='dex', positive_desc='+dex',
+                  teammate_codes=[], min_value=0, length=2),
+    }
+    assert read_table(data_dir, 'item_stats') == {'str': dict(code='str', id=0, length=40)}
+    assert read_table(data_dir, 'base_items') == {
+        'hax': dict(code='hax', name='Hand Axe', width='1', height='3', type_codes=['axe', 'weap'], class_id=None),
+    }
+    assert read_table(data_dir, 'skills') == {'0': dict(id=0, name='Attack', class_id=-1)}
+
+
+def test_only_changed_tables_are_rebuilt(dirs):
+    decapitator_dir, data_dir = dirs
+    migration.update_tables(jobs=1)
+
+    assert set(migration.update_tables(jobs=1).values()) == {'unchanged'}
+
+    write_source(decapitator_dir, 'skills.dat', SOURCES['skills.dat'] + '1\tKick\t2\n')
+    result = migration.update_tables(jobs=1)
+    assert result == {name: 'rebuilt' if name == 'skills' else 'unchanged' for name in migration.TABLES}
+    assert read_table(data_dir, 'skills')['1'] == dict(id=1, name='Kick', class_id=2)
+
+
+def test_parallel_build_is_the_serial_build(dirs):
+    _, data_dir = dirs
+
+    migration.update_tables(jobs=1)
+    serial = {name: read_table(data_dir, name) for name in migration.TABLES}
+
+    assert set(migration.update_tables(force=True, jobs=2).values()) == {'rebuilt'}
+    assert {name: read_table(data_dir, name) for name in migration.TABLES} == serial
+
+
+def test_raw_dump(dirs):
+    decapitator_dir, _ = dirs
+
+    file_path = migration.TABLES['item_stats'].dump_raw_rows()
+
+    with open(file_path, 'r') as fr:
+        rows = json.load(fr)
+    assert rows[1] == {'Stat': 'bad', 'ID': 'x', 'Save Add': '', 'Save Bits': '', 'Save Param Bits': ''}
+    assert migration.TABLES['skills'].dump_raw_rows() is None
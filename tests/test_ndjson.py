@@ -0,0 +1,50 @@
+import json
+import os
+
+import pytest
+
+from src.exporters.ndjson import NdjsonExporter, export_to_file
+from src.models.character import Character
+
+
+@pytest.fixture
+def save_path(save_data: bytes, tmp_path) -> str:
+    result = tmp_path / 'saves' / 'character.d2s'
+    result.parent.mkdir()
+    result.write_bytes(save_data)
+    return str(result)
+
+
+def test_export_to_file(save_path: str, character: Character, tmp_path):
+    file_path = str(tmp_path / 'items.ndjson')
+
+    stats = export_to_file([os.path.dirname(save_path)], file_path, data=True)
+
+    total_items = len(character.items) + len(character.merc_items)
+    assert stats == dict(files=1, items=total_items, errors=0)
+
+    with open(file_path, 'r') as fr:
+        records = [json.loads(line) for line in fr]
+    assert len(records) == total_items
+    assert records[0]['file'] == save_path
+    assert records[0]['code'] == character.items[0].code
+    assert records[0]['data'] == character.items[0].data
+    assert sorted(os.listdir(tmp_path)) == ['items.ndjson', 'items.ndjson.lock', 'saves']
+
+
+def test_failed_export_keeps_the_file(save_path: str, tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'items.ndjson')
+    with open(file_path, 'w') as fw:
+        fw.write('previous export\n')
+
+    def fail(self, paths):
+        self.output.write('partial\n')
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(NdjsonExporter, 'export', fail)
+    with pytest.raises(KeyboardInterrupt):
+        export_to_file([save_path], file_path)
+
+    with open(file_path, 'r') as fr:
+        assert fr.read() == 'previous export\n'
+    assert sorted(os.listdir(tmp_path)) == ['items.ndjson', 'items.ndjson.lock', 'saves']
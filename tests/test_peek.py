@@ -0,0 +1,53 @@
+from src.common.layouts import DEFAULT_LAYOUT
+from src.models.character import Character
+from src.models.item import Item
+from src.peek import CHARACTER_PEEK_SIZE, ItemPeek, peek_character, peek_file, peek_item
+
+
+def item_fields(item: Item) -> ItemPeek:
+    return ItemPeek(
+        code=item.code,
+        unique_id=item.id,
+        level=item.level,
+        rarity=item.rarity,
+        location=item.location,
+        equipped_location=item.equipped_location,
+        storage=item.storage,
+        storage_x=item.storage_x,
+        storage_y=item.storage_y,
+        is_ear=item.is_ear,
+        is_simple=item.is_simple,
+        is_socketed=item.is_socketed,
+        is_ethereal=item.is_ethereal,
+        is_runeword=item.is_runeword,
+    )
+
+
+def test_peek_item_is_the_item(character: Character):
+    items = character.items + character.merc_items
+    assert any(item.is_simple for item in items) and any(not item.is_simple for item in items)
+
+    for item in items:
+        assert peek_item(bytes.fromhex(item.data)) == item_fields(item)
+
+
+def test_peek_character(character: Character, save_data: bytes):
+    header = DEFAULT_LAYOUT.header.unpack(save_data)
+
+    result = peek_character(save_data[:CHARACTER_PEEK_SIZE])
+    assert result.version == character.version
+    assert result.level == character.level
+    assert result.name == header.character_name.split(b'\x00')[0].decode()
+    assert (result.file_size, result.checksum) == (header.file_size, header.checksum)
+    assert result.merc_name_id == header.mercenary_name_id
+
+
+def test_peek_file(character: Character, save_data: bytes, tmp_path):
+    save_path = tmp_path / 'character.d2s'
+    save_path.write_bytes(save_data)
+    assert peek_file(str(save_path)) == peek_character(save_data)
+
+    item = character.items[0]
+    item_path = tmp_path / 'item.d2s'
+    item_path.write_bytes(bytes.fromhex(item.data))
+    assert peek_file(str(item_path)) == item_fields(item)
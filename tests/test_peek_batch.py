@@ -0,0 +1,34 @@
+from src.common.constants.items import EQUIPPED_LOCATIONS, LOCATIONS, STORAGES
+from src.models.item import Item
+from src.peek.batch import FLAG_FIELDS, peek_items
+
+RAW_FIELDS = {
+    'location': LOCATIONS,
+    'equipped_location': EQUIPPED_LOCATIONS,
+    'storage': STORAGES,
+}
+
+
+def test_peek_items_is_the_item(item_data: list[bytes], character):
+    items = item_data + [bytes.fromhex(item.data) for item in character.items]
+    columns = peek_items(items)
+
+    assert all(len(values) == len(items) for values in columns.values())
+    for row, data in enumerate(items):
+        item = Item(data=data.hex())
+        assert columns['code'][row] == (item.code or '')
+        assert columns['storage_x'][row] == item.storage_x
+        assert columns['storage_y'][row] == item.storage_y
+        for field in FLAG_FIELDS:
+            assert columns[field][row] == getattr(item, field), field
+        for field, names in RAW_FIELDS.items():
+            assert names.get(int(columns[field][row])) == getattr(item, field), field
+
+
+def test_short_and_no_items():
+    columns = peek_items([b'\x4a\x4d'])
+    assert columns['code'].tolist() == ['']
+    assert not columns['is_simple'][0]
+
+    columns = peek_items([])
+    assert all(len(values) == 0 for values in columns.values())
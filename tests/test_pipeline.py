@@ -0,0 +1,92 @@
+import errno
+import os
+
+import pytest
+
+from src.bases.errors import Error
+from src.common.data import ENV_SHARED_CATALOG, PARSED_DATA_DIR, SHARED_CATALOG_FILE_NAME
+from src.common.locks import write_file
+from src.models.character import Character
+from src.pipeline import FAILED, WRITTEN, Pipeline, is_retryable
+
+ENV_FLAKY_MARKER = 'D2S_TEST_FLAKY_MARKER'
+
+
+def level_up(character: Character):
+    item = character.items[0]
+    item.change_level(item.level % 90 + 1)
+
+
+def flaky_level_up(character: Character):
+    # fails the first time it runs in any worker
+    marker = os.environ[ENV_FLAKY_MARKER]
+    if not os.path.exists(marker):
+        with open(marker, 'w'):
+            pass
+        raise OSError(errno.EAGAIN, 'Resource temporarily unavailable')
+    level_up(character)
+
+
+@pytest.fixture
+def save_path(save_data: bytes, tmp_path) -> str:
+    result = str(tmp_path / 'character.d2s')
+    write_file(result, save_data)
+    return result
+
+
+@pytest.fixture(autouse=True)
+def no_shared_catalog(monkeypatch):
+    monkeypatch.delenv(ENV_SHARED_CATALOG, raising=False)
+
+
+def test_is_retryable():
+    assert is_retryable(OSError(errno.EAGAIN, 'again'))
+    assert is_retryable(Error('LockTimeout'))
+    assert not is_retryable(FileNotFoundError(errno.ENOENT, 'missing'))
+    assert not is_retryable(PermissionError(errno.EACCES, 'denied'))
+    assert not is_retryable(ValueError())
+
+
+def test_transient_error_is_retried(save_path: str, save_data: bytes, tmp_path, monkeypatch):
+    monkeypatch.setenv(ENV_FLAKY_MARKER, str(tmp_path / 'failed_once'))
+
+    report = Pipeline(flaky_level_up, jobs=1, retries=2).run([save_path])
+
+    [result] = report.results
+    assert result.status == WRITTEN
+    assert result.attempts == 2
+
+    expected = Character(data=save_data.hex())
+    level_up(expected)
+    with open(save_path, 'rb') as fr:
+        assert fr.read() == expected.encode()
+
+
+def test_missing_file_is_not_retried(tmp_path):
+    report = Pipeline(level_up, jobs=1, retries=2).run([str(tmp_path / 'missing.d2s')])
+
+    [result] = report.results
+    assert result.status == FAILED
+    assert result.attempts == 1
+
+
+def test_catalog_of_a_run_is_removed(save_path: str):
+    default_path = os.path.join(PARSED_DATA_DIR, SHARED_CATALOG_FILE_NAME)
+    default_stat = os.stat(default_path) if os.path.exists(default_path) else None
+
+    published = []
+    Pipeline(
+        level_up,
+        jobs=1,
+        progress=lambda report: published.append(os.environ.get(ENV_SHARED_CATALOG))
+    ).run([save_path])
+
+    [catalog_path] = published
+    assert catalog_path and catalog_path != default_path
+    assert not os.path.exists(catalog_path)
+    assert ENV_SHARED_CATALOG not in os.environ
+
+    if default_stat is None:
+        assert not os.path.exists(default_path)
+    else:
+        assert os.stat(default_path).st_mtime_ns == default_stat.st_mtime_ns
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from src.models.item import Item
+from src.storage import ItemStore, hash_item_data, normalize_item_data
+
+
+@pytest.fixture
+def item(item_data: list[bytes]) -> Item:
+    return next(
+        item
+        for item in (Item(data=data.hex()) for data in item_data)
+        if not item.is_simple and not item.is_ear
+    )
+
+
+def make_copy(item: Item, unique_id: int, storage_x: int) -> bytes:
+    result = Item(data=item.data)
+    result.update_id(unique_id)
+    result.change_position(storage_id=5, location_id=0, storage_x=storage_x, storage_y=0)
+    return bytes.fromhex(''.join(result.updated_data))
+
+
+def test_copies_share_a_blob(item: Item, tmp_path):
+    first, second = make_copy(item, 1, 0), make_copy(item, 2, 3)
+    assert first != second
+    assert normalize_item_data(first) == normalize_item_data(second)
+    assert hash_item_data(first) == hash_item_data(second)
+
+    store = ItemStore(str(tmp_path))
+    digest = store.put(first)
+    assert store.put(second) == digest
+    assert store.has(digest)
+    assert store.get_data(digest) == normalize_item_data(first)
+    assert store.get(digest) is store.get(digest)
+
+    other = Item(data=item.data)
+    other.change_level(item.level % 90 + 1)
+    assert store.put(bytes.fromhex(''.join(other.updated_data))) != digest
+
+
+def test_import_keeps_the_files(item: Item, item_data: list[bytes], tmp_path):
+    library = {
+        'first.d2s': make_copy(item, 1, 0),
+        os.path.join('nested', 'second.d2s'): make_copy(item, 2, 3),
+        os.path.join('nested', 'other.d2s'): item_data[-1],
+    }
+    for path, data in library.items():
+        file_path = tmp_path / path
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_bytes(data)
+    (tmp_path / 'notes.txt').write_text('not an item')
+
+    store = ItemStore(str(tmp_path))
+    result = store.import_tree()
+
+    assert result == dict(total_files=3, new_blobs=2)
+    for path, data in library.items():
+        assert (tmp_path / path).read_bytes() == data
+        assert store.lookup(path) == hash_item_data(data)
+    assert store.load('first.d2s') is store.load(os.path.join('nested', 'second.d2s'))
+
+    # the index is saved, importing again finds the same blobs
+    store = ItemStore(str(tmp_path))
+    assert store.lookup('first.d2s') == hash_item_data(library['first.d2s'])
+    assert store.import_tree() == dict(total_files=3, new_blobs=0)
@@ -0,0 +1,44 @@
+from src.common.data import ITEM_BASE_MODS, ITEM_BASE_STATS, SKILLS
+from src.common.utils import LazyDenseTable
+from src.models.item import (
+    BASE_MODS_BY_ID, BASE_STATS_BY_ID, SKILL_NAMES_BY_ID, BaseModifier, Item, make_table_by_id,
+)
+
+
+def test_values_are_loaded_once():
+    loaded = []
+
+    def load(index: int) -> int:
+        loaded.append(index)
+        return index * 2
+
+    table = LazyDenseTable(4, load)
+    assert len(table) == 4
+    assert [table[3], table[3], table[0]] == [6, 6, 0]
+    assert loaded == [3, 0]
+
+
+def test_tables_match_the_catalogs():
+    for mod in ITEM_BASE_MODS.values():
+        assert BASE_MODS_BY_ID[mod['id']] == BaseModifier(**mod)
+        assert Item.find_base_mod_by_id(mod['id']) is BASE_MODS_BY_ID[mod['id']]
+
+    stat_ids = {stat['id'] for stat in ITEM_BASE_STATS.values()}
+    for stat_id in stat_ids:
+        # the first stat of an id wins, like a scan of the catalog
+        expected = next(stat for stat in ITEM_BASE_STATS.values() if stat['id'] == stat_id)
+        assert Item.find_item_stat_from_id(stat_id).code == expected['code']
+
+    for skill in SKILLS.values():
+        assert SKILL_NAMES_BY_ID[skill['id']] == skill.get('name')
+
+
+def test_missing_ids():
+    assert Item.find_base_mod_by_id(-1) is None
+    assert Item.find_base_mod_by_id(len(BASE_MODS_BY_ID)) is None
+    assert Item.find_item_stat_from_id(len(BASE_STATS_BY_ID)) is None
+
+    table = make_table_by_id('item_mods', ITEM_BASE_MODS, lambda mod: mod['code'])
+    missing = [index for index in range(len(table)) if str(index) not in ITEM_BASE_MODS]
+    for index in missing:
+        assert table[index] is None